@@ -0,0 +1,173 @@
+"""Admission control for the QA endpoints.
+
+Every QA request takes a slot before doing any work. Slots are bounded in
+three ways:
+
+- a process-wide total (``ADMISSION_TOTAL``), shared by all endpoints;
+- a per-endpoint cap, so long multi-hop ``/ask-smart`` and ``/ask-site``
+  requests and ``/query-batch`` jobs can never hold every slot;
+- a priority, so when a slot frees up the waiting request with the highest
+  priority (interactive ``/ask`` first) gets it.
+
+A request that would have to queue behind ``max_queue`` others for its
+endpoint, or that waits longer than ``max_wait`` seconds, is refused at once
+with 429 and a ``Retry-After`` header instead of piling up. Queue time,
+rejections, in-flight and queued counts are exported on ``/metrics``.
+
+Per-endpoint limits are overridden with ``ADMISSION_<ENDPOINT>`` set to
+``concurrency,max_queue,max_wait`` (e.g. ``ADMISSION_ASK_SMART=2,8,10``).
+"""
+
+import asyncio
+import bisect
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Tuple
+
+from fastapi import HTTPException
+
+from tracing import incr, log_event, metrics
+
+metrics.describe("admission_queue_seconds", "histogram", "Time requests waited for an admission slot.")
+metrics.describe("admission_rejected_total", "counter", "Requests refused with 429 by endpoint and reason.")
+metrics.describe("admission_in_flight", "gauge", "Admitted requests currently running, by endpoint.")
+metrics.describe("admission_queued", "gauge", "Requests waiting for an admission slot, by endpoint.")
+
+
+@dataclass(frozen=True)
+class EndpointLimit:
+    concurrency: int
+    max_queue: int
+    max_wait: float  # seconds
+    priority: int  # lower runs first
+
+
+@dataclass(eq=False)
+class _Waiter:
+    endpoint: str
+    future: asyncio.Future
+
+
+class AdmissionController:
+    """Priority-ordered, per-endpoint bounded admission for one event loop."""
+
+    def __init__(self, total: int, limits: Dict[str, EndpointLimit]):
+        self.total = total
+        self.limits = limits
+        self._active: Dict[str, int] = {name: 0 for name in limits}
+        self._queued: Dict[str, int] = {name: 0 for name in limits}
+        self._waiters: List[Tuple[int, int, _Waiter]] = []  # sorted by (priority, arrival)
+        self._seq = itertools.count()
+
+    def _running(self) -> int:
+        return sum(self._active.values())
+
+    def _has_room(self, endpoint: str) -> bool:
+        return self._running() < self.total and self._active[endpoint] < self.limits[endpoint].concurrency
+
+    def _take(self, endpoint: str) -> None:
+        self._active[endpoint] += 1
+        metrics.set("admission_in_flight", self._active[endpoint], endpoint=endpoint)
+
+    def _set_queued(self, endpoint: str, delta: int) -> None:
+        self._queued[endpoint] += delta
+        metrics.set("admission_queued", self._queued[endpoint], endpoint=endpoint)
+
+    def _release(self, endpoint: str) -> None:
+        self._active[endpoint] -= 1
+        metrics.set("admission_in_flight", self._active[endpoint], endpoint=endpoint)
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hand free slots to the highest-priority waiters whose endpoint has room."""
+        i = 0
+        while i < len(self._waiters) and self._running() < self.total:
+            waiter = self._waiters[i][2]
+            if waiter.future.done() or not self._has_room(waiter.endpoint):
+                i += 1
+                continue
+            del self._waiters[i]
+            self._take(waiter.endpoint)
+            waiter.future.set_result(None)
+
+    def _ahead_of(self, priority: int) -> bool:
+        """Whether someone of equal or higher priority is waiting and could run now.
+
+        Waiters held back only by their own endpoint's cap don't count: they
+        must not keep other endpoints out of idle global slots.
+        """
+        return any(p <= priority and not w.future.done() and self._has_room(w.endpoint)
+                   for p, _, w in self._waiters)
+
+    def _reject(self, endpoint: str, reason: str) -> HTTPException:
+        limit = self.limits[endpoint]
+        metrics.inc("admission_rejected_total", endpoint=endpoint, reason=reason)
+        log_event("admission_rejected", endpoint=endpoint, reason=reason,
+                  in_flight=self._active[endpoint], queued=self._queued[endpoint])
+        return HTTPException(
+            status_code=429,
+            detail={"error": "overloaded", "reason": reason},
+            headers={"Retry-After": str(max(1, math.ceil(limit.max_wait / 2)))},
+        )
+
+    @asynccontextmanager
+    async def admit(self, endpoint: str) -> AsyncIterator[float]:
+        """Hold an admission slot for ``endpoint``; yields the seconds spent queued.
+
+        Raises:
+            HTTPException: 429 when the endpoint's queue is full or the wait times out
+        """
+        limit = self.limits[endpoint]
+        start = time.perf_counter()
+        if self._has_room(endpoint) and not self._ahead_of(limit.priority):
+            self._take(endpoint)
+        else:
+            if self._queued[endpoint] >= limit.max_queue:
+                raise self._reject(endpoint, "queue_full")
+            waiter = _Waiter(endpoint, asyncio.get_running_loop().create_future())
+            bisect.insort(self._waiters, (limit.priority, next(self._seq), waiter))
+            self._set_queued(endpoint, +1)
+            self._wake()  # slots may be free that no release will hand out
+            try:
+                await asyncio.wait_for(waiter.future, limit.max_wait)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                # Timed out or the client went away; give back a slot handed over in the meantime.
+                if waiter.future.done() and not waiter.future.cancelled():
+                    self._release(endpoint)
+                if isinstance(e, asyncio.TimeoutError):
+                    raise self._reject(endpoint, "timeout")
+                raise
+            finally:
+                self._set_queued(endpoint, -1)
+                self._waiters = [entry for entry in self._waiters if entry[2] is not waiter]
+
+        waited = time.perf_counter() - start
+        metrics.observe("admission_queue_seconds", waited, endpoint=endpoint)
+        incr("admission_wait_ms", round(waited * 1000, 2))
+        try:
+            yield waited
+        finally:
+            self._release(endpoint)
+
+
+def _limit(endpoint: str, default: EndpointLimit) -> EndpointLimit:
+    raw = os.getenv("ADMISSION_" + endpoint.strip("/").replace("-", "_").upper())
+    if not raw:
+        return default
+    concurrency, max_queue, max_wait = raw.split(",")
+    return EndpointLimit(int(concurrency), int(max_queue), float(max_wait), default.priority)
+
+
+admission = AdmissionController(
+    total=int(os.getenv("ADMISSION_TOTAL", "16")),
+    limits={
+        "/ask": _limit("/ask", EndpointLimit(concurrency=16, max_queue=64, max_wait=10.0, priority=0)),
+        "/ask-site": _limit("/ask-site", EndpointLimit(concurrency=4, max_queue=16, max_wait=20.0, priority=1)),
+        "/ask-smart": _limit("/ask-smart", EndpointLimit(concurrency=4, max_queue=16, max_wait=20.0, priority=1)),
+        "/query-batch": _limit("/query-batch", EndpointLimit(concurrency=2, max_queue=4, max_wait=30.0, priority=2)),
+    },
+)
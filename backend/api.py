@@ -1,28 +1,141 @@
-from fastapi import APIRouter, FastAPI, Query
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from fastapi import APIRouter, FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Tuple
+from admission import admission
 from graph_qa import qa_graph, State
 from graph_site_qa import ask_site_handler
 from graph_smart_qa import smart_qa_graph, SmartQARequest, SmartHopState
+from content_store import TextOrRef, content_hash, content_store, resolve_content
+from faq_index import faq_generation, lookup_faq, open_faq_collection
+from html_extract import DEFAULT_LIMITS, clip_text
+from ingest_service import collection_name_for, domain_db_dir
+from job_queue import JobQueue, domain_of
+from rag_agent import CHROMA_DB_DIR, OPENAI_RPM, answer_batch, retrieve_batch
+from rate_limit import AsyncTokenBucket
+from shared_store import shared_store
+from tracing import incr, llm_gate, log_event, record_cache, span, start_trace
+from utils import get_chroma_client, get_embedding_function
+import json
+import logging
 import os
+import time
 # --- Page QA API ---
 
-class QARequest(BaseModel):
-    text: str
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds; 0 disables
+if shared_store is not None:
+    shared_store.set_limit("answer", int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+
+def page_text(request: TextOrRef) -> str:
+    """The request's page text, cut to ``MAX_PAGE_CHARS`` (or refused with 413 under ``PAGE_OVERFLOW=reject``)."""
+    text, truncated = clip_text(request.resolved_text(), DEFAULT_LIMITS.max_chars)
+    if truncated:
+        if DEFAULT_LIMITS.on_overflow == "reject":
+            raise HTTPException(status_code=413, detail=f"Page text is over {DEFAULT_LIMITS.max_chars} characters")
+        incr("pages_truncated")
+    return text
+
+class QARequest(TextOrRef):
     question: str
+    page_url: Optional[str] = None
 
 qa_router = APIRouter()
+FAQ_NEGATIVE_TTL = float(os.getenv("FAQ_NEGATIVE_TTL", "60"))  # seconds a "no FAQ" result is trusted
+_FAQ_CACHE_MAX_DOMAINS = 4096
+_faq_collections: Dict[str, Tuple[Any, Optional[bytes], float]] = {}  # domain -> (collection or None, generation, checked at)
 
-@qa_router.post("/ask")
-async def ask(request: QARequest):
-    state = State(text=request.text, question=request.question)
-    result = qa_graph.invoke(state)
+def _faq_for_domain(domain: str):
+    """The domain's precomputed FAQ collection (built by the ingestion service), if any.
+
+    Handles are cached until ``build_faq_index`` stamps a new generation for the
+    collection; a missing FAQ is remembered for ``FAQ_NEGATIVE_TTL`` seconds.
+    """
+    name = collection_name_for(domain)
+    generation = faq_generation(name)
+    cached = _faq_collections.get(domain)
+    if cached is not None:
+        faq, cached_generation, checked_at = cached
+        if cached_generation == generation and (faq is not None or time.monotonic() - checked_at < FAQ_NEGATIVE_TTL):
+            return faq
+    faq = None
+    db_dir = domain_db_dir(CHROMA_DB_DIR, domain)
+    # Only domains the ingestion service knows; the name comes from the page URL and becomes a path.
+    if os.path.isdir(db_dir) and JobQueue().has_domain(domain):
+        faq = open_faq_collection(get_chroma_client(db_dir), name)
+    if len(_faq_collections) >= _FAQ_CACHE_MAX_DOMAINS:
+        _faq_collections.clear()
+    _faq_collections[domain] = (faq, generation, time.monotonic())
+    return faq
+
+def faq_answer(question: str, page_url: str) -> Optional[Dict[str, Any]]:
+    """The precomputed FAQ answer, if any; the FAQ is only a cache, so its errors count as a miss."""
+    try:
+        domain = domain_of(page_url)
+    except ValueError:
+        return None
+    try:
+        faq = _faq_for_domain(domain)
+        if faq is None:
+            return None
+        with span("faq.lookup"):
+            hit = lookup_faq(faq, question)
+    except Exception as e:
+        log_event("faq_lookup_failed", logging.WARNING, domain=domain, error=repr(e))
+        _faq_collections.pop(domain, None)
+        hit = None
+    record_cache("faq", hit is not None)
+    return hit
+
+def answer_page_question(request: QARequest, text: str) -> Dict[str, Any]:
+    hit = faq_answer(request.question, request.page_url) if request.page_url else None
+    if hit is not None:
+        return {
+            "answer": hit["answer"],
+            "enhanced_query": request.question,
+            "sources": [{
+                "excerpt": hit["question"],
+                "url": hit["source"],
+                "title": hit["headers"] or None,
+                "start_char": None,
+                "end_char": None,
+            }],
+            "context_stats": {},
+            "faq": {"question": hit["question"], "similarity": round(hit["similarity"], 4)},
+        }
+    result = qa_graph.invoke(State(text=text, question=request.question, page_url=request.page_url or ""))
     return {
         "answer": result["answer"],
         "enhanced_query": result["enhanced_query"],
         "sources": result["used_chunks"],
+        "context_stats": result["context_stats"],
     }
 
+def cached_answer(key: str) -> Optional[Dict[str, Any]]:
+    """A previous /ask response from the shared store, if answer caching is on."""
+    if shared_store is None or ANSWER_CACHE_TTL <= 0:
+        return None
+    data = shared_store.get("answer", key)
+    record_cache("answer", data is not None)
+    return json.loads(data) if data is not None else None
+
+def store_answer(key: str, response: Dict[str, Any]) -> None:
+    if shared_store is not None and ANSWER_CACHE_TTL > 0:
+        shared_store.put("answer", key, json.dumps(response).encode("utf-8"), ttl=ANSWER_CACHE_TTL)
+
+@qa_router.post("/ask")
+async def ask(request: QARequest, timings: bool = Query(False)):
+    with start_trace("/ask") as trace:
+        text = await run_in_threadpool(page_text, request)
+        key = content_hash("\0".join([request.question, request.page_url or "", content_hash(text)]))
+        response = await run_in_threadpool(cached_answer, key)
+        if response is None:
+            async with admission.admit("/ask"):
+                response = await run_in_threadpool(answer_page_question, request, text)
+            await run_in_threadpool(store_answer, key, response)
+        if timings:
+            response["timings"] = trace.summary()
+        return response
+
 # --- Site QA API ---
 
 class SiteQARequest(BaseModel):
@@ -32,18 +145,22 @@ class SiteQARequest(BaseModel):
 site_qa_router = APIRouter()
 
 @site_qa_router.post("/ask-site")
-async def ask_site(request: SiteQARequest):
-    return await ask_site_handler(request)
+async def ask_site(request: SiteQARequest, timings: bool = Query(False)):
+    with start_trace("/ask-site") as trace:
+        async with admission.admit("/ask-site"):
+            response = await run_in_threadpool(ask_site_handler, request)
+        if timings:
+            response["timings"] = trace.summary()
+        return response
 
 # --- Smart Hop QA API ---
 
 smart_qa_router = APIRouter()
 
-@smart_qa_router.post("/ask-smart")
-async def ask_smart(request: SmartQARequest):
+def answer_smart_question(request: SmartQARequest, text: str) -> Dict[str, Any]:
     result = smart_qa_graph.invoke(
         SmartHopState(
-            text=request.text,
+            text=text,
             question=request.question,
             links=request.links,
             page_url=request.page_url,
@@ -59,28 +176,171 @@ async def ask_smart(request: SmartQARequest):
         "sufficient": result["sufficient"],
     }
 
+@smart_qa_router.post("/ask-smart")
+async def ask_smart(request: SmartQARequest, timings: bool = Query(False)):
+    with start_trace("/ask-smart") as trace:
+        text = await run_in_threadpool(page_text, request)
+        async with admission.admit("/ask-smart"):
+            response = await run_in_threadpool(answer_smart_question, request, text)
+        if timings:
+            response["timings"] = trace.summary()
+        return response
+
+
+# --- Batch query API ---
+
+class QueryBatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=500)
+    collection: str = "docs"
+    domain: Optional[str] = None  # query the ingestion service's collection for this domain
+    embedding_model: str = "all-MiniLM-L6-v2"  # only for collections that don't record theirs
+    top_k: int = Field(10, ge=1, le=50)
+    answer: bool = True
+
+query_batch_router = APIRouter()
+batch_answer_limiter = AsyncTokenBucket.per_minute(OPENAI_RPM, burst=8)
+
+# Models /query-batch may load for collections that don't record their own.
+QUERY_EMBEDDING_MODELS = set(os.getenv("QUERY_EMBEDDING_MODELS", "all-MiniLM-L6-v2").split(","))
+
+def _open_collection(request: QueryBatchRequest):
+    if request.domain:
+        # Only domains the ingestion service knows; the name becomes a path.
+        if not JobQueue().has_domain(request.domain):
+            raise HTTPException(status_code=404, detail=f"Domain '{request.domain}' is not ingested")
+        db_dir, name = domain_db_dir(CHROMA_DB_DIR, request.domain), collection_name_for(request.domain)
+    else:
+        db_dir, name = CHROMA_DB_DIR, request.collection
+    if not os.path.isdir(db_dir):
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found")
+    client = get_chroma_client(db_dir)
+    try:
+        collection = client.get_collection(name)
+    except Exception:
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found")
+    model = (collection.metadata or {}).get("embedding_model")
+    if model is None:
+        if request.embedding_model not in QUERY_EMBEDDING_MODELS:
+            raise HTTPException(status_code=400, detail=f"Embedding model '{request.embedding_model}' is not allowed")
+        model = request.embedding_model
+    return client.get_collection(name, embedding_function=get_embedding_function(model))
+
+@query_batch_router.post("/query-batch")
+async def query_batch(request: QueryBatchRequest, timings: bool = Query(False)):
+    with start_trace("/query-batch") as trace:
+        collection = await run_in_threadpool(_open_collection, request)
+        async with admission.admit("/query-batch"):
+            retrieved = await run_in_threadpool(retrieve_batch, collection, request.questions, request.top_k)
+            if request.answer:
+                with span("answer_batch", questions=len(request.questions)):
+                    answers = await answer_batch(
+                        request.questions, retrieved, batch_answer_limiter, gate=llm_gate
+                    )
+            else:
+                answers = [{} for _ in request.questions]
+        results = [
+            {
+                "question": question,
+                **answer,
+                "sources": [
+                    {
+                        "id": d["id"],
+                        "source": d["metadata"].get("source"),
+                        "headers": d["metadata"].get("headers"),
+                        "excerpt": d["document"][:200],
+                    }
+                    for d in docs
+                ],
+            }
+            for question, docs, answer in zip(request.questions, retrieved, answers)
+        ]
+        response = {"results": results}
+        if timings:
+            response["timings"] = trace.summary()
+        return response
+
 
 class PageData(BaseModel):
     url: str
-    html: str
     domain: str
+    html: Optional[str] = None
+    content_ref: Optional[str] = None  # hash of HTML uploaded to /content
 
 chroma_router = APIRouter()
 
 @chroma_router.get("/chroma_exists")
 async def chroma_exists(domain: str = Query(...)):
     # Check if chroma db folder for this domain exists (e.g., backend/chroma_db/<domain>)
-    print(f"Checking if chroma db exists for domain: {domain}")
     path = f"backend/chroma_db/{domain}"
-    return {"exists": os.path.exists(path)}
+    exists = os.path.exists(path)
+    log_event("chroma_exists", domain=domain, exists=exists)
+    return {"exists": exists}
 
 
 @chroma_router.post("/add_page_data")
 async def add_page_data(data: PageData):
-    print(f"\n--- Received page data ---")
-    print(f"Domain: {data.domain}")
-    print(f"URL: {data.url}")
-    print(f"HTML length: {len(data.html)}")
-    # For debug, print the first 200 chars only:
-    print(f"First part of HTML: {data.html[:200]!r}")
-    return {"ok": True}
\ No newline at end of file
+    html = await run_in_threadpool(resolve_content, data.html, data.content_ref) if data.html is None else data.html
+    log_event("page_data_received", domain=data.domain, url=data.url, html_chars=len(html))
+    return {"ok": True}
+
+class PageDataBatch(BaseModel):
+    pages: List[PageData] = Field(..., min_length=1, max_length=100)
+
+def _receive_pages(pages: List[PageData]) -> List[str]:
+    missing = []
+    for page in pages:
+        html = page.html if page.html is not None else content_store.get(page.content_ref or "")
+        if html is None:
+            missing.append(page.content_ref)
+            continue
+        log_event("page_data_received", domain=page.domain, url=page.url, html_chars=len(html))
+    return missing
+
+@chroma_router.post("/add_page_data_batch")
+async def add_page_data_batch(batch: PageDataBatch):
+    """Several crawled pages in one request. Unknown content refs are listed in ``missing`` for re-upload."""
+    missing = await run_in_threadpool(_receive_pages, batch.pages)
+    return {"ok": True, "received": len(batch.pages) - len(missing), "missing": missing}
+
+# --- Ingestion service API ---
+
+class IngestDomainRequest(BaseModel):
+    start_url: str
+    interval_hours: float = 24.0
+
+ingest_router = APIRouter()
+
+@ingest_router.get("/ingest/status")
+async def ingest_status(recent: int = Query(20)):
+    return JobQueue().status(recent=recent)
+
+@ingest_router.post("/ingest/domains")
+async def ingest_add_domain(request: IngestDomainRequest):
+    try:
+        domain = JobQueue().add_domain(request.start_url, recrawl_interval=request.interval_hours * 3600)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"domain": domain, "scheduled": True}
+
+
+# --- Content upload API ---
+
+class ContentCheckRequest(BaseModel):
+    hashes: List[str] = Field(..., max_length=1000)
+
+content_router = APIRouter()
+
+@content_router.post("/content/check")
+async def content_check(request: ContentCheckRequest):
+    """Which of these content hashes the backend doesn't have yet."""
+    return {"missing": await run_in_threadpool(content_store.missing, request.hashes)}
+
+@content_router.put("/content/{sha256}")
+async def content_put(sha256: str, request: Request):
+    """Upload text (optionally gzip/zstd-compressed) under its SHA-256."""
+    body = await request.body()
+    try:
+        await run_in_threadpool(content_store.put, body.decode("utf-8"), sha256)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"sha256": sha256.lower(), "bytes": len(body)}
@@ -0,0 +1 @@
+"""Offline benchmarks for the backend. Run modules from ``backend/`` with ``python -m bench.<name>``."""
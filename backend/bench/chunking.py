@@ -0,0 +1,135 @@
+"""
+Chunker benchmark: structure-aware ``chunking.chunk_markdown`` vs. the previous
+header-regex splitter from ``insert_docs``.
+
+Usage (from backend/):
+    python -m bench.chunking [FILE.md ...] [--chunk-size 1600] [--repeat 5] [--synthetic-mb 10]
+
+Without files, a synthetic ~10 MB documentation-style markdown corpus is used.
+"""
+import argparse
+import random
+import re
+import time
+from typing import List
+
+from chunking import chunk_markdown
+
+
+def legacy_smart_chunk_markdown(markdown: str, max_len: int = 1600) -> List[str]:
+    """The header-regex splitter ``insert_docs`` used before ``chunking``, kept as the baseline."""
+    def split_by_header(md, header_pattern):
+        indices = [m.start() for m in re.finditer(header_pattern, md, re.MULTILINE)]
+        indices.append(len(md))
+        return [md[indices[i]:indices[i+1]].strip() for i in range(len(indices)-1) if md[indices[i]:indices[i+1]].strip()]
+
+    chunks = []
+    for h1 in split_by_header(markdown, r'^# .+$'):
+        if len(h1) > max_len:
+            for h2 in split_by_header(h1, r'^## .+$'):
+                if len(h2) > max_len:
+                    for h3 in split_by_header(h2, r'^### .+$'):
+                        if len(h3) > max_len:
+                            for i in range(0, len(h3), max_len):
+                                chunks.append(h3[i:i+max_len].strip())
+                        else:
+                            chunks.append(h3)
+                else:
+                    chunks.append(h2)
+        else:
+            chunks.append(h1)
+
+    final_chunks = []
+    for c in chunks:
+        if len(c) > max_len:
+            final_chunks.extend([c[i:i+max_len].strip() for i in range(0, len(c), max_len)])
+        else:
+            final_chunks.append(c)
+    return [c for c in final_chunks if c]
+
+
+WORDS = (
+    "install configure request response client server cache index query token "
+    "embedding collection document section example parameter return value error "
+    "timeout retry session crawler markdown header table list code block"
+).split()
+
+
+def synthetic_markdown(target_bytes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+
+    def sentence():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize() + "."
+
+    parts: List[str] = []
+    size = 0
+    page = 0
+    while size < target_bytes:
+        page += 1
+        block = [f"# Guide {page}\n"]
+        for s in range(rng.randint(2, 6)):
+            block.append(f"## Section {page}.{s}\n")
+            for _ in range(rng.randint(1, 4)):
+                block.append(f"### Topic {rng.choice(WORDS)}\n")
+                block.append(" ".join(sentence() for _ in range(rng.randint(2, 25))) + "\n")
+                kind = rng.random()
+                if kind < 0.3:
+                    block.append("\n".join(f"- {sentence()}" for _ in range(rng.randint(3, 12))) + "\n")
+                elif kind < 0.5:
+                    rows = [f"| {rng.choice(WORDS)} | {rng.randint(0, 999)} | {sentence()} |" for _ in range(rng.randint(3, 30))]
+                    block.append("| name | value | notes |\n| --- | --- | --- |\n" + "\n".join(rows) + "\n")
+                elif kind < 0.7:
+                    code = "\n".join(f"    {rng.choice(WORDS)}_{i} = call({rng.randint(0, 99)})" for i in range(rng.randint(3, 60)))
+                    block.append(f"```python\n{code}\n```\n")
+        text = "\n".join(block) + "\n"
+        parts.append(text)
+        size += len(text)
+    return "".join(parts)
+
+
+def hard_cuts(chunks: List[str], chunk_size: int) -> int:
+    """Chunks cut exactly at the size limit, i.e. most likely mid-word or mid-block."""
+    return sum(1 for c in chunks if len(c) == chunk_size)
+
+
+def run(name, fn, markdown, chunk_size, repeat):
+    best = float("inf")
+    chunks = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        chunks = fn(markdown, chunk_size)
+        best = min(best, time.perf_counter() - t0)
+    mb = len(markdown.encode()) / 1e6
+    print(
+        f"{name:<10} {best*1000:9.1f} ms  {mb/best:7.1f} MB/s  "
+        f"{len(chunks):7d} chunks  avg {sum(map(len, chunks))/max(len(chunks), 1):6.0f} chars  "
+        f"max {max(map(len, chunks), default=0):5d}"
+    )
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark markdown chunkers")
+    parser.add_argument("files", nargs="*", help="Markdown files (default: synthetic corpus)")
+    parser.add_argument("--chunk-size", type=int, default=1600)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--synthetic-mb", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.files:
+        docs = [(f, open(f, encoding="utf-8").read()) for f in args.files]
+    else:
+        docs = [("synthetic", synthetic_markdown(int(args.synthetic_mb * 1e6)))]
+
+    for name, markdown in docs:
+        print(f"\n{name}: {len(markdown.encode())/1e6:.1f} MB")
+        legacy = run("legacy", legacy_smart_chunk_markdown, markdown, args.chunk_size, args.repeat)
+        structured = run("structured", lambda md, n: list(chunk_markdown(md, max_len=n)), markdown, args.chunk_size, args.repeat)
+        reduction = 1 - len(structured) / max(len(legacy), 1)
+        print(f"chunk-count reduction: {reduction:.1%}")
+        print(f"hard cuts at the size limit: legacy {hard_cuts(legacy, args.chunk_size)}, "
+              f"structured {hard_cuts(structured, args.chunk_size)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Process, load-generation and reporting helpers shared by the benchmark scenarios."""
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_kb(ru_maxrss: int) -> int:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return ru_maxrss // 1024 if sys.platform == "darwin" else ru_maxrss
+
+
+@dataclass
+class Proc:
+    """A child process whose peak RSS is collected when it exits."""
+
+    name: str
+    popen: subprocess.Popen
+    peak_rss_kb: Optional[int] = None
+
+    def wait(self) -> int:
+        """Reap the process (``os.wait4``) and record its peak RSS."""
+        if self.popen.returncode is None:
+            _, status, usage = os.wait4(self.popen.pid, 0)
+            self.popen.returncode = os.waitstatus_to_exitcode(status)
+            self.peak_rss_kb = _rss_kb(usage.ru_maxrss)
+        return self.popen.returncode
+
+    def stop(self) -> int:
+        if self.popen.returncode is None and self.popen.poll() is None:
+            self.popen.send_signal(signal.SIGINT)
+        return self.wait()
+
+
+def spawn(name: str, argv: Sequence[str], env: Optional[Dict[str, str]] = None, quiet: bool = True) -> Proc:
+    """Start ``python <argv>`` from the backend directory."""
+    popen = subprocess.Popen(
+        [sys.executable, *argv],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL if quiet else None,
+        stderr=subprocess.DEVNULL if quiet else None,
+    )
+    return Proc(name, popen)
+
+
+def wait_ready(url: str, proc: Proc, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.popen.poll() is not None:
+            raise RuntimeError(f"{proc.name} exited with {proc.popen.returncode} before becoming ready")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{proc.name} not ready at {url} after {timeout}s")
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0..100)."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class LoadResult:
+    name: str
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    wall: float = 0.0
+    peak_rss_kb: Optional[int] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def row(self) -> Dict[str, Any]:
+        ms = [x * 1000 for x in self.latencies]
+        done = len(self.latencies)
+        return {
+            "scenario": self.name,
+            "ok": done,
+            "errors": self.errors,
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "mean_ms": statistics.fmean(ms) if ms else float("nan"),
+            "rps": done / self.wall if self.wall else 0.0,
+            "peak_rss_mb": self.peak_rss_kb / 1024 if self.peak_rss_kb else float("nan"),
+            **self.extra,
+        }
+
+
+async def run_load(
+    name: str,
+    url: str,
+    payload: Callable[[int], Dict[str, Any]],
+    requests: int,
+    concurrency: int,
+    timeout: float = 300.0,
+) -> LoadResult:
+    """POST ``payload(i)`` to ``url`` for i in range(requests) with ``concurrency`` clients."""
+    result = LoadResult(name)
+    counter = iter(range(requests))
+
+    async def client(http: httpx.AsyncClient) -> None:
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                resp = await http.post(url, json=payload(i))
+                resp.raise_for_status()
+            except httpx.HTTPError:
+                result.errors += 1
+                continue
+            result.latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(timeout=timeout) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        result.wall = time.perf_counter() - start
+    return result
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+
+    def fmt(v: Any) -> str:
+        return f"{v:.1f}" if isinstance(v, float) else str(v)
+
+    widths = {c: max(len(c), *(len(fmt(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(fmt(r.get(c, "")).ljust(widths[c]) for c in columns))
@@ -0,0 +1,203 @@
+"""
+Peak memory of fetching, extracting and chunking very large pages.
+
+Serves synthetic documentation pages of increasing size from a local HTTP
+server and, for each size, runs the page-processing path of ``/ask-site`` and
+``/ask-smart`` in a fresh child process, ``--concurrency`` pages at a time:
+
+- legacy: ``requests.get(url).text`` parsed whole by ``extract_page``, the
+  path used before streaming extraction;
+- streaming: ``html_extract.fetch_page``, which feeds the response to the
+  parser as it arrives and stops at ``MAX_PAGE_BYTES`` / ``MAX_PAGE_CHARS``.
+
+Reports the child's peak RSS and its growth over the RSS right after imports. With
+streaming it should level off once pages pass the limits; with legacy it grows
+with page size.
+
+Usage (from backend/):
+    python -m bench.page_memory [--sizes-mb 1 5 20 50] [--concurrency 4] [--modes legacy streaming]
+        [--max-page-bytes N] [--max-page-chars N]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from bench.harness import BACKEND_DIR, _rss_kb, print_table
+
+WORDS = (
+    "install configure request response client server cache index query token "
+    "embedding collection document section example parameter return value error "
+    "timeout retry session crawler markdown header table list code block"
+).split()
+
+
+def synthetic_html(target_bytes: int, seed: int = 0) -> bytes:
+    """Markup-heavy documentation page of roughly ``target_bytes``."""
+    rng = random.Random(seed)
+
+    def words(n: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    parts = ["<html><head><title>Big page</title><style>.x{color:red}</style></head><body><main>"]
+    size = len(parts[0])
+    section = 0
+    while size < target_bytes:
+        section += 1
+        block = (
+            f'<section id="s{section}"><h2 class="title">{words(4)}</h2>'
+            f'<div class="content"><p><span class="lead">{words(12)}</span> {words(40)} '
+            f'<a href="/docs/{section}.html">{words(3)}</a></p>'
+            f"<ul><li>{words(8)}</li><li>{words(8)}</li></ul>"
+            f"<pre><code>{words(10)}</code></pre></div>"
+            f"<script>var s{section} = {section};</script></section>"
+        )
+        parts.append(block)
+        size += len(block)
+    parts.append("</main></body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+def serve(pages: Dict[str, bytes]) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = pages.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            view = memoryview(body)
+            try:
+                for i in range(0, len(body), 256 * 1024):
+                    self.wfile.write(view[i:i + 256 * 1024])
+            except ConnectionError:
+                pass  # the streaming path hangs up once it has read enough
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _status_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise OSError(f"{field} not in /proc/self/status")
+
+
+def reset_peak_rss() -> int:
+    """Restart peak-RSS tracking from the current RSS (Linux); returns the current RSS in KB.
+
+    Elsewhere the peak can't be reset, so import-time allocations may mask small deltas.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _status_kb("VmRSS")
+    except OSError:
+        return _rss_kb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def peak_rss_kb() -> int:
+    try:
+        return _status_kb("VmHWM")
+    except OSError:
+        return _rss_kb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def child(url: str, mode: str, concurrency: int) -> None:
+    import requests
+
+    from chunking import chunk_markdown
+    from html_extract import extract_page, fetch_page
+
+    def process() -> Dict[str, Any]:
+        if mode == "legacy":
+            page = extract_page(requests.get(url, timeout=60).text)
+        else:
+            page, _ = fetch_page(url, timeout=60)
+        chunks = chunk_markdown(page.text, max_len=1600)
+        return {"text_chars": len(page.text), "chunks": len(chunks), "truncated": page.truncated}
+
+    gc.collect()
+    baseline = reset_peak_rss()
+    results: List[Dict[str, Any]] = []
+    start = time.perf_counter()
+    threads = [threading.Thread(target=lambda: results.append(process())) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    peak = peak_rss_kb()
+    print(json.dumps({
+        "seconds": time.perf_counter() - start,
+        "baseline_mb": baseline / 1024,
+        "peak_mb": peak / 1024,
+        "peak_delta_mb": (peak - baseline) / 1024,
+        **results[0],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Large-page memory benchmark")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 5, 20, 50])
+    parser.add_argument("--concurrency", type=int, default=4, help="Pages processed at once per run")
+    parser.add_argument("--modes", nargs="+", default=["legacy", "streaming"])
+    parser.add_argument("--max-page-bytes", type=int, help="MAX_PAGE_BYTES for the streaming path")
+    parser.add_argument("--max-page-chars", type=int, help="MAX_PAGE_CHARS for the streaming path")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.url, args.mode, args.concurrency)
+        return
+    for mode in args.modes:
+        if mode not in ("legacy", "streaming"):
+            parser.error(f"unknown mode: {mode}")
+
+    pages = {f"/page-{size:g}.html": synthetic_html(int(size * 1024 * 1024)) for size in args.sizes_mb}
+    server = serve(pages)
+    env = dict(os.environ)
+    if args.max_page_bytes:
+        env["MAX_PAGE_BYTES"] = str(args.max_page_bytes)
+    if args.max_page_chars:
+        env["MAX_PAGE_CHARS"] = str(args.max_page_chars)
+
+    rows = []
+    try:
+        for size in args.sizes_mb:
+            url = f"http://127.0.0.1:{server.server_port}/page-{size:g}.html"
+            for mode in args.modes:
+                out = subprocess.run(
+                    [sys.executable, "-m", "bench.page_memory", "--child", "--url", url,
+                     "--mode", mode, "--concurrency", str(args.concurrency)],
+                    cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+                )
+                result = json.loads(out.stdout.strip().splitlines()[-1])
+                rows.append({"page_mb": float(size), "mode": mode, "concurrency": args.concurrency, **result})
+                print(f"{size:g} MB {mode}: peak +{result['peak_delta_mb']:.1f} MB", flush=True)
+    finally:
+        server.shutdown()
+    print()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Offline end-to-end benchmarks for the QA endpoints and the ingestion CLI.
+
+Starts the stub OpenAI server (bench/stub_openai.py) and the synthetic site
+(bench/stub_site.py) on free local ports, then for each scenario:
+
+- ask, ask-site, ask-smart: starts a fresh ``uvicorn main:app`` pointed at the
+  stub via ``OPENAI_BASE_URL``, sends ``--requests`` requests with
+  ``--concurrency`` clients, and reports p50/p95/mean latency, throughput and
+  the server's peak RSS, plus LLM/embedding calls per request;
+- ingest: runs ``insert_docs.py`` on the site's sitemap with
+  ``--embedding-model openai:text-embedding-3-small`` (served by the stub) and
+  reports wall time, pages/s and peak RSS.
+
+Usage (from backend/):
+    python -m bench.scenarios [ask ask-site ask-smart ingest] [--requests 40] [--concurrency 4]
+        [--llm-latency-ms 400] [--embed-latency-ms 40] [--pages 50]
+
+No network is needed once tiktoken's encodings are cached (set
+``TIKTOKEN_CACHE_DIR`` to a directory that has them). The ingest scenario also
+needs crawl4ai's browser installed.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from bench.harness import LoadResult, free_port, print_table, run_load, spawn, wait_ready
+from bench.stub_site import TOPICS, page_path
+from html_extract import extract_page
+
+SCENARIOS = ("ask", "ask-site", "ask-smart", "ingest")
+
+
+def question(i: int) -> str:
+    return f"How do I configure {TOPICS[i % len(TOPICS)]} retries and timeout?"
+
+
+def build_payloads(site: str, pages: int) -> Dict[str, Callable[[int], Dict[str, Any]]]:
+    """Request bodies for each endpoint, built from the synthetic site's pages."""
+    sample = min(pages, 20)
+    extracted = []
+    for i in range(sample):
+        url = site + page_path(i)
+        page = extract_page(httpx.get(url).text)
+        links = [{"text": l["text"], "href": str(httpx.URL(url).join(l["href"]))} for l in page.links]
+        extracted.append((url, page, links))
+
+    def ask(i: int) -> Dict[str, Any]:
+        _, page, _ = extracted[i % sample]
+        return {"text": page.text, "question": question(i)}
+
+    def ask_site(i: int) -> Dict[str, Any]:
+        urls = [site + page_path((i + k) % pages) for k in range(5)]
+        return {"question": question(i), "urls": urls}
+
+    def ask_smart(i: int) -> Dict[str, Any]:
+        url, page, links = extracted[i % sample]
+        return {"text": page.text, "question": question(i), "links": links, "page_url": url}
+
+    return {"ask": ask, "ask-site": ask_site, "ask-smart": ask_smart}
+
+
+def llm_stats(llm: str) -> Dict[str, int]:
+    return httpx.get(f"{llm}/stats").json()
+
+
+def bench_endpoint(name: str, payload, args, env: Dict[str, str], llm: str) -> LoadResult:
+    port = free_port()
+    server = spawn(f"backend ({name})", ["-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                   env=env, quiet=not args.verbose)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_ready(f"{base}/metrics", server)
+        url = f"{base}/{name}"
+        httpx.post(url, json=payload(0), timeout=300).raise_for_status()  # warm-up
+
+        before = llm_stats(llm)
+        result = asyncio.run(run_load(name, url, payload, args.requests, args.concurrency))
+        after = llm_stats(llm)
+    finally:
+        server.stop()
+    result.peak_rss_kb = server.peak_rss_kb
+    done = max(len(result.latencies), 1)
+    result.extra = {
+        "llm_calls/req": (after.get("chat_requests", 0) - before.get("chat_requests", 0)) / done,
+        "embed_calls/req": (after.get("embedding_requests", 0) - before.get("embedding_requests", 0)) / done,
+    }
+    return result
+
+
+def bench_ingest(site: str, args, env: Dict[str, str]) -> LoadResult:
+    with tempfile.TemporaryDirectory(prefix="bench-ingest-") as tmp:
+        argv = [
+            "insert_docs.py", f"{site}/sitemap.xml",
+            "--collection", "bench",
+            "--db-dir", os.path.join(tmp, "chroma"),
+            "--store-dir", os.path.join(tmp, "corpus"),
+            "--embedding-model", "openai:text-embedding-3-small",
+        ]
+        start = time.perf_counter()
+        proc = spawn("insert_docs", argv, env=env, quiet=not args.verbose)
+        code = proc.wait()
+        wall = time.perf_counter() - start
+    result = LoadResult("ingest", wall=wall, peak_rss_kb=proc.peak_rss_kb)
+    if code == 0:
+        result.latencies.append(wall)
+    else:
+        result.errors += 1
+    result.extra = {"pages": args.pages, "pages/s": args.pages / wall if wall else 0.0}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline QA/ingestion benchmarks")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS),
+                        help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per endpoint scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent clients")
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0, help="Stub chat completion latency")
+    parser.add_argument("--embed-latency-ms", type=float, default=40.0, help="Stub embeddings latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Stub latency jitter")
+    parser.add_argument("--site-latency-ms", type=float, default=20.0, help="Synthetic site response delay")
+    parser.add_argument("--pages", type=int, default=50, help="Pages on the synthetic site")
+    parser.add_argument("--verbose", action="store_true", help="Show server and CLI output")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    llm_port, site_port = free_port(), free_port()
+    llm_proc = spawn("stub_openai", [
+        "-m", "bench.stub_openai", "--port", str(llm_port),
+        "--latency-ms", str(args.llm_latency_ms),
+        "--embed-latency-ms", str(args.embed_latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+    ])
+    site_proc = spawn("stub_site", [
+        "-m", "bench.stub_site", "--port", str(site_port),
+        "--pages", str(args.pages), "--latency-ms", str(args.site_latency_ms),
+    ])
+    llm, site = f"http://127.0.0.1:{llm_port}", f"http://127.0.0.1:{site_port}"
+    env = {"OPENAI_BASE_URL": f"{llm}/v1", "OPENAI_API_BASE": f"{llm}/v1", "OPENAI_API_KEY": "stub"}
+
+    rows: List[Dict[str, Any]] = []
+    try:
+        wait_ready(f"{llm}/health", llm_proc)
+        wait_ready(f"{site}/", site_proc)
+        payloads = build_payloads(site, args.pages)
+        for name in args.scenarios:
+            print(f"Running {name}...")
+            if name == "ingest":
+                result = bench_ingest(site, args, env)
+            else:
+                result = bench_endpoint(name, payloads[name], args, env, llm)
+            rows.append(result.row())
+    finally:
+        llm_proc.stop()
+        site_proc.stop()
+
+    print(f"\nstub latency: chat {args.llm_latency_ms:g} ms, embeddings {args.embed_latency_ms:g} ms, "
+          f"site {args.site_latency_ms:g} ms; concurrency {args.concurrency}\n")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
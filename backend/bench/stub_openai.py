@@ -0,0 +1,195 @@
+"""
+Local OpenAI-compatible stub for offline benchmarks.
+
+Serves ``/v1/chat/completions`` and ``/v1/embeddings`` with a configurable
+latency and deterministic outputs, so the QA graphs, ``rag_agent`` and the
+ingestion CLI (with ``--embedding-model openai:<model>``) can run without
+network access. Point clients at it with ``OPENAI_BASE_URL``:
+
+    python -m bench.stub_openai --port 8901 --latency-ms 400 --embed-latency-ms 40
+    OPENAI_BASE_URL=http://127.0.0.1:8901/v1 OPENAI_API_KEY=stub uvicorn main:app
+
+Responses depend only on the request body: the sufficiency check answers YES
+for a fixed fraction of prompts (``--sufficient-rate``), link selection picks
+links listed in the prompt, FAQ generation returns JSON built from the
+section's words, and embeddings are hashed bag-of-words vectors, so
+texts sharing words are close and retrieval behaves plausibly.
+
+``GET /stats`` returns request and token counts since startup.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Union
+
+import numpy as np
+from fastapi import FastAPI, Request
+
+EMBEDDING_DIM = 1536
+_WORD = re.compile(r"\w+")
+_LINK_LINE = re.compile(r"^- (.*) \((\S+)\)$", re.MULTILINE)
+
+
+def _seed(*parts: Any) -> int:
+    h = hashlib.blake2b(digest_size=8)
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+    return int.from_bytes(h.digest(), "little")
+
+
+def hash_embedding(text: Union[str, List[int]], dim: int = EMBEDDING_DIM) -> List[float]:
+    """Unit-length hashed bag-of-words (or bag-of-token-ids) vector."""
+    features = _WORD.findall(text.lower()) if isinstance(text, str) else text
+    vec = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        h = _seed(feature)
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = float(np.linalg.norm(vec))
+    if norm == 0.0:
+        vec[_seed(json.dumps(text)) % dim] = 1.0
+        norm = 1.0
+    return (vec / norm).tolist()
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _reply(prompt: str, answer_words: int, sufficient_rate: float) -> str:
+    """Deterministic reply shaped like what each call site expects."""
+    rng = random.Random(_seed(prompt))
+    if "Reply with only 'YES'" in prompt:
+        return "YES" if rng.random() < sufficient_rate else "NO"
+    if "Reply with a JSON array" in prompt:
+        links = [{"text": text, "href": href} for text, href in _LINK_LINE.findall(prompt)]
+        rng.shuffle(links)
+        return "```json\n" + json.dumps(links[:3]) + "\n```"
+    if '{"faqs": [' in prompt:
+        section = prompt.split("SECTION", 1)[-1]
+        words = _WORD.findall(section) or ["stub"]
+        faqs = [
+            {"question": "What is " + " ".join(rng.choice(words) for _ in range(5)) + "?",
+             "answer": " ".join(rng.choice(words) for _ in range(25)) + "."}
+            for _ in range(3)
+        ]
+        return json.dumps({"faqs": faqs})
+    if prompt.rstrip().endswith("REWRITTEN QUERY:"):
+        question = re.search(r"USER QUESTION: (.*)", prompt)
+        return question.group(1) if question else prompt[-200:]
+    words = _WORD.findall(prompt) or ["stub"]
+    sentences = []
+    for _ in range(max(1, answer_words // 12)):
+        sentence = " ".join(rng.choice(words) for _ in range(12))
+        sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+    return " ".join(sentences)
+
+
+def create_app(
+    latency_ms: float = 400.0,
+    jitter_ms: float = 0.0,
+    embed_latency_ms: float = 40.0,
+    answer_words: int = 120,
+    sufficient_rate: float = 0.5,
+    dim: int = EMBEDDING_DIM,
+) -> FastAPI:
+    app = FastAPI()
+    stats: Counter = Counter()
+
+    async def delay(base_ms: float, seed: int) -> None:
+        jitter = random.Random(seed).uniform(-jitter_ms, jitter_ms) if jitter_ms else 0.0
+        await asyncio.sleep(max(0.0, base_ms + jitter) / 1000)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Dict[str, Any]:
+        body = await request.json()
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        await delay(latency_ms, _seed(prompt))
+        content = _reply(prompt, answer_words, sufficient_rate)
+        prompt_tokens, completion_tokens = _count_tokens(prompt), _count_tokens(content)
+        stats["chat_requests"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        return {
+            "id": f"chatcmpl-stub-{_seed(prompt):x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request) -> Dict[str, Any]:
+        body = await request.json()
+        inputs = body.get("input", [])
+        # A single string, a list of strings, or (from langchain) lists of token ids.
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        await delay(embed_latency_ms, len(inputs))
+        data = [
+            {"object": "embedding", "index": i, "embedding": hash_embedding(item, dim)}
+            for i, item in enumerate(inputs)
+        ]
+        tokens = sum(len(x) if isinstance(x, list) else _count_tokens(x) for x in inputs)
+        stats["embedding_requests"] += 1
+        stats["embedded_inputs"] += len(inputs)
+        stats["embedding_tokens"] += tokens
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.get("/stats")
+    async def get_stats() -> Dict[str, int]:
+        return dict(stats)
+
+    @app.get("/health")
+    async def health() -> Dict[str, bool]:
+        return {"ok": True}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="Chat completion latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter on every response")
+    parser.add_argument("--embed-latency-ms", type=float, default=40.0, help="Latency per embeddings request")
+    parser.add_argument("--answer-words", type=int, default=120, help="Approximate length of answers")
+    parser.add_argument("--sufficient-rate", type=float, default=0.5,
+                        help="Fraction of sufficiency checks answered YES")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="Embedding dimension")
+    args = parser.parse_args()
+
+    app = create_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        embed_latency_ms=args.embed_latency_ms,
+        answer_words=args.answer_words,
+        sufficient_rate=args.sufficient_rate,
+        dim=args.dim,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
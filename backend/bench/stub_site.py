@@ -0,0 +1,140 @@
+"""
+Synthetic documentation website for offline benchmarks.
+
+Serves ``--pages`` deterministic HTML pages (headings, paragraphs, lists,
+tables, code blocks and a link graph between pages) plus ``/sitemap.xml`` and
+``/llms.txt``, so ``/ask-site``, ``/ask-smart`` and the ingestion CLI can be
+exercised without touching the network:
+
+    python -m bench.stub_site --port 8902 --pages 200 --latency-ms 20
+
+Page ``i`` lives at ``/docs/page-<i>.html``; ``/`` links to all of them.
+"""
+import argparse
+import asyncio
+import html
+import random
+from typing import List
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response
+
+from bench.chunking import WORDS
+
+TOPICS = (
+    "authentication caching deployment indexing pagination webhooks retries "
+    "streaming batching quotas logging migrations"
+).split()
+
+
+def page_path(i: int) -> str:
+    return f"/docs/page-{i}.html"
+
+
+def page_title(i: int) -> str:
+    return f"{TOPICS[i % len(TOPICS)].capitalize()} guide {i}"
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    return "<p>" + " ".join(_sentence(rng) for _ in range(rng.randint(2, 6))) + "</p>"
+
+
+def page_links(i: int, pages: int) -> List[int]:
+    """Outgoing links of page ``i``: its neighbours plus a few seeded random pages."""
+    rng = random.Random(i * 7919)
+    targets = {(i + 1) % pages, (i - 1) % pages, (i * 2 + 1) % pages}
+    targets.update(rng.randrange(pages) for _ in range(5))
+    targets.discard(i)
+    return sorted(targets)
+
+
+def render_page(i: int, pages: int, sections: int = 6) -> str:
+    rng = random.Random(i)
+    title = page_title(i)
+    parts = [f"<html><head><title>{html.escape(title)}</title>",
+             "<style>body { font-family: sans-serif }</style></head><body>",
+             "<nav><ul>"]
+    parts += [f'<li><a href="{page_path(j)}">{html.escape(page_title(j))}</a></li>'
+              for j in page_links(i, pages)]
+    parts.append(f"</ul></nav><main><h1>{html.escape(title)}</h1>")
+    parts.append(_paragraph(rng))
+    for s in range(sections):
+        parts.append(f"<h2>{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} ({i}.{s})</h2>")
+        for _ in range(rng.randint(1, 3)):
+            parts.append(_paragraph(rng))
+        kind = rng.random()
+        if kind < 0.3:
+            parts.append("<ul>" + "".join(f"<li>{_sentence(rng)}</li>" for _ in range(rng.randint(3, 8))) + "</ul>")
+        elif kind < 0.5:
+            rows = "".join(
+                f"<tr><td>{rng.choice(WORDS)}</td><td>{rng.randint(1, 999)}</td><td>{_sentence(rng)}</td></tr>"
+                for _ in range(rng.randint(3, 10))
+            )
+            parts.append(f"<table><tr><th>name</th><th>value</th><th>notes</th></tr>{rows}</table>")
+        elif kind < 0.7:
+            code = "\n".join(f"{rng.choice(WORDS)}({rng.choice(WORDS)}={rng.randint(0, 99)})"
+                             for _ in range(rng.randint(3, 12)))
+            parts.append(f"<pre><code>{html.escape(code)}</code></pre>")
+        if rng.random() < 0.3:
+            parts.append(f"<h3>{rng.choice(WORDS).capitalize()} notes</h3>{_paragraph(rng)}")
+    parts.append("</main><script>console.log('analytics');</script></body></html>")
+    return "\n".join(parts)
+
+
+def create_app(pages: int = 50, latency_ms: float = 0.0) -> FastAPI:
+    app = FastAPI()
+
+    def base_url(request: Request) -> str:
+        return str(request.base_url).rstrip("/")
+
+    async def delay() -> None:
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+    @app.get("/", response_class=HTMLResponse)
+    async def index():
+        await delay()
+        links = "".join(f'<li><a href="{page_path(i)}">{html.escape(page_title(i))}</a></li>' for i in range(pages))
+        return f"<html><head><title>Docs</title></head><body><h1>Docs</h1><ul>{links}</ul></body></html>"
+
+    @app.get("/docs/page-{i}.html", response_class=HTMLResponse)
+    async def page(i: int):
+        if not 0 <= i < pages:
+            raise HTTPException(status_code=404)
+        await delay()
+        return render_page(i, pages)
+
+    @app.get("/sitemap.xml")
+    async def sitemap(request: Request):
+        base = base_url(request)
+        urls = "".join(f"<url><loc>{base}{page_path(i)}</loc></url>" for i in range(pages))
+        body = f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+        return Response(body, media_type="application/xml")
+
+    @app.get("/llms.txt", response_class=PlainTextResponse)
+    async def llms_txt(request: Request):
+        base = base_url(request)
+        return "\n".join(f"- [{page_title(i)}]({base}{page_path(i)})" for i in range(pages))
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Synthetic documentation site")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8902)
+    parser.add_argument("--pages", type=int, default=50, help="Number of pages")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before every response")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.pages, args.latency_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
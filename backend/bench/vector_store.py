@@ -0,0 +1,182 @@
+"""
+Memory and recall of the Chroma and memory-mapped vector stores.
+
+Builds the same synthetic collection (clustered unit vectors, like sentence
+embeddings of documentation chunks) in each store, then opens it in a fresh
+child process, the way a server worker would, and runs ``--queries`` queries:
+
+- chroma: the current setup, ``chromadb.PersistentClient`` with cosine HNSW;
+- mmap-int8 / mmap-float16: ``mmap_store.MmapVectorClient`` (``VECTOR_STORE=mmap``).
+
+For each store it reports recall@k against exact brute-force search, query
+latency, the child's RSS growth after the queries split into anonymous memory
+(heap, private to each worker) and file-backed memory (mapped files, shared
+page cache), and those extrapolated to a million chunks along with the size
+on disk. The mmap stores' anonymous memory is mostly a fixed scan buffer, so
+its extrapolation overstates it for small ``--n``; run with ``--n 1000000``
+for direct numbers.
+
+Usage (from backend/):
+    python -m bench.vector_store [--n 100000] [--dim 384] [--queries 200] [--k 10]
+        [--stores chroma mmap-int8 mmap-float16] [--rerank-factor 8]
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+import numpy as np
+
+from bench.harness import BACKEND_DIR, print_table
+
+STORES = ("chroma", "mmap-int8", "mmap-float16")
+COLLECTION = "bench"
+
+
+def synthetic_vectors(n: int, dim: int, seed: int, clusters: int = 1000) -> np.ndarray:
+    """Unit vectors scattered around ``clusters`` topic directions."""
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(1234).normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 1.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = np.empty((len(vectors), len(queries)), dtype=np.float32)
+    for i in range(0, len(vectors), 65536):
+        scores[i:i + 65536] = vectors[i:i + 65536] @ queries.T
+    return np.argsort(-scores, axis=0)[:k].T
+
+
+def _client(store: str, directory: str):
+    if store == "chroma":
+        import chromadb
+
+        return chromadb.PersistentClient(directory)
+    from mmap_store import MmapVectorClient
+
+    return MmapVectorClient(directory)
+
+
+def build(store: str, directory: str, vectors: np.ndarray, batch: int = 5000) -> float:
+    client = _client(store, directory)
+    metadata = {"hnsw:space": "cosine"}
+    if store.startswith("mmap-"):
+        metadata["quantization"] = store.split("-", 1)[1]
+    collection = client.create_collection(COLLECTION, metadata=metadata)
+    start = time.perf_counter()
+    for i in range(0, len(vectors), batch):
+        ids = [str(j) for j in range(i, min(i + batch, len(vectors)))]
+        collection.upsert(ids=ids, documents=[f"chunk {j}" for j in ids],
+                          metadatas=[{"source": f"page-{int(j) // 20}"} for j in ids],
+                          embeddings=vectors[i:i + batch])
+    return time.perf_counter() - start
+
+
+def _memory_kb() -> Dict[str, int]:
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0])
+    return fields
+
+
+def dir_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(directory) for name in names)
+
+
+def child(store: str, directory: str, data: str, k: int) -> None:
+    queries = np.load(os.path.join(data, "queries.npy"))
+    truth = np.load(os.path.join(data, "truth.npy"))
+    client = _client(store, directory)
+    gc.collect()
+    before = _memory_kb()
+    collection = client.get_collection(COLLECTION)
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+        latencies.append(time.perf_counter() - start)
+        found = {int(i) for i in result["ids"][0]}
+        recalls.append(len(found & set(expected.tolist())) / k)
+    after = _memory_kb()
+    latencies.sort()
+    print(json.dumps({
+        "recall": statistics.fmean(recalls),
+        "p50_ms": 1000 * latencies[len(latencies) // 2],
+        "p95_ms": 1000 * latencies[int(len(latencies) * 0.95)],
+        **{f"{name}_kb": after.get(name, 0) - before.get(name, 0) for name in ("VmRSS", "RssAnon", "RssFile")},
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector store memory and recall benchmark")
+    parser.add_argument("--n", type=int, default=100_000, help="Chunks in the collection")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--stores", nargs="+", default=list(STORES))
+    parser.add_argument("--rerank-factor", type=int, help="MMAP_RERANK_FACTOR for the mmap stores")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.store, args.dir, args.data, args.k)
+        return
+    for store in args.stores:
+        if store not in STORES:
+            parser.error(f"unknown store: {store}")
+
+    vectors = synthetic_vectors(args.n, args.dim, seed=0)
+    queries = synthetic_vectors(args.queries, args.dim, seed=1)
+    env = dict(os.environ)
+    if args.rerank_factor:
+        env["MMAP_RERANK_FACTOR"] = str(args.rerank_factor)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as data:
+        np.save(os.path.join(data, "queries.npy"), queries)
+        np.save(os.path.join(data, "truth.npy"), exact_top_k(vectors, queries, args.k))
+        for store in args.stores:
+            directory = os.path.join(data, store)
+            build_seconds = build(store, directory, vectors)
+            gc.collect()
+            out = subprocess.run(
+                [sys.executable, "-m", "bench.vector_store", "--child", "--store", store, "--dir", directory,
+                 "--data", data, "--k", str(args.k)],
+                cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+            )
+            result: Dict[str, Any] = json.loads(out.stdout.strip().splitlines()[-1])
+            per_million = 1_000_000 / args.n / 1024
+            rows.append({
+                "store": store,
+                "chunks": args.n,
+                "build_s": build_seconds,
+                f"recall@{args.k}": f"{result['recall']:.3f}",
+                "p50_ms": result["p50_ms"],
+                "p95_ms": result["p95_ms"],
+                "anon_mb": result["RssAnon_kb"] / 1024,
+                "file_mb": result["RssFile_kb"] / 1024,
+                "anon_mb_per_1m": result["RssAnon_kb"] * per_million,
+                "file_mb_per_1m": result["RssFile_kb"] * per_million,
+                "disk_mb_per_1m": dir_size(directory) / 1024 * per_million,
+            })
+            print(f"{store}: recall {result['recall']:.3f}, p50 {result['p50_ms']:.1f} ms", flush=True)
+    print()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Structure-aware chunking shared by the online QA graphs and ``insert_docs``.
+
+A single pass over the lines of a markdown document groups them into blocks
+(headings, paragraphs, lists, tables, fenced code) and packs whole blocks into
+chunks of at most ``max_len`` characters. Headings start a new chunk (unless
+the current one is still small) and update the header breadcrumb recorded for
+the chunks that follow. Blocks that are too large on their own are broken at
+line, then sentence, then word boundaries, so words are only cut when a single
+word exceeds ``max_len``.
+
+HTML is handled by converting it to the same markdown shape first
+(see :mod:`html_extract`).
+"""
+
+import re
+from typing import Iterator, List, Optional, Tuple
+
+from text_spans import SpanChunks
+
+PARAGRAPH = "paragraph"
+HEADING = "heading"
+LIST = "list"
+TABLE = "table"
+CODE = "code"
+
+_HEADING = re.compile(r"[ ]{0,3}(#{1,6})[ \t]+\S")
+_LIST_ITEM = re.compile(r"[ \t]*(?:[-*+]|\d{1,9}[.)])[ \t]+\S")
+_FENCE = re.compile(r"[ ]{0,3}(`{3,}|~{3,})")
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]?\s")
+
+# (kind, start, end, heading level)
+Block = Tuple[str, int, int, int]
+
+
+def iter_blocks(text: str) -> Iterator[Block]:
+    """Yield the markdown blocks of ``text`` as ``(kind, start, end, level)`` spans.
+
+    ``level`` is the heading depth for ``HEADING`` blocks and ``0`` otherwise.
+    """
+    kind: Optional[str] = None
+    start = end = 0
+    fence: Optional[str] = None
+    pos, n = 0, len(text)
+
+    while pos < n:
+        nl = text.find("\n", pos)
+        if nl == -1:
+            nl = n
+        line_start, line_end = pos, nl
+        pos = nl + 1
+        line = text[line_start:line_end]
+
+        if fence is not None:
+            end = line_end
+            if line.strip().startswith(fence):
+                yield CODE, start, end, 0
+                kind = fence = None
+            continue
+
+        if not line.strip():
+            if kind is not None:
+                yield kind, start, end, 0
+                kind = None
+            continue
+
+        m = _FENCE.match(line)
+        if m:
+            if kind is not None:
+                yield kind, start, end, 0
+            kind, fence = CODE, m.group(1)
+            start, end = line_start, line_end
+            continue
+
+        m = _HEADING.match(line)
+        if m:
+            if kind is not None:
+                yield kind, start, end, 0
+                kind = None
+            yield HEADING, line_start, line_end, len(m.group(1))
+            continue
+
+        indented = line[:1] in (" ", "\t")
+        if line.lstrip().startswith("|"):
+            line_kind = TABLE
+        elif _LIST_ITEM.match(line) or (kind == LIST and indented):
+            line_kind = LIST
+        else:
+            line_kind = PARAGRAPH
+
+        if kind == line_kind:
+            end = line_end
+        else:
+            if kind is not None:
+                yield kind, start, end, 0
+            kind, start, end = line_kind, line_start, line_end
+
+    if kind is not None:
+        yield kind, start, end, 0
+
+
+def _split_line(text: str, start: int, end: int, max_len: int) -> Iterator[Tuple[int, int]]:
+    """Break one overlong line at sentence ends, then whitespace, then hard."""
+    pos = start
+    while end - pos > max_len:
+        limit = pos + max_len
+        cut = -1
+        for m in _SENTENCE_END.finditer(text, pos, limit):
+            cut = m.end()
+        if cut <= pos:
+            cut = text.rfind(" ", pos, limit)
+        if cut <= pos:
+            cut = limit
+        yield pos, cut
+        pos = cut
+        while pos < end and text[pos].isspace():
+            pos += 1
+    if pos < end:
+        yield pos, end
+
+
+def _block_units(text: str, start: int, end: int, max_len: int) -> Iterator[Tuple[int, int]]:
+    """Split an oversized block into line-sized (or smaller) units."""
+    pos = start
+    while pos < end:
+        nl = text.find("\n", pos, end)
+        line_end = end if nl == -1 else nl
+        if line_end - pos <= max_len:
+            yield pos, line_end
+        else:
+            yield from _split_line(text, pos, line_end, max_len)
+        pos = line_end + 1
+
+
+class _Packer:
+    """Greedily packs consecutive units into chunks of at most ``max_len`` chars."""
+
+    __slots__ = ("out", "max_len", "start", "end", "section", "current_section")
+
+    def __init__(self, out: SpanChunks, max_len: int):
+        self.out = out
+        self.max_len = max_len
+        self.start = -1
+        self.end = -1
+        self.section = -1  # section of the chunk being built
+        self.current_section = -1  # section of the most recent heading
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start if self.start >= 0 else 0
+
+    def flush(self) -> None:
+        if self.start < 0:
+            return
+        text, start, end = self.out.text, self.start, self.end
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            self.out.append(start, end, self.section)
+        self.start = self.end = -1
+
+    def add(self, start: int, end: int) -> None:
+        if self.start >= 0 and end - self.start > self.max_len:
+            self.flush()
+        if self.start < 0:
+            self.start = start
+            self.section = self.current_section
+        self.end = end
+
+
+def chunk_markdown(text: str, max_len: int = 1600, min_len: Optional[int] = None) -> SpanChunks:
+    """Chunk markdown (or plain text) along its block structure.
+
+    Args:
+        text: Markdown text to chunk
+        max_len: Maximum chunk length in characters
+        min_len: A heading only starts a new chunk once the current one has at
+            least this many characters (default ``max_len // 2``), so runs of
+            short sections are packed together
+
+    Returns:
+        Chunk spans over ``text``, each tagged with the header breadcrumb of
+        the section it starts in
+    """
+    if min_len is None:
+        min_len = max_len // 2
+    out = SpanChunks(text)
+    packer = _Packer(out, max_len)
+    headings: List[Tuple[int, str]] = []
+
+    for kind, start, end, level in iter_blocks(text):
+        if kind == HEADING:
+            if packer.size >= min_len:
+                packer.flush()
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, text[start:end].strip()))
+            packer.current_section = out.add_breadcrumb(" > ".join(h for _, h in headings))
+            packer.add(start, end)
+        elif end - start <= max_len:
+            packer.add(start, end)
+        else:
+            for unit_start, unit_end in _block_units(text, start, end, max_len):
+                packer.add(unit_start, unit_end)
+    packer.flush()
+    return out
@@ -0,0 +1,126 @@
+"""Content-addressed store for page text uploaded by the extension.
+
+The extension hashes a page's text (SHA-256 of its UTF-8 bytes), asks which
+hashes the backend is missing, uploads only those, and then refers to the page
+by hash in ``/ask`` and ``/ask-smart``. Re-asking on an unchanged page
+therefore sends a 64-character reference instead of the whole text.
+
+Entries are kept in memory, least recently used first out, up to
+``CONTENT_STORE_MAX_BYTES``. With ``SHARED_STORE_PATH`` set they go to the
+shared SQLite store instead (oldest first out), so a page uploaded through one
+worker process can be referenced through any other.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel, model_validator
+
+from shared_store import SharedStore, shared_store
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ContentStore:
+    """Bounded LRU of texts keyed by their SHA-256."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, text: str, expected_hash: Optional[str] = None) -> str:
+        """Store ``text``; raises ``ValueError`` if it doesn't hash to ``expected_hash``."""
+        digest = content_hash(text)
+        if expected_hash is not None and digest != expected_hash.lower():
+            raise ValueError(f"content hashes to {digest}, not {expected_hash}")
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            if digest in self._texts:
+                self._texts.move_to_end(digest)
+                return digest
+            self._texts[digest] = text
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._texts) > 1:
+                _, evicted = self._texts.popitem(last=False)
+                self._bytes -= len(evicted.encode("utf-8"))
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            text = self._texts.get(digest.lower())
+            if text is not None:
+                self._texts.move_to_end(digest.lower())
+            return text
+
+    def missing(self, digests: Iterable[str]) -> List[str]:
+        with self._lock:
+            return [d for d in digests if d.lower() not in self._texts]
+
+
+class SharedContentStore:
+    """:class:`ContentStore` interface over the ``content`` namespace of a :class:`SharedStore`."""
+
+    NAMESPACE = "content"
+
+    def __init__(self, store: SharedStore, max_bytes: int = 256 * 1024 * 1024):
+        self.store = store
+        store.set_limit(self.NAMESPACE, max_bytes)
+
+    def put(self, text: str, expected_hash: Optional[str] = None) -> str:
+        digest = content_hash(text)
+        if expected_hash is not None and digest != expected_hash.lower():
+            raise ValueError(f"content hashes to {digest}, not {expected_hash}")
+        if self.store.get(self.NAMESPACE, digest) is None:
+            self.store.put(self.NAMESPACE, digest, text.encode("utf-8"))
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        data = self.store.get(self.NAMESPACE, digest.lower())
+        return data.decode("utf-8") if data is not None else None
+
+    def missing(self, digests: Iterable[str]) -> List[str]:
+        digests = list(digests)
+        present = self.store.get_many(self.NAMESPACE, [d.lower() for d in digests])
+        return [d for d in digests if d.lower() not in present]
+
+
+_max_bytes = int(os.getenv("CONTENT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+content_store = SharedContentStore(shared_store, _max_bytes) if shared_store is not None else ContentStore(_max_bytes)
+
+
+def resolve_content(text: Optional[str], content_ref: Optional[str]) -> str:
+    """The inline ``text`` of a request, or the stored text ``content_ref`` points to.
+
+    Raises 409 with the missing hash when the reference is unknown (e.g. evicted),
+    so the client can upload the text and retry.
+    """
+    if text is not None:
+        return text
+    stored = content_store.get(content_ref or "")
+    if stored is None:
+        raise HTTPException(status_code=409, detail={"error": "content_missing", "missing": [content_ref]})
+    return stored
+
+
+class TextOrRef(BaseModel):
+    """Request body carrying page text inline or as a reference to uploaded content."""
+
+    text: Optional[str] = None
+    content_ref: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _exactly_one(self):
+        if (self.text is None) == (self.content_ref is None):
+            raise ValueError("give exactly one of text or content_ref")
+        return self
+
+    def resolved_text(self) -> str:
+        return resolve_content(self.text, self.content_ref)
@@ -0,0 +1,210 @@
+"""Token-budgeted context packing for the QA prompts.
+
+Retrieved chunks of the same page are often neighbours. The builder merges
+chunks whose character spans overlap, touch, or are separated only by
+whitespace in the source text (``chunking.chunk_markdown`` trims each chunk)
+into a single segment, then packs segments in relevance order until the token
+budget is spent.
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+import tiktoken
+
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_TOKEN_BUDGET = 6000
+SEPARATOR = "\n\n---\n\n"
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model: str = DEFAULT_MODEL) -> "tiktoken.Encoding":
+    """Return the tiktoken encoding used by ``model``."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Count the tokens ``text`` occupies in a prompt for ``model``."""
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+@dataclass
+class Segment:
+    """A contiguous span of one source, built from one or more chunks."""
+    text: str
+    metadata: Dict[str, Any]
+    rank: int
+    start_char: Optional[int] = None
+    end_char: Optional[int] = None
+    chunk_ids: List[Any] = field(default_factory=list)
+
+
+@dataclass
+class PackedContext:
+    """Result of :func:`build_context`."""
+    text: str
+    segments: List[Segment]
+    naive_tokens: int
+    prompt_tokens: int
+    dropped_segments: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.naive_tokens - self.prompt_tokens
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "naive_tokens": self.naive_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "tokens_saved": self.tokens_saved,
+            "segments": len(self.segments),
+            "dropped_segments": self.dropped_segments,
+        }
+
+
+def _source_key(metadata: Dict[str, Any]) -> Any:
+    return metadata.get("url") or metadata.get("source") or ""
+
+
+def _whitespace_gap(text: Optional[str], current: Segment, nxt: Segment) -> Optional[str]:
+    """The source text between two chunks if it is only whitespace and both chunks match ``text``."""
+    if text is None:
+        return None
+    gap = text[current.end_char:nxt.start_char]
+    if gap.strip() or not text.startswith(nxt.text, nxt.start_char) \
+            or not text.endswith(current.text, 0, current.end_char):
+        return None
+    return gap
+
+
+def merge_overlapping(docs: List[Any], texts: Optional[Dict[Any, str]] = None) -> List[Segment]:
+    """Merge chunks of the same source whose ``start_char``/``end_char`` spans touch.
+
+    ``docs`` must be in relevance order; a merged segment keeps the best rank of
+    its members. Chunks without offsets are passed through unmerged, and chunks
+    whose text disagrees with their offsets are never glued together. With
+    ``texts`` (full text per source, keyed by ``url`` or ``source`` metadata),
+    chunks separated only by whitespace are merged too.
+    """
+    by_source: Dict[Any, List[Segment]] = {}
+    passthrough: List[Segment] = []
+    seen = set()
+
+    for rank, doc in enumerate(docs):
+        meta = dict(doc.metadata or {})
+        start, end = meta.get("start_char"), meta.get("end_char")
+        seg = Segment(
+            text=doc.page_content,
+            metadata=meta,
+            rank=rank,
+            start_char=start,
+            end_char=end,
+            chunk_ids=[meta.get("chunk_id")],
+        )
+        if start is None or end is None:
+            passthrough.append(seg)
+            continue
+        key = (_source_key(meta), start, end)
+        if key in seen:
+            continue
+        seen.add(key)
+        by_source.setdefault(_source_key(meta), []).append(seg)
+
+    merged: List[Segment] = []
+    for source, segs in by_source.items():
+        segs.sort(key=lambda s: s.start_char)
+        source_text = texts.get(source) if texts else None
+        current = segs[0]
+        for nxt in segs[1:]:
+            if nxt.start_char > current.end_char:
+                gap = _whitespace_gap(source_text, current, nxt)
+                if gap is None:
+                    merged.append(current)
+                    current = nxt
+                    continue
+                current.text += gap + nxt.text
+                current.end_char = nxt.end_char
+                current.rank = min(current.rank, nxt.rank)
+                current.chunk_ids.extend(nxt.chunk_ids)
+                continue
+            if nxt.end_char <= current.end_char:
+                # Fully contained in the current span.
+                current.rank = min(current.rank, nxt.rank)
+                current.chunk_ids.extend(nxt.chunk_ids)
+                continue
+            overlap = current.end_char - nxt.start_char
+            if not current.text.endswith(nxt.text[:overlap]):
+                # Offsets don't describe the text; keep both chunks verbatim.
+                merged.append(current)
+                current = nxt
+                continue
+            current.text += nxt.text[overlap:]
+            current.end_char = nxt.end_char
+            current.rank = min(current.rank, nxt.rank)
+            current.chunk_ids.extend(nxt.chunk_ids)
+        merged.append(current)
+
+    segments = merged + passthrough
+    segments.sort(key=lambda s: s.rank)
+    return segments
+
+
+def build_context(
+    docs: List[Any],
+    format_segment: Callable[[Segment], str],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    model: str = DEFAULT_MODEL,
+    separator: str = SEPARATOR,
+    texts: Optional[Dict[Any, str]] = None,
+) -> PackedContext:
+    """Merge redundant chunks and pack them by relevance under ``token_budget``.
+
+    Args:
+        docs: Retrieved documents, most relevant first
+        format_segment: Renders a segment (including any source header) as prompt text
+        token_budget: Maximum number of tokens the packed context may use
+        model: Model whose tokenizer is used for counting
+        separator: Text placed between segments
+        texts: Full text of each source, keyed by its ``url`` (or ``source``)
+            metadata, so chunks separated only by whitespace can be merged
+
+    Returns:
+        The packed context along with token accounting
+    """
+    enc = get_encoding(model)
+
+    def n_tokens(text: str) -> int:
+        return len(enc.encode(text, disallowed_special=()))
+
+    sep_tokens = n_tokens(separator)
+    naive_parts = [
+        format_segment(Segment(text=d.page_content, metadata=dict(d.metadata or {}), rank=i))
+        for i, d in enumerate(docs)
+    ]
+    naive_tokens = n_tokens(separator.join(naive_parts)) if naive_parts else 0
+
+    packed: List[Segment] = []
+    parts: List[str] = []
+    used = 0
+    dropped = 0
+    for seg in merge_overlapping(docs, texts):
+        rendered = format_segment(seg)
+        cost = n_tokens(rendered) + (sep_tokens if parts else 0)
+        if used + cost > token_budget:
+            dropped += 1
+            continue
+        packed.append(seg)
+        parts.append(rendered)
+        used += cost
+
+    return PackedContext(
+        text=separator.join(parts),
+        segments=packed,
+        naive_tokens=naive_tokens,
+        prompt_tokens=used,
+        dropped_segments=dropped,
+    )
@@ -0,0 +1,157 @@
+"""Compact on-disk store for crawled markdown.
+
+A store is a directory with two append-only files:
+
+    pages.zst    concatenated zstd frames, one per stored page version
+    index.jsonl  one JSON line per frame: url, fetched_at, sha256, offset, length, size
+
+The index is small and is loaded into memory on open (the last line for a URL
+wins). Page bodies stay on disk and are read through a memory map, so opening
+a store with thousands of pages costs only the index. Re-storing a page whose
+content hash has not changed only appends an index line.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+import zstandard
+
+DATA_FILE = "pages.zst"
+INDEX_FILE = "index.jsonl"
+
+
+@dataclass
+class PageEntry:
+    url: str
+    fetched_at: float
+    sha256: str
+    offset: int
+    length: int
+    size: int
+
+
+class CorpusStore:
+    """Append-only, zstd-compressed page store with an in-memory offset index."""
+
+    def __init__(self, path: str, level: int = 10):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._data_path = os.path.join(path, DATA_FILE)
+        self._index_path = os.path.join(path, INDEX_FILE)
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._entries: Dict[str, PageEntry] = {}
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+        self._load_index()
+
+    def _load_index(self) -> None:
+        if not os.path.exists(self._index_path):
+            return
+        data_size = os.path.getsize(self._data_path) if os.path.exists(self._data_path) else 0
+        with open(self._index_path, "rb") as f:
+            content = f.read()
+        end = content.rfind(b"\n") + 1
+        for line in content[:end].splitlines():
+            try:
+                entry = PageEntry(**json.loads(line))
+            except (ValueError, TypeError):
+                continue
+            if entry.offset + entry.length <= data_size:
+                self._entries[entry.url] = entry
+        if end < len(content):
+            # Torn write at the end of the index: cut it off, or the next line would be appended to it.
+            with open(self._index_path, "r+b") as f:
+                f.truncate(end)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._entries
+
+    def entries(self) -> List[PageEntry]:
+        """Latest entry for every stored URL."""
+        return list(self._entries.values())
+
+    def put(self, url: str, markdown: str, fetched_at: Optional[float] = None) -> bool:
+        """Store a fetched page. Returns ``False`` if the content is unchanged since the last fetch."""
+        raw = markdown.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        previous = self._entries.get(url)
+
+        if previous is not None and previous.sha256 == digest:
+            entry = PageEntry(url, fetched_at, digest, previous.offset, previous.length, previous.size)
+            changed = False
+        else:
+            frame = self._compressor.compress(raw)
+            with open(self._data_path, "ab") as f:
+                offset = f.tell()
+                f.write(frame)
+            entry = PageEntry(url, fetched_at, digest, offset, len(frame), len(raw))
+            changed = True
+
+        # The index line is written after the data it points to, so a crash
+        # can only leave unreferenced bytes behind, never a dangling entry.
+        with open(self._index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(entry)) + "\n")
+        self._entries[url] = entry
+        return changed
+
+    def _view(self, end: int) -> memoryview:
+        if self._mmap is None or end > self._mapped_size:
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self._data_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = len(self._mmap)
+        return memoryview(self._mmap)
+
+    def get(self, url: str) -> Optional[str]:
+        """Markdown of the latest stored version of ``url``."""
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        view = self._view(entry.offset + entry.length)
+        frame = view[entry.offset:entry.offset + entry.length]
+        try:
+            return self._decompressor.decompress(frame, max_output_size=entry.size).decode("utf-8")
+        finally:
+            frame.release()
+            view.release()
+
+    def iter_pages(self) -> Iterator[Dict[str, object]]:
+        """Yield stored pages in the same shape as the ``insert_docs`` crawl results."""
+        for entry in sorted(self._entries.values(), key=lambda e: e.offset):
+            yield {
+                "url": entry.url,
+                "markdown": self.get(entry.url),
+                "fetched_at": entry.fetched_at,
+                "sha256": entry.sha256,
+            }
+
+    def stats(self) -> Dict[str, int]:
+        data_size = os.path.getsize(self._data_path) if os.path.exists(self._data_path) else 0
+        return {
+            "pages": len(self._entries),
+            "raw_bytes": sum(e.size for e in self._entries.values()),
+            "stored_bytes": data_size,
+        }
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            self._mapped_size = 0
+
+    def __enter__(self) -> "CorpusStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
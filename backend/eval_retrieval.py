@@ -0,0 +1,257 @@
+"""
+eval_retrieval.py
+-----------------
+Measure retrieval quality (recall@k, MRR) and query latency of ChromaDB collections
+against a set of questions with known source pages.
+
+Evaluate an existing collection:
+    python eval_retrieval.py --qa qa.jsonl --collection docs [--db-dir ./chroma_db]
+                             [--embedding-model all-MiniLM-L6-v2] [--k 1,3,5,10]
+
+Sweep index settings over a corpus store (see corpus_store.py); every combination
+is built in a scratch directory, and chunks are embedded once per
+(chunk size, embedding model) and reused for every HNSW variant:
+    python eval_retrieval.py --qa qa.jsonl --store ./corpus/docs --sweep \\
+        --spaces cosine,l2,ip --m 16,32 --ef 10,100 --chunk-sizes 800,1600 \\
+        --embedding-models all-MiniLM-L6-v2,all-mpnet-base-v2
+
+QA file: one JSON object per line, {"question": "...", "sources": ["https://..."]}.
+A question counts as answered at k when a chunk of one of its sources is in the top k.
+Bootstrap one from the headings of a corpus store with --make-qa N.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from more_itertools import batched
+
+from corpus_store import CorpusStore
+from insert_docs import build_chunks
+from utils import add_documents_to_collection, get_chroma_client, get_embedding_function, get_or_create_collection
+
+_HEADING = re.compile(r"^#{1,4}\s+(.+?)\s*#*$", re.MULTILINE)
+
+
+@dataclass
+class QAItem:
+    question: str
+    sources: Set[str]
+
+
+def normalize_url(url: str) -> str:
+    return url.split("#", 1)[0].rstrip("/")
+
+
+def load_qa(path: str) -> List[QAItem]:
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            sources = row.get("sources") or [row["source"]]
+            items.append(QAItem(row["question"], {normalize_url(s) for s in sources}))
+    return items
+
+
+def make_qa(store: CorpusStore, n: int, seed: int = 0) -> List[QAItem]:
+    """Use section headings of random stored pages as questions answered by that page."""
+    rng = random.Random(seed)
+    candidates = []
+    for page in store.iter_pages():
+        for heading in _HEADING.findall(page["markdown"]):
+            if len(heading.split()) >= 3:
+                candidates.append(QAItem(heading, {normalize_url(page["url"])}))
+    rng.shuffle(candidates)
+    return candidates[:n]
+
+
+def embed_texts(embedding_model: str, texts: List[str], batch_size: int = 256) -> List[Any]:
+    embed = get_embedding_function(embedding_model)
+    vectors: List[Any] = []
+    for batch in batched(texts, batch_size):
+        vectors.extend(embed(list(batch)))
+    return vectors
+
+
+def evaluate(collection, items: List[QAItem], query_vectors: List[Any], ks: List[int]) -> Dict[str, float]:
+    """Query once per question and score the ranked sources."""
+    max_k = max(ks)
+    hits_at = {k: 0 for k in ks}
+    reciprocal_ranks = []
+    latencies = []
+    for item, vector in zip(items, query_vectors):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[vector], n_results=max_k, include=["metadatas"])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        ranked = [normalize_url(str(m.get("source", ""))) for m in result["metadatas"][0]]
+        first = next((rank for rank, source in enumerate(ranked, 1) if source in item.sources), None)
+        reciprocal_ranks.append(1.0 / first if first else 0.0)
+        for k in ks:
+            if first is not None and first <= k:
+                hits_at[k] += 1
+
+    n = max(len(items), 1)
+    latencies.sort()
+    row = {f"recall@{k}": hits_at[k] / n for k in ks}
+    row["mrr"] = sum(reciprocal_ranks) / n
+    row["p50_ms"] = _percentile(latencies, 50)
+    row["p95_ms"] = _percentile(latencies, 95)
+    row["p99_ms"] = _percentile(latencies, 99)
+    row["mean_ms"] = statistics.fmean(latencies) if latencies else 0.0
+    return row
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def _embed_questions(items: List[QAItem], embedding_model: str) -> Tuple[List[Any], float]:
+    start = time.perf_counter()
+    vectors = embed_texts(embedding_model, [item.question for item in items])
+    per_query_ms = (time.perf_counter() - start) * 1000 / max(len(items), 1)
+    return vectors, per_query_ms
+
+
+def evaluate_existing(args, items: List[QAItem], ks: List[int]) -> List[Dict[str, Any]]:
+    client = get_chroma_client(args.db_dir)
+    collection = get_or_create_collection(client, args.collection, embedding_model_name=args.embedding_model)
+    vectors, embed_ms = _embed_questions(items, args.embedding_model)
+    row = {"collection": args.collection, "chunks": collection.count(), **collection.metadata}
+    row.update(evaluate(collection, items, vectors, ks))
+    row["embed_ms/q"] = embed_ms
+    return [row]
+
+
+def sweep(args, store: CorpusStore, items: List[QAItem], ks: List[int]) -> Iterable[Dict[str, Any]]:
+    scratch = args.scratch_dir or tempfile.mkdtemp(prefix="eval-retrieval-")
+    client = get_chroma_client(scratch)
+    pages = list(store.iter_pages())
+    try:
+        for model, chunk_size in itertools.product(args.embedding_models, args.chunk_sizes):
+            ids, documents, metadatas = build_chunks(pages, chunk_size=chunk_size)
+            start = time.perf_counter()
+            embeddings = embed_texts(model, documents)
+            embed_s = time.perf_counter() - start
+            vectors, embed_ms = _embed_questions(items, model)
+            print(f"{model}, chunk size {chunk_size}: {len(documents)} chunks embedded in {embed_s:.1f}s")
+
+            for space, m, ef in itertools.product(args.spaces, args.m, args.ef):
+                name = "eval-variant"
+                try:
+                    client.delete_collection(name)
+                except Exception:
+                    pass
+                collection = get_or_create_collection(
+                    client, name,
+                    embedding_model_name=model,
+                    distance_function=space,
+                    metadata={"hnsw:M": m, "hnsw:search_ef": ef, "hnsw:construction_ef": max(ef, 100)},
+                )
+                start = time.perf_counter()
+                add_documents_to_collection(
+                    collection, ids, documents, metadatas, batch_size=args.batch_size, embeddings=embeddings
+                )
+                build_s = time.perf_counter() - start
+                row = {
+                    "model": model, "chunk_size": chunk_size, "chunks": len(documents),
+                    "space": space, "M": m, "ef": ef, "build_s": build_s,
+                }
+                row.update(evaluate(collection, items, vectors, ks))
+                row["embed_ms/q"] = embed_ms
+                yield row
+    finally:
+        if not args.scratch_dir:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+def print_rows(rows: List[Dict[str, Any]]) -> None:
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+
+    def fmt(v: Any) -> str:
+        return f"{v:.3f}" if isinstance(v, float) else str(v)
+
+    widths = {c: max(len(c), *(len(fmt(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(fmt(r.get(c, "")).ljust(widths[c]) for c in columns))
+
+
+def _csv(cast):
+    return lambda value: [cast(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency of ChromaDB collections")
+    parser.add_argument("--qa", help="Question set (JSONL with question and sources)")
+    parser.add_argument("--k", type=_csv(int), default=[1, 3, 5, 10], help="Comma-separated cutoffs for recall@k")
+    parser.add_argument("--collection", default="docs", help="Collection to evaluate (without --sweep)")
+    parser.add_argument("--db-dir", default="./chroma_db", help="ChromaDB directory (without --sweep)")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2", help="Embedding model of --collection")
+    parser.add_argument("--store", default=None, help="Corpus store for --sweep / --make-qa (default: ./corpus/<collection>)")
+    parser.add_argument("--make-qa", type=int, metavar="N", help="Write N heading-based questions to --qa and exit")
+    parser.add_argument("--sweep", action="store_true", help="Build and evaluate every combination below")
+    parser.add_argument("--spaces", type=_csv(str), default=["cosine"], help="hnsw:space values")
+    parser.add_argument("--m", type=_csv(int), default=[16], help="hnsw:M values")
+    parser.add_argument("--ef", type=_csv(int), default=[10], help="hnsw:search_ef values")
+    parser.add_argument("--chunk-sizes", type=_csv(int), default=[1600], help="Max chunk sizes (chars)")
+    parser.add_argument("--embedding-models", type=_csv(str), default=["all-MiniLM-L6-v2"], help="Embedding models")
+    parser.add_argument("--batch-size", type=int, default=500, help="ChromaDB insert batch size")
+    parser.add_argument("--scratch-dir", default=None, help="Keep sweep collections here instead of a temp dir")
+    parser.add_argument("--output", default=None, help="Also write result rows to this JSONL file")
+    args = parser.parse_args()
+
+    if not args.qa:
+        parser.error("--qa is required")
+    store_path = args.store or os.path.join("./corpus", args.collection)
+
+    if args.make_qa:
+        with CorpusStore(store_path) as store:
+            items = make_qa(store, args.make_qa)
+        with open(args.qa, "w", encoding="utf-8") as f:
+            for item in items:
+                f.write(json.dumps({"question": item.question, "sources": sorted(item.sources)}) + "\n")
+        print(f"Wrote {len(items)} questions to {args.qa}")
+        return
+
+    items = load_qa(args.qa)
+    if not items:
+        print(f"No questions in {args.qa}")
+        sys.exit(1)
+    ks = sorted(set(args.k))
+
+    if args.sweep:
+        if not os.path.isdir(store_path):
+            print(f"No corpus store at {store_path}")
+            sys.exit(1)
+        rows = []
+        with CorpusStore(store_path) as store:
+            for row in sweep(args, store, items, ks):
+                rows.append(row)
+        rows.sort(key=lambda r: (-r["mrr"], r["p95_ms"]))
+    else:
+        rows = evaluate_existing(args, items, ks)
+
+    print(f"\n{len(items)} questions\n")
+    print_rows(rows)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+
+if __name__ == "__main__":
+    main()
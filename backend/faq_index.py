@@ -0,0 +1,203 @@
+"""Precomputed question/answer index built at ingestion time.
+
+For every chunk of an indexed domain, an LLM writes a few questions a reader
+might ask about it, each with a short answer grounded in the chunk. The
+questions are embedded into a side collection ``<collection>_faq`` next to the
+main one; answers and sources ride along as metadata. ``/ask`` looks the user's
+question up there first and, on a close match, answers with one vector lookup
+instead of running the rewrite -> retrieve -> answer graph.
+
+Generation is incremental: FAQ entries remember the hash of the chunk they were
+written from, so recrawls only pay for chunks whose text changed.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from openai import AsyncOpenAI
+
+from rate_limit import AsyncTokenBucket
+from shared_store import shared_store
+from utils import add_documents_to_collection, get_embedding_function, get_or_create_collection
+
+logger = logging.getLogger(__name__)
+
+FAQ_SUFFIX = "_faq"
+FAQ_MODEL = os.getenv("FAQ_MODEL", "gpt-4o")
+FAQ_MIN_SIMILARITY = float(os.getenv("FAQ_MIN_SIMILARITY", "0.9"))
+GENERATION_NAMESPACE = "faq_generation"
+MIN_CHUNK_CHARS = 200
+
+FAQ_PROMPT = (
+    "You are building an FAQ for a documentation site. From the section below, write up to {n} "
+    "questions a user of this documentation would realistically ask that the section fully answers, "
+    "each with a concise, self-contained answer that uses ONLY information from the section. "
+    "Skip questions the section does not answer. "
+    'Reply with JSON: {{"faqs": [{{"question": "...", "answer": "..."}}]}}\n\n'
+    "SECTION ({headers}):\n{text}"
+)
+
+
+def faq_collection_name(collection_name: str) -> str:
+    """Side collection name, kept within ChromaDB's 63-character limit."""
+    return collection_name[:63 - len(FAQ_SUFFIX)] + FAQ_SUFFIX
+
+
+def chunk_sha(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+async def _generate(
+    client: AsyncOpenAI,
+    text: str,
+    headers: str,
+    per_chunk: int,
+    model: str,
+    limiter: AsyncTokenBucket,
+    semaphore: asyncio.Semaphore,
+) -> List[Dict[str, str]]:
+    async with semaphore:
+        await limiter.acquire()
+        resp = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": FAQ_PROMPT.format(n=per_chunk, headers=headers or "untitled", text=text)}],
+            response_format={"type": "json_object"},
+            temperature=0.2,
+        )
+    try:
+        faqs = json.loads(resp.choices[0].message.content or "{}").get("faqs", [])
+    except ValueError:
+        return []
+    return [
+        {"question": f["question"].strip(), "answer": f["answer"].strip()}
+        for f in faqs[:per_chunk]
+        if isinstance(f, dict) and f.get("question") and f.get("answer")
+    ]
+
+
+async def build_faq_index(
+    client,
+    collection_name: str,
+    ids: List[str],
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    embedding_model_name: str = "all-MiniLM-L6-v2",
+    per_chunk: int = 3,
+    model: str = FAQ_MODEL,
+    rpm: float = 500,
+    concurrency: int = 8,
+    batch_size: int = 100,
+) -> int:
+    """Generate FAQ entries for the given chunks into ``<collection_name>_faq``.
+
+    Entries of chunks that are unchanged since the last run are kept; entries of
+    changed or vanished chunks of the same sources are replaced or removed.
+
+    Returns:
+        Number of chunks that were (re)generated
+    """
+    faq = get_or_create_collection(
+        client,
+        faq_collection_name(collection_name),
+        embedding_model_name=embedding_model_name,
+        metadata={"embedding_model": embedding_model_name},
+    )
+    sources = sorted({str(m.get("source", "")) for m in metadatas})
+    existing = faq.get(where={"source": {"$in": sources}}, include=["metadatas"]) if sources else {"ids": []}
+    kept = {}  # chunk id -> sha of the chunk the entries were generated from
+    stale = {}  # entry id -> chunk id, deleted only once the replacements are written
+    current = {chunk_id: chunk_sha(doc) for chunk_id, doc in zip(ids, documents)}
+    for entry_id, meta in zip(existing["ids"], existing.get("metadatas") or []):
+        if current.get(meta.get("chunk_id")) == meta.get("chunk_sha"):
+            kept[meta["chunk_id"]] = meta["chunk_sha"]
+        else:
+            stale[entry_id] = meta.get("chunk_id")
+
+    todo = [
+        i for i, (chunk_id, doc) in enumerate(zip(ids, documents))
+        if chunk_id not in kept and len(doc) >= MIN_CHUNK_CHARS
+    ]
+    results = []
+    if todo:
+        limiter = AsyncTokenBucket.per_minute(rpm, burst=concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        async with AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")) as llm:
+            results = await asyncio.gather(
+                *(_generate(llm, documents[i], metadatas[i].get("headers", ""), per_chunk, model, limiter, semaphore)
+                  for i in todo),
+                return_exceptions=True,
+            )
+
+    faq_ids, questions, faq_metas = [], [], []
+    failed = set()
+    for i, faqs in zip(todo, results):
+        if isinstance(faqs, BaseException):
+            logger.warning("FAQ generation failed for %s: %r", ids[i], faqs)
+            failed.add(ids[i])
+            continue
+        for j, item in enumerate(faqs):
+            faq_ids.append(f"{ids[i]}-q{j}")
+            questions.append(item["question"])
+            faq_metas.append({
+                "answer": item["answer"],
+                "source": metadatas[i].get("source", ""),
+                "headers": metadatas[i].get("headers", ""),
+                "chunk_id": ids[i],
+                "chunk_sha": current[ids[i]],
+            })
+    if faq_ids:
+        add_documents_to_collection(faq, faq_ids, questions, faq_metas, batch_size=batch_size)
+    # Entries of chunks whose generation failed stay until a later run replaces them (their sha still differs).
+    written = set(faq_ids)
+    drop = [entry_id for entry_id, chunk_id in stale.items() if entry_id not in written and chunk_id not in failed]
+    if drop:
+        faq.delete(ids=drop)
+    _bump_generation(collection_name)  # API workers reopen their cached handle
+    return len(todo)
+
+
+def faq_generation(collection_name: str) -> Optional[bytes]:
+    """Stamp that changes whenever :func:`build_faq_index` writes ``collection_name``'s FAQ.
+
+    Kept in the shared store, so it is only available (and only needed across
+    processes) when ``SHARED_STORE_PATH`` is set for both the API and the ingest workers.
+    """
+    return shared_store.get(GENERATION_NAMESPACE, collection_name) if shared_store is not None else None
+
+
+def _bump_generation(collection_name: str) -> None:
+    if shared_store is not None:
+        shared_store.put(GENERATION_NAMESPACE, collection_name, str(time.time_ns()).encode())
+
+
+def open_faq_collection(client, collection_name: str):
+    """The FAQ side collection of ``collection_name``, or ``None`` if none was built."""
+    try:
+        faq = client.get_collection(faq_collection_name(collection_name))
+    except Exception:
+        return None
+    model = (faq.metadata or {}).get("embedding_model", "all-MiniLM-L6-v2")
+    return client.get_collection(faq.name, embedding_function=get_embedding_function(model))
+
+
+def lookup_faq(faq, question: str, min_similarity: float = FAQ_MIN_SIMILARITY) -> Optional[Dict[str, Any]]:
+    """Closest precomputed question, if its cosine similarity reaches ``min_similarity``."""
+    result = faq.query(query_texts=[question], n_results=1, include=["documents", "metadatas", "distances"])
+    if not result["ids"][0]:
+        return None
+    similarity = 1.0 - result["distances"][0][0]
+    if similarity < min_similarity:
+        return None
+    meta = result["metadatas"][0][0]
+    return {
+        "question": result["documents"][0][0],
+        "answer": meta["answer"],
+        "source": meta.get("source", ""),
+        "headers": meta.get("headers", ""),
+        "similarity": similarity,
+    }
@@ -1,23 +1,32 @@
 import os
+import logging
 from pydantic import BaseModel
 from typing import List, Dict, Any
 
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Chroma
 from langgraph.graph import StateGraph, END
 
+from context_builder import build_context
+from chunking import chunk_markdown
+from page_index import EMBEDDING_MODEL, PageIndexCache, page_indexes
+from shared_store import cached_embeddings
+from tracing import TracedEmbeddings, incr, invoke_llm, log_event, record_cache, span, traced_node
+
 openai_api_key = os.environ.get("OPENAI_API_KEY")
+logger = logging.getLogger(__name__)
 
 class State(BaseModel):
     text: str
     question: str
+    page_url: str = ""
     enhanced_query: str = ""
-    docs: List[Any] = []
+    chunks: Any = None
     retrieved_docs: List[Any] = []
     answer: str = ""
     used_chunks: List[Dict[str, Any]] = []
+    context_stats: Dict[str, int] = {}
 
+@traced_node("EnhanceQuery")
 def enhance_query_node(state: State) -> State:
     page_text = state.text
     user_question = state.question
@@ -29,70 +38,62 @@ def enhance_query_node(state: State) -> State:
         "REWRITTEN QUERY:"
     )
     llm = ChatOpenAI(api_key=openai_api_key, model="gpt-4o", temperature=0)
-    result = llm.invoke([{"role": "user", "content": prompt}])
+    result = invoke_llm(llm, [{"role": "user", "content": prompt}], "enhance_query")
     enhanced_query = result.content.strip()
     state.enhanced_query = enhanced_query
     return state
 
+@traced_node("Retrieve")
 def retrieve_node(state: State) -> State:
     page_text = state.text
     enhanced_query = state.enhanced_query
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1600, chunk_overlap=400)
-    chunks = splitter.split_text(page_text)
-
-    docs = []
-    pos = 0
-    for i, chunk in enumerate(chunks):
-        metadata = {
-            "chunk_id": i,
-            "start_char": pos,
-            "end_char": pos + len(chunk),
-            "url": getattr(state, "page_url", None)  # Or state.page_url if it's always set
-        }
-
-        from langchain.schema import Document
-        doc = Document(page_content=chunk, metadata=metadata)
-        docs.append(doc)
-        pos += len(chunk)
+    with span("chunk", chars=len(page_text)):
+        chunks = chunk_markdown(page_text, max_len=1600)
 
-    if not docs:
-        state.docs = []
+    if not chunks:
+        state.chunks = chunks
         state.retrieved_docs = []
         return state
 
-    embeddings = OpenAIEmbeddings(api_key=openai_api_key)
-    vectordb = Chroma.from_documents(
-        docs, embeddings, collection_name="webpage", persist_directory=None
+    url = state.page_url
+    extra = {"url": url} if url else {}
+    embeddings = cached_embeddings(
+        TracedEmbeddings(OpenAIEmbeddings(api_key=openai_api_key, model=EMBEDDING_MODEL)), EMBEDDING_MODEL
     )
-
-    retriever = vectordb.as_retriever(search_kwargs={"k": 10})
-    relevant_docs = retriever.get_relevant_documents(enhanced_query or state.question)
-
-    state.docs = docs
+    with page_indexes.use(PageIndexCache.key_for(url, page_text)) as (index, cached), index.lock:
+        record_cache("page_index", cached)
+        with span("chroma.sync", chunks=len(chunks)):
+            embedded, reused, deleted = index.sync(chunks, embeddings, **extra)
+        incr("chunks_embedded", embedded)
+        incr("chunks_reused", reused)
+
+        with span("chroma.search"):
+            query_vector = embeddings.embed_query(enhanced_query or state.question)
+            relevant_docs = [doc for doc, _ in index.search(query_vector, 10)]
+
+    state.chunks = chunks
     state.retrieved_docs = relevant_docs
     return state
 
 
+@traced_node("Answer")
 def answer_node(state: State) -> State:
     question = state.question
     relevant_docs = state.retrieved_docs
-     # PRINT RETRIEVED CHUNKS HERE
-    print("\n=== Retrieved Chunks ===")
-    for i, d in enumerate(relevant_docs):
-        url = d.metadata.get("url")
-        print(f"[Chunk {i}] (url: {url})")
-        print(d.page_content[:500])  # print first 500 chars for brevity
-        print("------")
-    print("======================\n")
-    def format_chunk(doc):
-        url = doc.metadata.get("url")
-        chunk_text = doc.page_content
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, d in enumerate(relevant_docs):
+            log_event("retrieved_chunk", logging.DEBUG, logger, rank=i, url=d.metadata.get("url"),
+                      chunk_id=d.metadata.get("chunk_id"), preview=d.page_content[:200])
+    def format_chunk(seg):
+        url = seg.metadata.get("url")
         if url:
-            return f"[Source URL: {url}]\n{chunk_text}"
-        return chunk_text
+            return f"[Source URL: {url}]\n{seg.text}"
+        return seg.text
 
-    context = "\n\n---\n\n".join([format_chunk(d) for d in relevant_docs])
-    # context = "\n\n---\n\n".join([d.page_content for d in relevant_docs])
+    packed = build_context(relevant_docs, format_chunk, texts={state.page_url or "": state.text})
+    context = packed.text
+    incr("prompt_tokens_saved", packed.tokens_saved)
+    log_event("context_packed", log=logger, **packed.stats())
 
     prompt = (
     "You are an expert assistant. Using only the content below, answer the user's question as fully and helpfully as possible. "
@@ -112,24 +113,25 @@ def answer_node(state: State) -> State:
     )
 
     llm = ChatOpenAI(api_key=openai_api_key, model="gpt-4o", temperature=0.2)
-    result = llm.invoke([{"role": "user", "content": prompt}])
+    result = invoke_llm(llm, [{"role": "user", "content": prompt}], "answer")
     answer = result.content.strip()
-    def get_excerpt(doc):
-        txt = doc.page_content.strip().replace('\n', ' ')
+    def get_excerpt(seg):
+        txt = seg.text.strip().replace('\n', ' ')
         return txt[:80] + "..." if len(txt) > 80 else txt
 
     state.answer = answer
+    state.context_stats = packed.stats()
     state.used_chunks = [
         {
-            "excerpt": get_excerpt(d),
-            "full_chunk": d.page_content,
-            "start_char": d.metadata.get("start_char"),
-            "end_char": d.metadata.get("end_char"),
-            "url": d.metadata.get("url"),
-            "title": d.metadata.get("title"),
-            "chunk_id": d.metadata.get("chunk_id"),
+            "excerpt": get_excerpt(seg),
+            "full_chunk": seg.text,
+            "start_char": seg.start_char,
+            "end_char": seg.end_char,
+            "url": seg.metadata.get("url"),
+            "title": seg.metadata.get("title"),
+            "chunk_id": seg.metadata.get("chunk_id"),
         }
-        for d in relevant_docs
+        for seg in packed.segments
     ]
     return state
 
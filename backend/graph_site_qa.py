@@ -1,12 +1,19 @@
 import os
-import requests
+import heapq
+import logging
 from bs4 import BeautifulSoup
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain.vectorstores import Chroma
+
+from context_builder import build_context
+from chunking import chunk_markdown
+from html_extract import fetch_page
+from page_index import EMBEDDING_MODEL, page_indexes
+from shared_store import cached_embeddings
+from tracing import TracedEmbeddings, incr, invoke_llm, log_event, record_cache, record_fetch, span
 
 openai_api_key = os.environ.get("OPENAI_API_KEY")
+logger = logging.getLogger(__name__)
 
 def extract_visible_text(html):
     soup = BeautifulSoup(html, 'html.parser')
@@ -14,50 +21,59 @@ def extract_visible_text(html):
         tag.decompose()
     return soup.get_text(separator='\n', strip=True)
 
-def keyword_hits(chunks, question, limit=5):
+def keyword_hits(pages, question, limit=5):
+    """The ``limit`` chunks of ``pages`` containing the most question words, as Documents."""
     qwords = set(question.lower().split())
     scored = []
-    for doc in chunks:
-        content = doc.page_content.lower()
-        score = sum(1 for w in qwords if w in content)
-        if score > 0:
-            scored.append((score, doc))
-    return [doc for score, doc in sorted(scored, key=lambda x: x[0], reverse=True)[:limit]]
+    for url, title, chunks in pages:
+        for i, chunk in enumerate(chunks):
+            content = chunk.lower()
+            score = sum(1 for w in qwords if w in content)
+            if score > 0:
+                scored.append((score, url, title, chunks, i))
+    return [
+        Document(page_content=chunks[i], metadata=chunks.metadata(i, url=url, title=title))
+        for _, url, title, chunks, i in heapq.nlargest(limit, scored, key=lambda x: x[0])
+    ]
 
-async def ask_site_handler(request):
+def ask_site_handler(request):
     urls = request.urls[:10]
-    all_chunks = []
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1600, chunk_overlap=400)
+    pages = []
     for url in urls:
         try:
-            resp = requests.get(url, timeout=15)
-            if resp.ok:
-                soup = BeautifulSoup(resp.text, "html.parser")
-                text = soup.get_text(separator="\n", strip=True)
-                title = soup.title.string.strip() if soup.title else url
-                chunks = splitter.split_text(text)
-                for i, chunk in enumerate(chunks):
-                    all_chunks.append(Document(
-                        page_content=chunk,
-                        metadata={
-                            "url": url,
-                            "title": title,
-                            "chunk_id": i
-                        }
-                    ))
-        except Exception:
-            pass
+            with span("fetch", url=url):
+                page, num_bytes = fetch_page(url, timeout=15)
+            record_fetch(num_bytes)
+            if page.truncated:
+                incr("pages_truncated")
+            title = page.title or url
+            with span("chunk", chars=len(page.text)):
+                chunks = chunk_markdown(page.text, max_len=1600)
+            if len(chunks):
+                pages.append((url, title, chunks))
+        except Exception as e:
+            log_event("fetch_failed", logging.WARNING, logger, url=url, error=repr(e))
 
-    if not all_chunks:
+    if not pages:
         return {"answer": "No content could be retrieved from the provided site pages."}
 
-    embeddings = OpenAIEmbeddings(api_key=openai_api_key)
-    vectordb = Chroma.from_documents(
-        all_chunks, embeddings, collection_name="webpage", persist_directory=None
+    embeddings = cached_embeddings(
+        TracedEmbeddings(OpenAIEmbeddings(api_key=openai_api_key, model=EMBEDDING_MODEL)), EMBEDDING_MODEL
     )
-    retriever = vectordb.as_retriever(search_kwargs={"k": 15})
-    vector_docs = retriever.get_relevant_documents(request.question)
-    kw_docs = keyword_hits(all_chunks, request.question, limit=5)
+    query_vector = embeddings.embed_query(request.question)
+    scored = []
+    for url, title, chunks in pages:
+        with page_indexes.use(url) as (index, cached), index.lock:
+            record_cache("page_index", cached)
+            with span("chroma.sync", url=url, chunks=len(chunks)):
+                embedded, reused, _ = index.sync(chunks, embeddings, url=url, title=title)
+            incr("chunks_embedded", embedded)
+            incr("chunks_reused", reused)
+            with span("chroma.search", url=url):
+                scored.extend(index.search(query_vector, 15))
+    vector_docs = [doc for doc, _ in sorted(scored, key=lambda pair: pair[1])[:15]]
+    with span("keyword_search"):
+        kw_docs = keyword_hits(pages, request.question, limit=5)
 
     seen = set()
     all_docs = []
@@ -67,14 +83,15 @@ async def ask_site_handler(request):
             seen.add(sig)
             all_docs.append(d)
 
-    def chunk_header(doc):
-        title = doc.metadata.get("title", "")
-        url = doc.metadata.get("url", "")
-        return f"[{title}]({url})"
+    def format_segment(seg):
+        title = seg.metadata.get("title", "")
+        url = seg.metadata.get("url", "")
+        return f"[{title}]({url})\n{seg.text}"
 
-    context = "\n\n---\n\n".join(
-        f"{chunk_header(d)}\n{d.page_content}" for d in all_docs
-    )
+    packed = build_context(all_docs, format_segment, texts={url: chunks.text for url, _, chunks in pages})
+    context = packed.text
+    incr("prompt_tokens_saved", packed.tokens_saved)
+    log_event("context_packed", log=logger, **packed.stats())
 
     llm = ChatOpenAI(api_key=openai_api_key, model="gpt-4o", temperature=0.2)
     prompt = (
@@ -87,21 +104,21 @@ async def ask_site_handler(request):
         "ANSWER:"
     )
 
-    result = llm.invoke([{"role": "user", "content": prompt}])
+    result = invoke_llm(llm, [{"role": "user", "content": prompt}], "site_answer")
     answer = result.content.strip()
 
-    def get_excerpt(doc):
-        txt = doc.page_content.strip().replace('\n', ' ')
+    def get_excerpt(seg):
+        txt = seg.text.strip().replace('\n', ' ')
         return txt[:80] + "..." if len(txt) > 80 else txt
 
     sources = [
         {
-            "excerpt": get_excerpt(d),
-            "title": d.metadata.get("title", ""),
-            "url": d.metadata.get("url", ""),
-            "chunk_id": d.metadata.get("chunk_id"),
+            "excerpt": get_excerpt(seg),
+            "title": seg.metadata.get("title", ""),
+            "url": seg.metadata.get("url", ""),
+            "chunk_id": seg.metadata.get("chunk_id"),
         }
-        for d in all_docs
+        for seg in packed.segments
     ]
 
-    return {"answer": answer, "sources": sources}
+    return {"answer": answer, "sources": sources, "context_stats": packed.stats()}
@@ -1,8 +1,7 @@
 import os
 import json
+import logging
 import re
-import requests
-from bs4 import BeautifulSoup
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 
@@ -10,11 +9,14 @@ from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 
 from graph_qa import enhance_query_node, retrieve_node, answer_node
+from content_store import TextOrRef
+from html_extract import fetch_page
+from tracing import incr, invoke_llm, log_event, record_fetch, span, traced_node
 
 openai_api_key = os.environ.get("OPENAI_API_KEY")
+logger = logging.getLogger(__name__)
 
-class SmartQARequest(BaseModel):
-    text: str
+class SmartQARequest(TextOrRef):
     question: str
     links: List[Dict[str, str]]
     page_url: str
@@ -49,7 +51,7 @@ def answer_sufficiency_llm_node(state):
         "Reply with only 'YES' if it is enough, or 'NO' if it is not clear/specific enough."
     )
     llm = ChatOpenAI(api_key=openai_api_key, model="gpt-4o", temperature=0)
-    result = llm.invoke([{"role": "user", "content": prompt}])
+    result = invoke_llm(llm, [{"role": "user", "content": prompt}], "sufficiency")
     sufficient = "yes" in result.content.strip().lower()
     state["sufficient"] = sufficient
     return state
@@ -66,7 +68,7 @@ def llm_select_relevant_links_node(state):
         "Reply with a JSON array of up to 3 objects with 'text' and 'href'."
     )
     llm = ChatOpenAI(api_key=openai_api_key, model="gpt-4o", temperature=0)
-    result = llm.invoke([{"role": "user", "content": prompt}])
+    result = invoke_llm(llm, [{"role": "user", "content": prompt}], "select_links")
     output = result.content.strip()
     json_str = extract_json_from_text(output)
     try:
@@ -78,9 +80,10 @@ def llm_select_relevant_links_node(state):
         state["selected_links"] = selected_links[:3]
     except Exception:
         state["selected_links"] = []
-    print(f"Selected links: {state['selected_links']}")
+    log_event("links_selected", log=logger, links=[l.get("href") for l in state["selected_links"]])
     return state
 
+@traced_node("RetrieveAndAnswer")
 def retrieve_and_answer_node(state: SmartHopState) -> SmartHopState:
     s1 = enhance_query_node(state=type("S", (), dict(**state.dict()))())
     s1 = retrieve_node(s1)
@@ -89,6 +92,7 @@ def retrieve_and_answer_node(state: SmartHopState) -> SmartHopState:
     state.sources = s1.used_chunks
     return state
 
+@traced_node("CheckSufficiency")
 def check_sufficiency_node(state: SmartHopState) -> SmartHopState:
     out = answer_sufficiency_llm_node({
         "question": state.question,
@@ -97,6 +101,7 @@ def check_sufficiency_node(state: SmartHopState) -> SmartHopState:
     state.sufficient = out["sufficient"]
     return state
 
+@traced_node("PickNextLink")
 def pick_next_link_node(state: SmartHopState) -> SmartHopState:
     from urllib.parse import urlparse
     original_domain = state.original_domain or urlparse(state.page_url).netloc
@@ -116,22 +121,21 @@ def pick_next_link_node(state: SmartHopState) -> SmartHopState:
     state.selected_link = next_links[0] if next_links else None
     return state
 
+@traced_node("FetchLink")
 def fetch_link_node(state: SmartHopState) -> SmartHopState:
     if not state.selected_link:
         return state
     url = state.selected_link["href"]
     state.visited_urls.append(url)
     try:
-        resp = requests.get(url, timeout=12)
-        soup = BeautifulSoup(resp.text, "html.parser")
-        state.text = soup.get_text(separator="\n", strip=True)
+        with span("fetch", url=url):
+            page, num_bytes = fetch_page(url, timeout=12)
+        record_fetch(num_bytes)
+        if page.truncated:
+            incr("pages_truncated")
+        state.text = page.text
         state.page_url = url
-        page_links = [
-            {"text": a.get_text(strip=True), "href": a.get("href")}
-            for a in soup.find_all("a", href=True)
-            if a.get("href", "").startswith("http")
-        ]
-        state.links = [l for l in page_links if l["href"].startswith("http")]
+        state.links = [l for l in page.links if l["href"].startswith("http")]
         state.hops += 1
     except Exception:
         state.selected_link = None
@@ -0,0 +1,302 @@
+"""Single-pass HTML to markdown-shaped text extraction.
+
+Keeps the structure the chunker cares about (headings, list items, table rows,
+preformatted blocks) while dropping scripts, styles and markup, and collects
+the page title and anchors on the way.
+
+The parser is fed incrementally, so :func:`fetch_page` streams a response
+through it without holding the raw HTML, and stops reading once the page
+exceeds its :class:`PageLimits` (downloaded bytes or extracted characters).
+Over-limit pages are either cut off at the limit (``on_overflow="truncate"``,
+marked ``truncated``) or refused with :class:`PageTooLarge` (``"reject"``).
+"""
+
+import codecs
+import io
+import os
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "dd", "details", "div", "dl",
+    "dt", "fieldset", "figcaption", "figure", "footer", "form", "header", "hr",
+    "main", "nav", "p", "section", "summary",
+}
+_HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+_WS = re.compile(r"\s+")
+_BLANK_LINES = re.compile(r"\n(?:[ \t]*\n)+")
+_TRAILING_WS = re.compile(r"[^\S\n]+(?=\n|\Z)")
+_FEED_CHARS = 64 * 1024
+_COMPACT_PARTS = 4096
+
+
+class PageTooLarge(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class PageLimits:
+    max_bytes: int = int(os.getenv("MAX_PAGE_BYTES", str(10 * 1024 * 1024)))  # downloaded, before extraction
+    max_chars: int = int(os.getenv("MAX_PAGE_CHARS", str(1_000_000)))  # extracted text
+    on_overflow: str = os.getenv("PAGE_OVERFLOW", "truncate")  # "truncate" or "reject"
+
+
+DEFAULT_LIMITS = PageLimits()
+
+
+@dataclass
+class ExtractedPage:
+    text: str
+    title: str = ""
+    links: List[Dict[str, str]] = field(default_factory=list)
+    truncated: bool = False
+
+
+class _MarkdownExtractor(HTMLParser):
+    def __init__(self, max_chars: Optional[int] = None, base_url: Optional[str] = None):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.base_url = base_url  # links are resolved against it (or the page's <base href>)
+        self.full = False  # reached max_chars; further input is ignored
+        self.size = 0
+        self.parts: List[str] = []  # recent output; older parts are moved to _out
+        self._out = io.StringIO()
+        self.title_parts: List[str] = []
+        self.links: List[Dict[str, str]] = []
+        self._skip = 0
+        self._in_title = False
+        self._pre = 0
+        self._lists: List[List[int]] = []  # [ordered, counter] per open list
+        self._row_cells = 0
+        self._rows_in_table: List[int] = []
+        self._anchor: Optional[Dict[str, str]] = None
+        self._anchor_text: List[str] = []
+
+    def _emit(self, text: str) -> None:
+        self.parts.append(text)
+        self.size += len(text)
+        if self.max_chars is not None and self.size > self.max_chars:
+            self.full = True
+        if len(self.parts) > _COMPACT_PARTS:
+            # Keep the last part: the handlers look at it to decide on spacing.
+            self._out.write("".join(self.parts[:-1]))
+            del self.parts[:-1]
+
+    def _newline(self, count: int = 1) -> None:
+        self._emit("\n" * count)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag == "base":
+            href = dict(attrs).get("href")
+            if href:
+                self.base_url = urljoin(self.base_url or "", href)
+            return
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+            return
+        if self._skip:
+            return
+        if tag in _HEADINGS:
+            self._newline(2)
+            self._emit("#" * _HEADINGS[tag] + " ")
+        elif tag in _BLOCK_TAGS:
+            self._newline(2 if tag == "p" else 1)
+        elif tag == "br":
+            self._newline()
+        elif tag in ("ul", "ol"):
+            if not self._lists:
+                self._newline()
+            self._lists.append([tag == "ol", 0])
+        elif tag == "li":
+            self._newline()
+            depth = max(len(self._lists) - 1, 0)
+            marker = "-"
+            if self._lists and self._lists[-1][0]:
+                self._lists[-1][1] += 1
+                marker = f"{self._lists[-1][1]}."
+            self._emit("  " * depth + marker + " ")
+        elif tag == "pre":
+            self._pre += 1
+            self._newline(2)
+            self._emit("```\n")
+        elif tag == "table":
+            self._rows_in_table.append(0)
+            self._newline(2)
+        elif tag == "tr":
+            self._row_cells = 0
+            self._newline()
+            self._emit("|")
+        elif tag in ("td", "th"):
+            self._row_cells += 1
+            self._emit(" ")
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self._anchor = {"href": urljoin(self.base_url, href.strip()) if self.base_url else href}
+                self._anchor_text = []
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+            return
+        if tag in _SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+            return
+        if self._skip:
+            return
+        if tag in _HEADINGS or tag == "p":
+            self._newline(2)
+        elif tag in _BLOCK_TAGS:
+            self._newline()
+        elif tag in ("ul", "ol"):
+            if self._lists:
+                self._lists.pop()
+            if not self._lists:
+                self._newline()
+        elif tag == "pre":
+            self._pre = max(self._pre - 1, 0)
+            self._emit("\n```")
+            self._newline(2)
+        elif tag in ("td", "th"):
+            self._emit(" |")
+        elif tag == "tr":
+            if self._rows_in_table:
+                self._rows_in_table[-1] += 1
+                if self._rows_in_table[-1] == 1 and self._row_cells:
+                    self._newline()
+                    self._emit("|" + " --- |" * self._row_cells)
+        elif tag == "table":
+            if self._rows_in_table:
+                self._rows_in_table.pop()
+            self._newline(2)
+        elif tag == "a" and self._anchor is not None:
+            self._anchor["text"] = _WS.sub(" ", "".join(self._anchor_text)).strip()
+            self.links.append(self._anchor)
+            self._anchor = None
+
+    def handle_data(self, data):
+        if self.full:
+            return
+        if self._in_title:
+            self.title_parts.append(data)
+            return
+        if self._skip:
+            return
+        if self._pre:
+            self._emit(data)
+            return
+        text = _WS.sub(" ", data)
+        if text == " ":
+            if self.parts and not self.parts[-1].endswith(("\n", " ")):
+                self._emit(text)
+        elif text:
+            if not self.parts or self.parts[-1].endswith(("\n", " ")):
+                text = text.lstrip()
+            self._emit(text)
+            if self._anchor is not None:
+                self._anchor_text.append(text)
+
+    def page(self, truncated: bool = False) -> ExtractedPage:
+        self._out.write("".join(self.parts))
+        self.parts = []
+        text = self._out.getvalue()
+        if self.full:
+            text, truncated = clip_text(text, self.max_chars)[0], True
+        text = _BLANK_LINES.sub("\n\n", text)
+        text = _TRAILING_WS.sub("", text).strip()
+        title = _WS.sub(" ", "".join(self.title_parts)).strip()
+        return ExtractedPage(text=text, title=title, links=self.links, truncated=truncated)
+
+
+def clip_text(text: str, max_chars: Optional[int]) -> Tuple[str, bool]:
+    """``text`` cut to at most ``max_chars``, at a paragraph or line break when one is near the end.
+
+    Returns:
+        (text, whether it was cut)
+    """
+    if max_chars is None or len(text) <= max_chars:
+        return text, False
+    cut = text.rfind("\n", max_chars * 3 // 4, max_chars)
+    return text[:cut if cut > 0 else max_chars], True
+
+
+def extract_stream(pieces: Iterable[str], max_chars: Optional[int] = None,
+                   base_url: Optional[str] = None) -> ExtractedPage:
+    """Like :func:`extract_page`, for HTML arriving in pieces. Stops consuming at ``max_chars``."""
+    parser = _MarkdownExtractor(max_chars, base_url)
+    for piece in pieces:
+        for i in range(0, len(piece), _FEED_CHARS):
+            parser.feed(piece[i:i + _FEED_CHARS])
+            if parser.full:
+                return parser.page()
+    parser.close()
+    return parser.page()
+
+
+def extract_page(html: str, max_chars: Optional[int] = None, base_url: Optional[str] = None) -> ExtractedPage:
+    """Convert ``html`` into markdown-shaped text plus its title and links.
+
+    Link hrefs are made absolute against ``base_url`` (or the page's ``<base href>``) when given.
+    """
+    return extract_stream([html], max_chars, base_url)
+
+
+@dataclass
+class _Download:
+    bytes_read: int = 0
+    cut: bool = False
+
+
+def _decode(chunks: Iterable[bytes], encoding: str, download: _Download, limits: PageLimits) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for chunk in chunks:
+        room = limits.max_bytes - download.bytes_read
+        download.bytes_read += len(chunk)
+        if len(chunk) > room:
+            if limits.on_overflow == "reject":
+                raise PageTooLarge(f"more than {limits.max_bytes} bytes")
+            download.cut = True
+            yield decoder.decode(chunk[:room], final=True)
+            return
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def fetch_page(url: str, timeout: float = 15, limits: PageLimits = DEFAULT_LIMITS) -> Tuple[ExtractedPage, int]:
+    """Download and extract ``url`` without holding the whole response in memory.
+
+    Returns:
+        (page, bytes downloaded)
+
+    Raises:
+        requests.HTTPError: for error responses
+        PageTooLarge: when the page is over ``limits`` and ``limits.on_overflow`` is ``"reject"``
+    """
+    reject = limits.on_overflow == "reject"
+    with requests.get(url, timeout=timeout, stream=True) as resp:
+        resp.raise_for_status()
+        declared = int(resp.headers.get("content-length") or 0)
+        if reject and declared > limits.max_bytes:
+            raise PageTooLarge(f"{url} is {declared} bytes")
+        # requests falls back to ISO-8859-1 for text/* without a charset; pages are far more often UTF-8.
+        encoding = resp.encoding if "charset" in resp.headers.get("content-type", "").lower() else "utf-8"
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            encoding = "utf-8"
+        download = _Download()
+        page = extract_stream(_decode(resp.iter_content(_FEED_CHARS), encoding, download, limits), limits.max_chars,
+                              base_url=resp.url or url)
+        if page.truncated and reject:
+            raise PageTooLarge(f"{url} has more than {limits.max_chars} characters of text")
+        page.truncated = page.truncated or download.cut
+        return page, download.bytes_read
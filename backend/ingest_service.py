@@ -0,0 +1,217 @@
+"""
+ingest_service.py
+-----------------
+Long-running ingestion service that keeps many documentation domains fresh.
+
+A scheduler enqueues recrawls into a SQLite job queue (see job_queue.py) and a
+pool of worker processes drains it. Each worker keeps one headless browser
+(AsyncWebCrawler) and its embedding model warm across jobs, and writes every
+domain into its own ChromaDB directory and collection (<db-dir>/<domain>), so
+workers never write the same database concurrently. Crawled pages are kept in
+a per-domain corpus store (<store-dir>/<domain>) for reindex.py. With --faq,
+each domain also gets a precomputed FAQ side collection (see faq_index.py)
+that /ask answers common questions from; give the workers the API's
+SHARED_STORE_PATH so its workers reopen a domain's FAQ as soon as it is rebuilt.
+
+Usage:
+    python ingest_service.py add <URL> [--interval-hours 24]
+    python ingest_service.py run [--workers N] [--db-dir ./chroma_db]
+    python ingest_service.py status
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import re
+import signal
+import sys
+import traceback
+
+from job_queue import DEFAULT_QUEUE_PATH, JobQueue
+
+HEARTBEAT_INTERVAL = 30.0
+STALE_AFTER = 10 * 60.0
+POLL_INTERVAL = 2.0
+
+
+def collection_name_for(domain: str) -> str:
+    """ChromaDB collection name for a domain (3-63 chars of [A-Za-z0-9._-], alphanumeric at both ends)."""
+    name = re.sub(r"[^A-Za-z0-9._-]", "-", domain).strip("._-")[:63]
+    return name if len(name) >= 3 else f"{name}-docs"
+
+
+def domain_db_dir(db_dir: str, domain: str) -> str:
+    return os.path.join(db_dir, domain)
+
+
+async def _heartbeat(queue: JobQueue, job) -> None:
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        queue.heartbeat(job.id, worker=job.worker)
+
+
+def store_pages(job, pages, args) -> int:
+    """Keep the pages in the domain's corpus store, then chunk, embed and write them into its collection.
+
+    Returns the chunk count.
+    """
+    from faq_index import build_faq_index
+    from insert_docs import build_chunks, save_to_store
+    from utils import (
+        add_documents_to_collection,
+        delete_documents_by_source,
+        get_chroma_client,
+        get_or_create_collection,
+    )
+
+    if pages and args.store_dir:
+        save_to_store(pages, os.path.join(args.store_dir, job.domain))
+    ids, documents, metadatas = build_chunks(pages, chunk_size=args.chunk_size)
+    if not documents:
+        return 0
+    client = get_chroma_client(domain_db_dir(args.db_dir, job.domain))
+    collection = get_or_create_collection(
+        client, collection_name_for(job.domain), embedding_model_name=args.embedding_model
+    )
+    for page in pages:
+        delete_documents_by_source(collection, page["url"])
+    add_documents_to_collection(collection, ids, documents, metadatas, batch_size=args.batch_size)
+    if args.faq:
+        asyncio.run(build_faq_index(
+            client, collection.name, ids, documents, metadatas,
+            embedding_model_name=args.embedding_model,
+            per_chunk=args.faq_per_chunk,
+            model=args.faq_model,
+        ))
+    return len(documents)
+
+
+async def run_job(queue: JobQueue, job, crawler, args) -> None:
+    from insert_docs import crawl_url
+
+    beat = asyncio.create_task(_heartbeat(queue, job))
+    try:
+        pages = await crawl_url(
+            job.url, max_depth=args.max_depth, max_concurrent=args.max_concurrent, crawler=crawler
+        )
+        # Embedding is CPU-bound; run it off the loop so heartbeats keep flowing.
+        chunks = await asyncio.to_thread(store_pages, job, pages, args)
+    finally:
+        beat.cancel()
+    if not queue.complete(job.id, pages=len(pages), chunks=chunks, worker=job.worker):
+        print(f"[{job.domain}] job {job.id}: lease expired and the job was requeued; result not recorded")
+        return
+    print(f"[{job.domain}] job {job.id}: {len(pages)} pages, {chunks} chunks")
+
+
+async def worker_loop(worker_id: str, args, stop) -> None:
+    from crawl4ai import AsyncWebCrawler, BrowserConfig
+    from utils import get_embedding_function
+
+    queue = JobQueue(args.queue)
+    get_embedding_function(args.embedding_model)  # load the model once, before the first job
+
+    async with AsyncWebCrawler(config=BrowserConfig(headless=True, verbose=False)) as crawler:
+        while not stop.is_set():
+            job = queue.claim(worker_id)
+            if job is None:
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            try:
+                await run_job(queue, job, crawler, args)
+            except Exception as e:
+                traceback.print_exc()
+                queue.fail(job.id, f"{type(e).__name__}: {e}", worker=job.worker)
+
+
+def worker_main(worker_id: str, args, stop) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent coordinates shutdown
+    asyncio.run(worker_loop(worker_id, args, stop))
+
+
+def run(args) -> None:
+    queue = JobQueue(args.queue)
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    workers = {}
+
+    def start_worker(i: int):
+        p = ctx.Process(target=worker_main, args=(f"worker-{i}", args, stop), name=f"ingest-worker-{i}")
+        p.start()
+        workers[i] = p
+
+    for i in range(args.workers):
+        start_worker(i)
+    print(f"Ingestion service running with {args.workers} workers (queue: {args.queue})")
+
+    def shutdown(*_):
+        stop.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    while not stop.is_set():
+        queue.schedule_due()
+        requeued = queue.requeue_stale(STALE_AFTER)
+        if requeued:
+            print(f"Requeued {requeued} stale job(s)")
+        for i, p in list(workers.items()):
+            if not p.is_alive():
+                print(f"Worker {i} exited with {p.exitcode}; restarting")
+                start_worker(i)
+        stop.wait(args.schedule_interval)
+
+    print("Stopping workers after their current job...")
+    for p in workers.values():
+        p.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-domain ingestion service")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="SQLite job queue path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="Register a domain for periodic crawling")
+    add.add_argument("url", help="Start URL (regular, .txt, or sitemap)")
+    add.add_argument("--interval-hours", type=float, default=24.0, help="Recrawl interval")
+
+    remove = sub.add_parser("remove", help="Stop recrawling a domain")
+    remove.add_argument("domain")
+
+    sub.add_parser("status", help="Print queue and domain status")
+
+    run_p = sub.add_parser("run", help="Run the scheduler and worker pool")
+    run_p.add_argument("--workers", type=int, default=max(os.cpu_count() or 1, 1), help="Worker processes")
+    run_p.add_argument("--db-dir", default="./chroma_db", help="Root directory for per-domain ChromaDB stores")
+    run_p.add_argument("--store-dir", default="./corpus", help="Corpus store root (pages kept per domain); empty to disable")
+    run_p.add_argument("--embedding-model", default="all-MiniLM-L6-v2", help="Embedding model name")
+    run_p.add_argument("--chunk-size", type=int, default=1600, help="Max chunk size (chars)")
+    run_p.add_argument("--max-depth", type=int, default=5, help="Recursion depth for regular URLs")
+    run_p.add_argument("--max-concurrent", type=int, default=10, help="Max parallel browser sessions per worker")
+    run_p.add_argument("--batch-size", type=int, default=100, help="ChromaDB insert batch size")
+    run_p.add_argument("--faq", action="store_true", help="Maintain a precomputed FAQ side collection per domain")
+    run_p.add_argument("--faq-per-chunk", type=int, default=3, help="Questions to generate per chunk")
+    run_p.add_argument("--faq-model", default="gpt-4o", help="LLM used to write the FAQ")
+    run_p.add_argument("--schedule-interval", type=float, default=30.0, help="Seconds between schedule checks")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    if args.command == "add":
+        try:
+            domain = queue.add_domain(args.url, recrawl_interval=args.interval_hours * 3600)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Registered {domain} (every {args.interval_hours}h)")
+    elif args.command == "remove":
+        queue.remove_domain(args.domain)
+        print(f"Disabled {args.domain}")
+    elif args.command == "status":
+        json.dump(queue.status(), sys.stdout, indent=2)
+        print()
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,56 +2,55 @@
 insert_docs.py
 --------------
 Command-line utility to crawl any URL using Crawl4AI, detect content type (sitemap, .txt, or regular page),
-use the appropriate crawl method, chunk the resulting Markdown into <1600 character blocks by header hierarchy,
+use the appropriate crawl method, chunk the resulting Markdown into <1600 character blocks along its structure
+(headings, lists, tables, code blocks) with the header breadcrumb of each chunk,
 and insert all chunks into ChromaDB with metadata.
 
+Crawled pages are also kept in a compressed corpus store (<store-dir>/<collection>), so the collection
+can be rebuilt with a different chunk size or embedding model by reindex.py without recrawling.
+With --faq, likely questions and answers are generated per chunk into <collection>_faq (faq_index.py).
+
 Usage:
-    python insert_docs.py <URL> [--collection ...] [--db-dir ...] [--embedding-model ...]
+    python insert_docs.py <URL> [--collection ...] [--db-dir ...] [--embedding-model ...] [--store-dir ...] [--faq]
 """
 import argparse
+import os
 import sys
-import re
 import asyncio
-from typing import List, Dict, Any
+import hashlib
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple
 from urllib.parse import urlparse, urldefrag
 from xml.etree import ElementTree
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher
 import requests
-from utils import get_chroma_client, get_or_create_collection, add_documents_to_collection
-
-def smart_chunk_markdown(markdown: str, max_len: int = 1600) -> List[str]:
-    """Hierarchically splits markdown by #, ##, ### headers, then by characters, to ensure all chunks < max_len."""
-    def split_by_header(md, header_pattern):
-        indices = [m.start() for m in re.finditer(header_pattern, md, re.MULTILINE)]
-        indices.append(len(md))
-        return [md[indices[i]:indices[i+1]].strip() for i in range(len(indices)-1) if md[indices[i]:indices[i+1]].strip()]
-
-    chunks = []
-
-    for h1 in split_by_header(markdown, r'^# .+$'):
-        if len(h1) > max_len:
-            for h2 in split_by_header(h1, r'^## .+$'):
-                if len(h2) > max_len:
-                    for h3 in split_by_header(h2, r'^### .+$'):
-                        if len(h3) > max_len:
-                            for i in range(0, len(h3), max_len):
-                                chunks.append(h3[i:i+max_len].strip())
-                        else:
-                            chunks.append(h3)
-                else:
-                    chunks.append(h2)
-        else:
-            chunks.append(h1)
-
-    final_chunks = []
-
-    for c in chunks:
-        if len(c) > max_len:
-            final_chunks.extend([c[i:i+max_len].strip() for i in range(0, len(c), max_len)])
-        else:
-            final_chunks.append(c)
-
-    return [c for c in final_chunks if c]
+from chunking import chunk_markdown
+from corpus_store import CorpusStore
+from faq_index import FAQ_MODEL, build_faq_index, faq_collection_name
+from utils import get_chroma_client, get_or_create_collection, add_documents_to_collection, delete_documents_by_source
+
+def normalize_url(url: str) -> str:
+    """``url`` without its fragment and with a lower-case scheme and host."""
+    parts = urlparse(urldefrag(url)[0])
+    return parts._replace(scheme=parts.scheme.lower(), netloc=parts.netloc.lower()).geturl()
+
+def dedupe_pages(crawl_results: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+    """Crawled pages with normalized URLs, keeping the first result for each URL."""
+    pages: Dict[str, Dict[str,Any]] = {}
+    for doc in crawl_results:
+        url = normalize_url(doc['url'])
+        if url not in pages:
+            pages[url] = {**doc, 'url': url}
+    return list(pages.values())
+
+@asynccontextmanager
+async def crawler_session(crawler: Optional[AsyncWebCrawler], browser_config: BrowserConfig):
+    """Use ``crawler`` if given (e.g. a worker's long-lived browser), otherwise launch one for this crawl."""
+    if crawler is not None:
+        yield crawler
+    else:
+        async with AsyncWebCrawler(config=browser_config) as new_crawler:
+            yield new_crawler
 
 def is_sitemap(url: str) -> bool:
     return url.endswith('sitemap.xml') or 'sitemap' in urlparse(url).path
@@ -59,7 +58,7 @@ def is_sitemap(url: str) -> bool:
 def is_txt(url: str) -> bool:
     return url.endswith('.txt')
 
-async def crawl_recursive_internal_links(start_urls, max_depth=3, max_concurrent=50) -> List[Dict[str,Any]]:
+async def crawl_recursive_internal_links(start_urls, max_depth=3, max_concurrent=50, crawler=None) -> List[Dict[str,Any]]:
     """Recursive crawl using logic from 5-crawl_recursive_internal_links.py. Returns list of dicts with url and markdown."""
     browser_config = BrowserConfig(headless=True, verbose=False)
     run_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS, stream=False)
@@ -71,13 +70,10 @@ async def crawl_recursive_internal_links(start_urls, max_depth=3, max_concurrent
 
     visited = set()
 
-    def normalize_url(url):
-        return urldefrag(url)[0]
-
     current_urls = set([normalize_url(u) for u in start_urls])
     results_all = []
 
-    async with AsyncWebCrawler(config=browser_config) as crawler:
+    async with crawler_session(crawler, browser_config) as crawler:
         for depth in range(max_depth):
             urls_to_crawl = [normalize_url(url) for url in current_urls if normalize_url(url) not in visited]
             if not urls_to_crawl:
@@ -101,12 +97,12 @@ async def crawl_recursive_internal_links(start_urls, max_depth=3, max_concurrent
 
     return results_all
 
-async def crawl_markdown_file(url: str) -> List[Dict[str,Any]]:
+async def crawl_markdown_file(url: str, crawler=None) -> List[Dict[str,Any]]:
     """Crawl a .txt or markdown file using logic from 4-crawl_and_chunk_markdown.py."""
     browser_config = BrowserConfig(headless=True)
     crawl_config = CrawlerRunConfig()
 
-    async with AsyncWebCrawler(config=browser_config) as crawler:
+    async with crawler_session(crawler, browser_config) as crawler:
         result = await crawler.arun(url=url, config=crawl_config)
         if result.success and result.markdown:
             return [{'url': url, 'markdown': result.markdown}]
@@ -127,7 +123,7 @@ def parse_sitemap(sitemap_url: str) -> List[str]:
 
     return urls
 
-async def crawl_batch(urls: List[str], max_concurrent: int = 10) -> List[Dict[str,Any]]:
+async def crawl_batch(urls: List[str], max_concurrent: int = 10, crawler=None) -> List[Dict[str,Any]]:
     """Batch crawl using logic from 3-crawl_sitemap_in_parallel.py."""
     browser_config = BrowserConfig(headless=True, verbose=False)
     crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS, stream=False)
@@ -137,20 +133,69 @@ async def crawl_batch(urls: List[str], max_concurrent: int = 10) -> List[Dict[st
         max_session_permit=max_concurrent
     )
 
-    async with AsyncWebCrawler(config=browser_config) as crawler:
+    async with crawler_session(crawler, browser_config) as crawler:
         results = await crawler.arun_many(urls=urls, config=crawl_config, dispatcher=dispatcher)
         return [{'url': r.url, 'markdown': r.markdown} for r in results if r.success and r.markdown]
 
-def extract_section_info(chunk: str) -> Dict[str, Any]:
-    """Extracts headers and stats from a chunk."""
-    headers = re.findall(r'^(#+)\s+(.+)$', chunk, re.MULTILINE)
-    header_str = '; '.join([f'{h[0]} {h[1]}' for h in headers]) if headers else ''
+def chunk_document(markdown: str, max_len: int = 1600) -> List[Tuple[str, Dict[str, Any]]]:
+    """Splits markdown along its structure into <max_len chunks, each with its header breadcrumb and stats."""
+    spans = chunk_markdown(markdown, max_len=max_len)
+    chunks = []
+    for i in range(len(spans)):
+        chunk = spans[i]
+        chunks.append((chunk, {
+            "headers": spans.headers(i),
+            "char_count": len(chunk),
+            "word_count": len(chunk.split()),
+        }))
+    return chunks
+
+async def crawl_url(url: str, max_depth: int = 5, max_concurrent: int = 10, crawler=None) -> List[Dict[str,Any]]:
+    """Detect the URL type (.txt, sitemap or regular page) and crawl it with the matching method."""
+    if is_txt(url):
+        print(f"Detected .txt/markdown file: {url}")
+        return dedupe_pages(await crawl_markdown_file(url, crawler=crawler))
+    if is_sitemap(url):
+        print(f"Detected sitemap: {url}")
+        sitemap_urls = list(dict.fromkeys(normalize_url(u) for u in parse_sitemap(url)))
+        if not sitemap_urls:
+            print("No URLs found in sitemap.")
+            return []
+        return dedupe_pages(await crawl_batch(sitemap_urls, max_concurrent=max_concurrent, crawler=crawler))
+    print(f"Detected regular URL: {url}")
+    return dedupe_pages(
+        await crawl_recursive_internal_links([url], max_depth=max_depth, max_concurrent=max_concurrent, crawler=crawler)
+    )
+
+def source_id(url: str) -> str:
+    """Stable id prefix for the chunks of one page, so recrawls replace rather than duplicate them."""
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+def build_chunks(crawl_results: List[Dict[str,Any]], chunk_size: int = 1600, start_index: int = 0) -> Tuple[List[str], List[str], List[Dict[str,Any]]]:
+    """Chunk crawled pages and collect ids, documents and metadata for ChromaDB.
+
+    Pages are deduplicated by URL first: chunk ids derive from the URL, and an
+    upsert must not carry the same id twice.
+    """
+    ids, documents, metadatas = [], [], []
+    chunk_idx = start_index
+    for doc in dedupe_pages(crawl_results):
+        url = doc['url']
+        md = doc['markdown']
+        prefix = source_id(url)
+        for i, (chunk, meta) in enumerate(chunk_document(md, max_len=chunk_size)):
+            ids.append(f"{prefix}-{i}")
+            documents.append(chunk)
+            meta["chunk_index"] = chunk_idx
+            meta["source"] = url
+            metadatas.append(meta)
+            chunk_idx += 1
+    return ids, documents, metadatas
 
-    return {
-        "headers": header_str,
-        "char_count": len(chunk),
-        "word_count": len(chunk.split())
-    }
+def save_to_store(crawl_results: List[Dict[str,Any]], store_path: str) -> int:
+    """Record crawled pages in the corpus store. Returns how many pages were new or changed."""
+    with CorpusStore(store_path) as store:
+        return sum(store.put(doc['url'], str(doc['markdown'])) for doc in crawl_results)
 
 def main():
     parser = argparse.ArgumentParser(description="Insert crawled docs into ChromaDB")
@@ -162,39 +207,22 @@ def main():
     parser.add_argument("--max-depth", type=int, default=5, help="Recursion depth for regular URLs")
     parser.add_argument("--max-concurrent", type=int, default=10, help="Max parallel browser sessions")
     parser.add_argument("--batch-size", type=int, default=100, help="ChromaDB insert batch size")
+    parser.add_argument("--store-dir", default="./corpus", help="Corpus store root (pages kept per collection)")
+    parser.add_argument("--no-store", action="store_true", help="Don't keep crawled pages in the corpus store")
+    parser.add_argument("--faq", action="store_true", help="Also generate a precomputed FAQ side collection (<collection>_faq)")
+    parser.add_argument("--faq-per-chunk", type=int, default=3, help="Questions to generate per chunk")
+    parser.add_argument("--faq-model", default=FAQ_MODEL, help="LLM used to write the FAQ")
     args = parser.parse_args()
 
-    # Detect URL type
-    url = args.url
-    if is_txt(url):
-        print(f"Detected .txt/markdown file: {url}")
-        crawl_results = asyncio.run(crawl_markdown_file(url))
-    elif is_sitemap(url):
-        print(f"Detected sitemap: {url}")
-        sitemap_urls = parse_sitemap(url)
-        if not sitemap_urls:
-            print("No URLs found in sitemap.")
-            sys.exit(1)
-        crawl_results = asyncio.run(crawl_batch(sitemap_urls, max_concurrent=args.max_concurrent))
-    else:
-        print(f"Detected regular URL: {url}")
-        crawl_results = asyncio.run(crawl_recursive_internal_links([url], max_depth=args.max_depth, max_concurrent=args.max_concurrent))
+    crawl_results = asyncio.run(crawl_url(args.url, max_depth=args.max_depth, max_concurrent=args.max_concurrent))
+
+    if not args.no_store and crawl_results:
+        store_path = os.path.join(args.store_dir, args.collection)
+        changed = save_to_store(crawl_results, store_path)
+        print(f"Stored {len(crawl_results)} pages ({changed} new or changed) in {store_path}")
 
     # Chunk and collect metadata
-    ids, documents, metadatas = [], [], []
-    chunk_idx = 0
-    for doc in crawl_results:
-        url = doc['url']
-        md = doc['markdown']
-        chunks = smart_chunk_markdown(md, max_len=args.chunk_size)
-        for chunk in chunks:
-            ids.append(f"chunk-{chunk_idx}")
-            documents.append(chunk)
-            meta = extract_section_info(chunk)
-            meta["chunk_index"] = chunk_idx
-            meta["source"] = url
-            metadatas.append(meta)
-            chunk_idx += 1
+    ids, documents, metadatas = build_chunks(crawl_results, chunk_size=args.chunk_size)
 
     if not documents:
         print("No documents found to insert.")
@@ -204,9 +232,22 @@ def main():
 
     client = get_chroma_client(args.db_dir)
     collection = get_or_create_collection(client, args.collection, embedding_model_name=args.embedding_model)
+    # A recrawled page may have fewer chunks than before; drop its old ones first.
+    for doc in crawl_results:
+        delete_documents_by_source(collection, doc['url'])
     add_documents_to_collection(collection, ids, documents, metadatas, batch_size=args.batch_size)
 
     print(f"Successfully added {len(documents)} chunks to ChromaDB collection '{args.collection}'.")
 
+    if args.faq:
+        print(f"Generating FAQ entries into '{faq_collection_name(args.collection)}'...")
+        generated = asyncio.run(build_faq_index(
+            client, args.collection, ids, documents, metadatas,
+            embedding_model_name=args.embedding_model,
+            per_chunk=args.faq_per_chunk,
+            model=args.faq_model,
+        ))
+        print(f"Generated FAQ entries for {generated} new or changed chunks.")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
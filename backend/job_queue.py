@@ -0,0 +1,242 @@
+"""SQLite-backed job queue and recrawl schedule for the ingestion service.
+
+The database is shared by the scheduler, the worker processes and the API,
+so every operation opens its own short transaction and the file runs in WAL
+mode to let readers proceed while a worker writes.
+"""
+
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+DEFAULT_QUEUE_PATH = os.environ.get("INGEST_QUEUE_DB", "./ingest_queue.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS domains (
+    domain TEXT PRIMARY KEY,
+    start_url TEXT NOT NULL,
+    recrawl_interval REAL NOT NULL,
+    next_run REAL NOT NULL,
+    last_run REAL,
+    last_status TEXT,
+    enabled INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    domain TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    worker TEXT,
+    pages INTEGER,
+    chunks INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_domain ON jobs(domain, status);
+"""
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# The domain names a directory under the Chroma and corpus roots, so only plain host[:port] is accepted.
+_DOMAIN_RE = re.compile(r"[a-z0-9-]+(\.[a-z0-9-]+)*(:[0-9]{1,5})?")
+
+
+@dataclass
+class Job:
+    id: int
+    domain: str
+    url: str
+    worker: Optional[str] = None
+
+
+def domain_of(url: str) -> str:
+    """The URL's ``host[:port]``; raises ``ValueError`` unless it is a plain hostname safe to use as a path."""
+    domain = urlparse(url).netloc.lower()
+    if not _DOMAIN_RE.fullmatch(domain):
+        raise ValueError(f"Not a valid domain: {domain!r}")
+    return domain
+
+
+class JobQueue:
+    """Crawl jobs and per-domain recrawl schedules stored in one SQLite file."""
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def add_domain(self, start_url: str, recrawl_interval: float, run_now: bool = True) -> str:
+        """Register (or update) a domain to be crawled from ``start_url`` every ``recrawl_interval`` seconds."""
+        domain = domain_of(start_url)
+        next_run = time.time() if run_now else time.time() + recrawl_interval
+        with self._transaction() as conn:
+            conn.execute(
+                """INSERT INTO domains (domain, start_url, recrawl_interval, next_run)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(domain) DO UPDATE SET
+                       start_url = excluded.start_url,
+                       recrawl_interval = excluded.recrawl_interval,
+                       next_run = MIN(domains.next_run, excluded.next_run),
+                       enabled = 1""",
+                (domain, start_url, recrawl_interval, next_run),
+            )
+        return domain
+
+    def has_domain(self, domain: str) -> bool:
+        """Whether ``domain`` was ever registered with :meth:`add_domain` (and is a valid domain name)."""
+        if not _DOMAIN_RE.fullmatch(domain):
+            return False
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM domains WHERE domain = ?", (domain,)).fetchone() is not None
+
+    def remove_domain(self, domain: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE domains SET enabled = 0 WHERE domain = ?", (domain,))
+
+    def enqueue(self, url: str) -> Optional[int]:
+        """Queue a crawl of ``url`` unless its domain already has a pending or running job."""
+        domain = domain_of(url)
+        with self._transaction() as conn:
+            busy = conn.execute(
+                "SELECT 1 FROM jobs WHERE domain = ? AND status IN (?, ?) LIMIT 1",
+                (domain, QUEUED, RUNNING),
+            ).fetchone()
+            if busy:
+                return None
+            cur = conn.execute(
+                "INSERT INTO jobs (domain, url, status, created_at) VALUES (?, ?, ?, ?)",
+                (domain, url, QUEUED, time.time()),
+            )
+            return cur.lastrowid
+
+    def schedule_due(self, now: Optional[float] = None) -> List[int]:
+        """Enqueue a recrawl for every enabled domain whose ``next_run`` has passed."""
+        now = time.time() if now is None else now
+        with self._connect() as conn:
+            due = conn.execute(
+                "SELECT start_url FROM domains WHERE enabled = 1 AND next_run <= ?", (now,)
+            ).fetchall()
+        job_ids = []
+        for row in due:
+            try:
+                job_id = self.enqueue(row["start_url"])
+            except ValueError:
+                # Registered before domain names were validated; never crawl it.
+                with self._transaction() as conn:
+                    conn.execute("UPDATE domains SET enabled = 0 WHERE start_url = ?", (row["start_url"],))
+                continue
+            if job_id is not None:
+                job_ids.append(job_id)
+            with self._transaction() as conn:
+                conn.execute(
+                    "UPDATE domains SET next_run = ? + recrawl_interval WHERE start_url = ?",
+                    (now, row["start_url"]),
+                )
+        return job_ids
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """Atomically take the oldest queued job."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, domain, url FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (RUNNING, worker, now, now, row["id"]),
+            )
+            return Job(id=row["id"], domain=row["domain"], url=row["url"], worker=worker)
+
+    # heartbeat/complete/fail given ``worker`` only apply while that worker still holds the job: once its
+    # lease expired and the job was requeued, they return False instead of touching the new claim.
+
+    def heartbeat(self, job_id: int, worker: Optional[str] = None) -> bool:
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ? AND (? IS NULL OR worker = ?)",
+                (time.time(), job_id, RUNNING, worker, worker),
+            )
+            return cur.rowcount > 0
+
+    def complete(self, job_id: int, pages: int, chunks: int, worker: Optional[str] = None) -> bool:
+        return self._finish(job_id, DONE, pages=pages, chunks=chunks, worker=worker)
+
+    def fail(self, job_id: int, error: str, worker: Optional[str] = None) -> bool:
+        return self._finish(job_id, FAILED, error=error[:2000], worker=worker)
+
+    def _finish(self, job_id: int, status: str, pages: int = 0, chunks: int = 0, error: Optional[str] = None,
+                worker: Optional[str] = None) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                """UPDATE jobs SET status = ?, finished_at = ?, pages = ?, chunks = ?, error = ?
+                   WHERE id = ? AND status = ? AND (? IS NULL OR worker = ?)""",
+                (status, now, pages, chunks, error, job_id, RUNNING, worker, worker),
+            )
+            if cur.rowcount == 0:
+                return False
+            conn.execute(
+                """UPDATE domains SET last_run = ?, last_status = ?
+                   WHERE domain = (SELECT domain FROM jobs WHERE id = ?)""",
+                (now, status, job_id),
+            )
+        return True
+
+    def requeue_stale(self, timeout: float) -> int:
+        """Put running jobs whose worker stopped sending heartbeats back in the queue."""
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, time.time() - timeout),
+            )
+            return cur.rowcount
+
+    def status(self, recent: int = 20) -> Dict[str, Any]:
+        """Queue depth, per-domain schedule and the most recent jobs."""
+        with self._connect() as conn:
+            counts = {
+                row["status"]: row["n"]
+                for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+            }
+            domains = [dict(row) for row in conn.execute(
+                "SELECT domain, start_url, recrawl_interval, next_run, last_run, last_status, enabled FROM domains ORDER BY domain"
+            )]
+            jobs = [dict(row) for row in conn.execute(
+                """SELECT id, domain, url, status, created_at, started_at, finished_at, worker, pages, chunks, error
+                   FROM jobs ORDER BY id DESC LIMIT ?""",
+                (recent,),
+            )]
+        return {"jobs_by_status": counts, "domains": domains, "recent_jobs": jobs}
@@ -3,15 +3,20 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
-from api import qa_router, site_qa_router, smart_qa_router, chroma_router
+from api import qa_router, site_qa_router, smart_qa_router, chroma_router, ingest_router, query_batch_router, content_router
+from request_encoding import DecompressRequestMiddleware
+from tracing import configure_logging, metrics_router
 
 load_dotenv()
+configure_logging()
 
 openai_api_key = os.environ.get("OPENAI_API_KEY")
 if not openai_api_key:
     raise RuntimeError("Set OPENAI_API_KEY environment variable.")
 
 app = FastAPI()
+# Added first so it sits inside CORS and its error responses still get CORS headers.
+app.add_middleware(DecompressRequestMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -25,3 +30,7 @@ app.include_router(qa_router)
 app.include_router(site_qa_router)
 app.include_router(smart_qa_router)
 app.include_router(chroma_router)
+app.include_router(ingest_router)
+app.include_router(query_batch_router)
+app.include_router(content_router)
+app.include_router(metrics_router)
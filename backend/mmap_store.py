@@ -0,0 +1,577 @@
+"""Quantized, memory-mapped vector store with a Chroma-compatible collection API.
+
+An alternative to Chroma's in-memory HNSW for large per-domain collections,
+selected with ``VECTOR_STORE=mmap`` (see :func:`utils.get_chroma_client`).
+Vectors are kept as int8 (default) or float16 codes in memory-mapped files, so
+they live in the page cache, shared between worker processes and reclaimable,
+instead of in each process's heap. Queries scan the codes, take the best
+``n_results * MMAP_RERANK_FACTOR`` candidates and re-rank those with the
+full-precision vectors, which are only read (not mapped) for the candidate rows.
+The scan is brute force: query time grows with the collection (around 10 ms
+per 50k int8 vectors of 384 dimensions; float16 is several times slower), in
+exchange for a per-process footprint that stays small (see
+``bench/vector_store.py``).
+
+A collection is a directory ``<persist_directory>/mmap/<name>/``::
+
+    collection.json   name, metadata (``hnsw:space``, ...), dim, quantization, generation
+    g<N>/codes.bin    int8 or float16 codes, one row per vector
+    g<N>/scales.bin   float32 per-row int8 scale (1.0 for float16)
+    g<N>/norms.bin    float32 squared norm of each vector (for ``l2``)
+    g<N>/full.bin     float32 vectors, read for re-ranking only
+    g<N>/records.sqlite3   id, row, document and metadata of every live row
+
+Writes append rows and commit them in SQLite (whose write lock also
+serializes writers across processes); upserts and deletes leave dead rows
+behind, and once those outnumber the live ones the collection is compacted
+into a new generation. Readers map a collection on its first query and
+re-map when SQLite or ``collection.json`` says it changed.
+
+Only the parts of Chroma's API this repo uses are implemented: ``upsert`` /
+``add``, ``delete``, ``get``, ``query``, ``count``, ``modify`` and equality / ``$in`` /
+``$and`` metadata filters.
+"""
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+QUANTIZATION = os.environ.get("MMAP_QUANTIZATION", "int8")  # "int8" or "float16"
+RERANK_FACTOR = int(os.environ.get("MMAP_RERANK_FACTOR", "8"))
+MIN_CANDIDATES = 64
+SCAN_ROWS = 4096  # rows dequantized at a time while scanning
+QUERY_GROUP = 32  # queries scored together per scan
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,127}$")
+_CODE_DTYPES = {"int8": np.int8, "float16": np.float16}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id TEXT PRIMARY KEY,
+    row INTEGER NOT NULL UNIQUE,
+    document TEXT,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def quantize(vectors: np.ndarray, kind: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(codes, per-row scales) for float32 ``vectors``."""
+    if kind == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _where_sql(where: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """SQL condition over ``records.metadata`` for a Chroma ``where`` filter."""
+    if not where:
+        return "1", []
+    clauses, params = [], []
+    for key, cond in where.items():
+        if key == "$and":
+            for sub in cond:
+                sql, sub_params = _where_sql(sub)
+                clauses.append(f"({sql})")
+                params.extend(sub_params)
+            continue
+        if key.startswith("$"):
+            raise ValueError(f"Unsupported where operator: {key}")
+        path = "$." + json.dumps(key)
+        if isinstance(cond, dict):
+            (op, value), = cond.items()
+            if op == "$eq":
+                clauses.append("json_extract(metadata, ?) = ?")
+                params.extend([path, value])
+            elif op == "$in":
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"json_extract(metadata, ?) IN ({','.join('?' * len(value))})")
+                params.extend([path, *value])
+            else:
+                raise ValueError(f"Unsupported where operator: {op}")
+        else:
+            clauses.append("json_extract(metadata, ?) = ?")
+            params.extend([path, cond])
+    return " AND ".join(clauses), params
+
+
+class _Files:
+    """Paths of one generation's files."""
+
+    def __init__(self, directory: str):
+        self.dir = directory
+        self.codes = os.path.join(directory, "codes.bin")
+        self.scales = os.path.join(directory, "scales.bin")
+        self.norms = os.path.join(directory, "norms.bin")
+        self.full = os.path.join(directory, "full.bin")
+        self.db = os.path.join(directory, "records.sqlite3")
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class _View:
+    """A reader's mapping of one generation, refreshed when SQLite reports a commit."""
+
+    def __init__(self, files: _Files, dim: int, quantization: str):
+        self.files = files
+        self.dim = dim
+        self.code_dtype = _CODE_DTYPES[quantization]
+        self.conn = _connect(files.db)
+        self.data_version = -1
+        self.rows = 0
+        self.alive = np.zeros(0, dtype=bool)
+        self.codes = self.scales = self.norms = None
+        self.full_fd = -1
+        self.refresh()
+
+    def _map(self, path: str, dtype, shape) -> Optional[np.memmap]:
+        if self.rows == 0:
+            return None
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+    def full_rows(self, rows: Sequence[int]) -> np.ndarray:
+        """Full-precision vectors of ``rows``, read directly rather than mapped.
+
+        Mapping ``full.bin`` would pull whole page-cache folios into every
+        worker's RSS for a few hundred rows per query.
+        """
+        size = self.dim * 4
+        data = b"".join(os.pread(self.full_fd, size, int(r) * size) for r in rows)
+        return np.frombuffer(data, dtype=np.float32).reshape(len(rows), self.dim)
+
+    def refresh(self) -> None:
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.data_version:
+            return
+        self.data_version = version
+        row = self.conn.execute("SELECT value FROM state WHERE key = 'rows'").fetchone()
+        rows = row[0] if row else 0
+        if rows != self.rows or self.codes is None:
+            self.rows = rows
+            self.codes = self._map(self.files.codes, self.code_dtype, (rows, self.dim))
+            self.scales = self._map(self.files.scales, np.float32, (rows,))
+            self.norms = self._map(self.files.norms, np.float32, (rows,))
+            if self.full_fd < 0 and rows:
+                self.full_fd = os.open(self.files.full, os.O_RDONLY)
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(self.full_fd, 0, 0, os.POSIX_FADV_RANDOM)
+        alive = np.zeros(rows, dtype=bool)
+        live = np.fromiter((r for (r,) in self.conn.execute("SELECT row FROM records")), dtype=np.int64)
+        alive[live[live < rows]] = True
+        self.alive = alive
+
+    def allowed(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        if not where:
+            return self.alive
+        sql, params = _where_sql(where)
+        mask = np.zeros(self.rows, dtype=bool)
+        rows = np.fromiter(
+            (r for (r,) in self.conn.execute(f"SELECT row FROM records WHERE {sql}", params)), dtype=np.int64
+        )
+        mask[rows[rows < self.rows]] = True
+        return mask & self.alive
+
+    def records(self, rows: Sequence[int]) -> Dict[int, Tuple[str, Optional[str], Optional[str]]]:
+        out = {}
+        rows = [int(r) for r in rows]
+        for i in range(0, len(rows), 500):
+            batch = rows[i:i + 500]
+            for row, id_, doc, meta in self.conn.execute(
+                f"SELECT row, id, document, metadata FROM records WHERE row IN ({','.join('?' * len(batch))})", batch
+            ):
+                out[row] = (id_, doc, meta)
+        return out
+
+    def close(self) -> None:
+        self.conn.close()
+        if self.full_fd >= 0:
+            os.close(self.full_fd)
+
+
+class MmapCollection:
+    """One collection; see the module docstring."""
+
+    def __init__(self, path: str, embedding_function=None):
+        self.path = path
+        self._embedding_function = embedding_function
+        self._lock = threading.Lock()
+        self._view: Optional[_View] = None
+        self._config_mtime = 0.0
+        self._load_config()
+
+    # --- configuration ---
+
+    @property
+    def _config_path(self) -> str:
+        return os.path.join(self.path, "collection.json")
+
+    def _load_config(self) -> None:
+        with open(self._config_path, encoding="utf-8") as f:
+            config = json.load(f)
+        self._config_mtime = os.path.getmtime(self._config_path)
+        self.name: str = config["name"]
+        self.metadata: Dict[str, Any] = config.get("metadata") or {}
+        self.dim: Optional[int] = config.get("dim")
+        self.quantization: str = config.get("quantization", QUANTIZATION)
+        self.generation: int = config.get("generation", 0)
+        self.space: str = self.metadata.get("hnsw:space", "l2")
+
+    def _save_config(self) -> None:
+        tmp = self._config_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "name": self.name, "metadata": self.metadata, "dim": self.dim,
+                "quantization": self.quantization, "generation": self.generation,
+            }, f)
+        os.replace(tmp, self._config_path)
+        self._config_mtime = os.path.getmtime(self._config_path)
+
+    def _files(self, generation: Optional[int] = None) -> _Files:
+        return _Files(os.path.join(self.path, f"g{self.generation if generation is None else generation}"))
+
+    def _reload_if_changed(self) -> None:
+        if os.path.getmtime(self._config_path) != self._config_mtime:
+            self._load_config()
+            if self._view is not None:
+                self._view.close()
+                self._view = None
+
+    def _current_view(self) -> Optional[_View]:
+        """The reader mapping, created on first use (None while the collection is empty)."""
+        self._reload_if_changed()
+        if self.dim is None:
+            return None
+        if self._view is None:
+            self._view = _View(self._files(), self.dim, self.quantization)
+        else:
+            self._view.refresh()
+        return self._view
+
+    # --- writing ---
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self._embedding_function is None:
+            raise ValueError(f"Collection {self.name} has no embedding function; pass embeddings")
+        return np.asarray(self._embedding_function(list(texts)), dtype=np.float32)
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        if self.space == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors = vectors / norms
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def _write_transaction(self) -> Tuple[sqlite3.Connection, _Files]:
+        """Open the current generation's database holding its write lock."""
+        while True:
+            files = self._files()
+            os.makedirs(files.dir, exist_ok=True)
+            conn = _connect(files.db)
+            conn.execute("BEGIN IMMEDIATE")
+            generation = self.generation
+            self._reload_if_changed()
+            if self.generation == generation:
+                return conn, files
+            conn.execute("ROLLBACK")  # compacted while we waited; write to the new generation
+            conn.close()
+
+    def upsert(self, ids: List[str], documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Optional[Dict[str, Any]]]] = None, embeddings=None) -> None:
+        if not ids:
+            return
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+        vectors = self._embed(documents) if embeddings is None else np.asarray(embeddings, dtype=np.float32)
+        vectors = self._prepare(vectors)
+        with self._lock:
+            self._reload_if_changed()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._save_config()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimension {self.dim}")
+            codes, scales = quantize(vectors, self.quantization)
+            norms = np.einsum("ij,ij->i", vectors, vectors).astype(np.float32)
+
+            conn, files = self._write_transaction()
+            try:
+                row = conn.execute("SELECT value FROM state WHERE key = 'rows'").fetchone()
+                start = row[0] if row else 0
+                for path, data in ((files.codes, codes), (files.scales, scales),
+                                   (files.norms, norms), (files.full, vectors)):
+                    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                        f.seek(start * data[0].nbytes if data.ndim > 1 else start * data.itemsize)
+                        f.write(data.tobytes())
+                conn.executemany(
+                    "INSERT OR REPLACE INTO records (id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(id_, start + i, doc, json.dumps(meta) if meta else None)
+                     for i, (id_, doc, meta) in enumerate(zip(ids, documents, metadatas))],
+                )
+                conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('rows', ?)", (start + len(ids),))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+        self._maybe_compact()
+
+    add = upsert
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        if self.dim is None:
+            return
+        with self._lock:
+            conn, _ = self._write_transaction()
+            try:
+                if ids is not None:
+                    for i in range(0, len(ids), 500):
+                        batch = ids[i:i + 500]
+                        conn.execute(f"DELETE FROM records WHERE id IN ({','.join('?' * len(batch))})", batch)
+                if where:
+                    sql, params = _where_sql(where)
+                    conn.execute(f"DELETE FROM records WHERE {sql}", params)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        with self._lock:
+            view = self._current_view()
+            due = view is not None and view.rows > 1000 and view.alive.sum() * 2 < view.rows
+        if due:
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the live rows into a new generation and drop the old one."""
+        with self._lock:
+            conn, old = self._write_transaction()
+            try:
+                new = self._files(self.generation + 1)
+                shutil.rmtree(new.dir, ignore_errors=True)
+                os.makedirs(new.dir)
+                live = conn.execute("SELECT id, row, document, metadata FROM records ORDER BY row").fetchall()
+                rows = np.array([r for _, r, _, _ in live], dtype=np.int64)
+                row_size = {"codes": self.dim * np.dtype(_CODE_DTYPES[self.quantization]).itemsize,
+                            "full": self.dim * 4}
+                for name, size in (("codes", row_size["codes"]), ("scales", 4), ("norms", 4), ("full", row_size["full"])):
+                    src = np.memmap(getattr(old, name), dtype=np.uint8, mode="r") if rows.size else None
+                    with open(getattr(new, name), "wb") as f:
+                        for i in range(0, rows.size, SCAN_ROWS):
+                            chunk = rows[i:i + SCAN_ROWS]
+                            f.write(src.reshape(-1, size)[chunk].tobytes())
+                new_conn = _connect(new.db)
+                new_conn.execute("BEGIN")
+                new_conn.executemany(
+                    "INSERT INTO records (id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(id_, i, doc, meta) for i, (id_, _, doc, meta) in enumerate(live)],
+                )
+                new_conn.execute("INSERT INTO state (key, value) VALUES ('rows', ?)", (len(live),))
+                new_conn.execute("COMMIT")
+                new_conn.close()
+                self.generation += 1
+                self._save_config()
+            finally:
+                conn.execute("ROLLBACK")
+                conn.close()
+            if self._view is not None:
+                self._view.close()
+                self._view = None
+            shutil.rmtree(old.dir, ignore_errors=True)  # open maps of other readers stay valid
+
+    def modify(self, name: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Rename the collection and/or replace its metadata, like ``chromadb.Collection.modify``."""
+        with self._lock:
+            self._reload_if_changed()
+            if name is not None and name != self.name:
+                if not _NAME.match(name):
+                    raise ValueError(f"Invalid collection name: {name!r}")
+                target = os.path.join(os.path.dirname(self.path), name)
+                if os.path.exists(target):
+                    raise ValueError(f"Collection {name} already exists.")
+                if self._view is not None:
+                    self._view.close()
+                    self._view = None
+                os.rename(self.path, target)
+                self.path, self.name = target, name
+            if metadata is not None:
+                self.metadata = dict(metadata)
+                self.space = self.metadata.get("hnsw:space", self.space)
+            self._save_config()
+
+    # --- reading ---
+
+    def count(self) -> int:
+        with self._lock:
+            view = self._current_view()
+            return int(view.alive.sum()) if view is not None else 0
+
+    def _distances(self, full: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        if self.space == "l2":
+            return (np.einsum("ij,ij->i", full, full)[None, :] - 2 * queries @ full.T
+                    + np.einsum("ij,ij->i", queries, queries)[:, None])
+        return 1.0 - queries @ full.T
+
+    def _search(self, view: _View, queries: np.ndarray, k: int, mask: np.ndarray) -> List[List[Tuple[int, float]]]:
+        """Per query, the ``k`` best (row, distance) pairs among rows in ``mask``."""
+        candidates = min(int(mask.sum()), max(k * RERANK_FACTOR, MIN_CANDIDATES))
+        if candidates == 0:
+            return [[] for _ in queries]
+        # Approximate scores (higher is better) from the quantized codes.
+        scores = np.empty((view.rows, len(queries)), dtype=np.float32)
+        for start in range(0, view.rows, SCAN_ROWS):
+            end = min(start + SCAN_ROWS, view.rows)
+            dots = (view.codes[start:end].astype(np.float32) @ queries.T) * view.scales[start:end, None]
+            if self.space == "l2":
+                dots = 2 * dots - view.norms[start:end, None]
+            scores[start:end] = dots
+        scores[~mask] = -np.inf
+        results = []
+        for qi in range(len(queries)):
+            top = np.argpartition(-scores[:, qi], candidates - 1)[:candidates]
+            top = np.sort(top)  # sequential reads of the full-precision rows
+            exact = self._distances(view.full_rows(top), queries[qi:qi + 1])[0]
+            order = np.argsort(exact, kind="stable")[:k]
+            results.append([(int(top[i]), float(exact[i])) for i in order])
+        return results
+
+    def query(self, query_embeddings=None, query_texts: Optional[List[str]] = None, n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, include: Sequence[str] = ("metadatas", "documents", "distances"),
+              **_: Any) -> Dict[str, Any]:
+        queries = (self._embed(query_texts) if query_embeddings is None
+                   else np.asarray(query_embeddings, dtype=np.float32))
+        queries = self._prepare(np.atleast_2d(queries))
+        with self._lock:
+            view = self._current_view()
+            hits: List[List[Tuple[int, float]]] = [[] for _ in queries]
+            records: Dict[int, Tuple[str, Optional[str], Optional[str]]] = {}
+            full = {}
+            if view is not None and view.rows:
+                mask = view.allowed(where)
+                hits = []
+                for i in range(0, len(queries), QUERY_GROUP):
+                    hits.extend(self._search(view, queries[i:i + QUERY_GROUP], n_results, mask))
+                rows = sorted({row for per_query in hits for row, _ in per_query})
+                records = view.records(rows)
+                if "embeddings" in include:
+                    full = dict(zip(rows, view.full_rows(rows).tolist()))
+        hits = [[(row, d) for row, d in per_query if row in records] for per_query in hits]
+        result: Dict[str, Any] = {"ids": [[records[row][0] for row, _ in h] for h in hits]}
+        if "documents" in include:
+            result["documents"] = [[records[row][1] for row, _ in h] for h in hits]
+        if "metadatas" in include:
+            result["metadatas"] = [[json.loads(records[row][2]) if records[row][2] else None for row, _ in h]
+                                   for h in hits]
+        if "distances" in include:
+            result["distances"] = [[d for _, d in h] for h in hits]
+        if "embeddings" in include:
+            result["embeddings"] = [[full[row] for row, _ in h] for h in hits]
+        return result
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, include: Sequence[str] = ("metadatas", "documents"),
+            **_: Any) -> Dict[str, Any]:
+        with self._lock:
+            view = self._current_view()
+            rows: List[Tuple[str, int, Optional[str], Optional[str]]] = []
+            if view is not None:
+                sql, params = _where_sql(where)
+                if ids is not None:
+                    sql += f" AND id IN ({','.join('?' * len(ids))})" if ids else " AND 0"
+                    params += list(ids)
+                sql = f"SELECT id, row, document, metadata FROM records WHERE {sql} ORDER BY row"
+                if limit is not None:
+                    sql += f" LIMIT {int(limit)}"
+                rows = view.conn.execute(sql, params).fetchall()
+            embeddings = None
+            if "embeddings" in include:
+                embeddings = view.full_rows([r for _, r, _, _ in rows]).tolist() if rows else []
+        result: Dict[str, Any] = {"ids": [id_ for id_, _, _, _ in rows]}
+        if "documents" in include:
+            result["documents"] = [doc for _, _, doc, _ in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(meta) if meta else None for _, _, _, meta in rows]
+        if embeddings is not None:
+            result["embeddings"] = embeddings
+        return result
+
+
+class MmapVectorClient:
+    """Collections under ``<path>/mmap/``, with the ``chromadb`` client methods the repo uses."""
+
+    def __init__(self, path: str):
+        self.root = os.path.join(path, "mmap")
+        os.makedirs(self.root, exist_ok=True)
+        self._collections: Dict[str, MmapCollection] = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, name: str) -> str:
+        if not _NAME.match(name):
+            raise ValueError(f"Invalid collection name: {name!r}")
+        return os.path.join(self.root, name)
+
+    def get_collection(self, name: str, embedding_function=None, **_: Any) -> MmapCollection:
+        path = self._dir(name)
+        with self._lock:
+            collection = self._collections.get(name)
+            # A cached collection may since have been renamed (modify) or deleted.
+            if collection is None or collection.path != path or not os.path.exists(path):
+                if not os.path.exists(os.path.join(path, "collection.json")):
+                    self._collections.pop(name, None)
+                    raise ValueError(f"Collection {name} does not exist.")
+                collection = self._collections[name] = MmapCollection(path, embedding_function)
+            elif embedding_function is not None:
+                collection._embedding_function = embedding_function
+            return collection
+
+    def create_collection(self, name: str, embedding_function=None, metadata: Optional[Dict[str, Any]] = None,
+                          **_: Any) -> MmapCollection:
+        path = self._dir(name)
+        if os.path.exists(os.path.join(path, "collection.json")):
+            raise ValueError(f"Collection {name} already exists.")
+        os.makedirs(path, exist_ok=True)
+        metadata = dict(metadata or {})
+        quantization = metadata.get("quantization", QUANTIZATION)
+        if quantization not in _CODE_DTYPES:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        with open(os.path.join(path, "collection.json"), "w", encoding="utf-8") as f:
+            json.dump({"name": name, "metadata": metadata, "dim": None,
+                       "quantization": quantization, "generation": 0}, f)
+        return self.get_collection(name, embedding_function)
+
+    def get_or_create_collection(self, name: str, embedding_function=None,
+                                 metadata: Optional[Dict[str, Any]] = None, **_: Any) -> MmapCollection:
+        try:
+            return self.get_collection(name, embedding_function)
+        except ValueError:
+            return self.create_collection(name, embedding_function, metadata)
+
+    def delete_collection(self, name: str) -> None:
+        path = self._dir(name)
+        if not os.path.exists(path):
+            raise ValueError(f"Collection {name} does not exist.")
+        with self._lock:
+            self._collections.pop(name, None)
+        shutil.rmtree(path)
+
+    def list_collections(self) -> List[str]:
+        return sorted(n for n in os.listdir(self.root) if os.path.exists(os.path.join(self.root, n, "collection.json")))
@@ -0,0 +1,188 @@
+"""Per-page cache of embedded chunks for the online QA graphs.
+
+Each page (keyed by URL, or by a hash of its text when the URL is unknown) gets
+its own collection in an in-process Chroma client. When the same page is asked
+about again, the new text is chunked as usual and diffed against the cached
+version by chunk-content hash: unchanged chunks keep their vectors (only their
+offsets are updated in place), new chunks are embedded, and chunks that
+disappeared are deleted. Re-asking on a page that changed a little, as
+single-page apps do, therefore costs embedding work proportional to the change.
+
+The least recently used pages are evicted beyond ``PAGE_INDEX_CACHE_SIZE``.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+import chromadb
+from langchain.schema import Document
+from more_itertools import batched
+
+from text_spans import SpanChunks
+
+EMBED_BATCH_SIZE = 500
+EMBEDDING_MODEL = "text-embedding-ada-002"  # what the QA graphs embed pages with
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class PageIndex:
+    """The embedded chunks of one page. Hold ``lock`` across ``sync`` and ``search``."""
+
+    def __init__(self, client, name: str):
+        self.name = name
+        self.collection = client.get_or_create_collection(name)
+        self.lock = threading.Lock()
+        self.text_digest = b""
+        self.by_hash: Dict[bytes, List[str]] = {}  # chunk text digest -> chunk ids
+        self.metadatas: Dict[str, Dict[str, Any]] = {}  # chunk id -> stored metadata
+        self._next_id = 0
+        # Guarded by the owning PageIndexCache's lock.
+        self.users = 0
+        self.evicted = False
+
+    def sync(self, chunks: SpanChunks, embeddings, **extra: Any) -> Tuple[int, int, int]:
+        """Make the collection hold exactly ``chunks``.
+
+        Returns:
+            (embedded, reused, deleted) chunk counts
+        """
+        text_digest = _digest(chunks.text + repr(sorted(extra.items())))
+        if text_digest == self.text_digest:
+            return 0, len(chunks), 0
+
+        pool = {h: list(ids) for h, ids in self.by_hash.items()}
+        by_hash: Dict[bytes, List[str]] = {}
+        new: List[Tuple[str, str, Dict[str, Any]]] = []
+        moved: List[Tuple[str, Dict[str, Any]]] = []
+        for i in range(len(chunks)):
+            text = chunks[i]
+            h = _digest(text)
+            meta = chunks.metadata(i, **extra)
+            ids = pool.get(h)
+            if ids:
+                chunk_id = ids.pop()
+                if self.metadatas[chunk_id] != meta:
+                    moved.append((chunk_id, meta))
+            else:
+                chunk_id = f"c{self._next_id}"
+                self._next_id += 1
+                new.append((chunk_id, text, meta))
+            by_hash.setdefault(h, []).append(chunk_id)
+
+        # Embed before touching the collection, so a failed embedding call leaves the index as it was.
+        vectors: List[List[float]] = []
+        for batch in batched(new, EMBED_BATCH_SIZE):
+            vectors.extend(embeddings.embed_documents([text for _, text, _ in batch]))
+
+        stale = [chunk_id for ids in pool.values() for chunk_id in ids]
+        try:
+            if stale:
+                self.collection.delete(ids=stale)
+            if moved:
+                self.collection.update(ids=[c for c, _ in moved], metadatas=[m for _, m in moved])
+            for start in range(0, len(new), EMBED_BATCH_SIZE):
+                batch = new[start:start + EMBED_BATCH_SIZE]
+                self.collection.add(
+                    ids=[chunk_id for chunk_id, _, _ in batch],
+                    embeddings=vectors[start:start + EMBED_BATCH_SIZE],
+                    documents=[text for _, text, _ in batch],
+                    metadatas=[meta for _, _, meta in batch],
+                )
+        except BaseException:
+            self._reset()
+            raise
+        for chunk_id in stale:
+            del self.metadatas[chunk_id]
+        self.metadatas.update(moved)
+        self.metadatas.update((chunk_id, meta) for chunk_id, _, meta in new)
+        self.by_hash = by_hash
+        self.text_digest = text_digest
+        return len(new), len(chunks) - len(new), len(stale)
+
+    def _reset(self) -> None:
+        """Empty the collection after a partly applied sync, so the next sync starts from scratch."""
+        self.text_digest = b""
+        self.by_hash = {}
+        self.metadatas = {}
+        ids = self.collection.get(include=[])["ids"]
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def search(self, query_vector: List[float], k: int) -> List[Tuple[Document, float]]:
+        """The ``k`` nearest chunks as (document, distance) pairs, nearest first."""
+        n = min(k, len(self.metadatas))
+        if n == 0:
+            return []
+        result = self.collection.query(
+            query_embeddings=[query_vector], n_results=n, include=["documents", "metadatas", "distances"]
+        )
+        return [
+            (Document(page_content=doc, metadata=meta or {}), distance)
+            for doc, meta, distance in zip(result["documents"][0], result["metadatas"][0], result["distances"][0])
+        ]
+
+
+class PageIndexCache:
+    """LRU map from page key to :class:`PageIndex`.
+
+    Evicted pages are dropped from the map at once, but their collection is
+    deleted only when the last request using them finishes.
+    """
+
+    def __init__(self, max_pages: int = 64):
+        self.max_pages = max_pages
+        self._client = None  # created on first use, so a server can import this module and then fork
+        self._pages: "OrderedDict[str, PageIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = chromadb.EphemeralClient()
+        return self._client
+
+    @staticmethod
+    def key_for(url: str, text: str) -> str:
+        return url if url else "text:" + _digest(text).hex()
+
+    @contextmanager
+    def use(self, key: str) -> Iterator[Tuple[PageIndex, bool]]:
+        """The index for ``key`` and whether it was already cached; it stays alive until the block exits."""
+        with self._lock:
+            index = self._pages.get(key)
+            cached = index is not None
+            if cached:
+                self._pages.move_to_end(key)
+            else:
+                # Unique per instance: a re-created page must not share the collection of an evicted one still in use.
+                self._created += 1
+                name = f"page-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]}-{self._created}"
+                index = self._pages[key] = PageIndex(self.client, name)
+            index.users += 1
+            unused = []
+            while len(self._pages) > self.max_pages:
+                _, evicted = self._pages.popitem(last=False)
+                evicted.evicted = True
+                if evicted.users == 0:
+                    unused.append(evicted)
+        for evicted in unused:
+            self.client.delete_collection(evicted.name)
+        try:
+            yield index, cached
+        finally:
+            with self._lock:
+                index.users -= 1
+                drop = index.evicted and index.users == 0
+            if drop:
+                self.client.delete_collection(index.name)
+
+
+page_indexes = PageIndexCache(int(os.getenv("PAGE_INDEX_CACHE_SIZE", "64")))
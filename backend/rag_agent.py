@@ -1,21 +1,28 @@
 import os
+import json
+import asyncio
 import argparse
-import chromadb
-from openai import OpenAI
-from dotenv import load_dotenv  
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from openai import AsyncOpenAI, OpenAI
+from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env file
 
+from rate_limit import AsyncTokenBucket, CallGate
+from tracing import record_gate_wait, record_llm_usage, span
+from utils import get_chroma_client, get_embedding_function, query_collection_batch
+
 # --- Configuration ---
 CHROMA_DB_DIR = "./chroma_db"          # The directory you used for Chroma
 CHROMA_COLLECTION = "docs"             # The collection name you used
 OPENAI_MODEL = "gpt-4o"                # Use "gpt-4o" for best results
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Set as env variable for security
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "500"))  # Requests per minute allowed for batch answering
 
 # --- Helper: build a prompt with context chunks ---
 def build_prompt(query, docs):
-    context = ""
-    for i, doc in enumerate(docs):
-        context += f"\n---\nSource {i+1}:\n{doc['document']}\n"
+    context = "".join(f"\n---\nSource {i+1}:\n{doc['document']}\n" for i, doc in enumerate(docs))
     prompt = (
         f"Answer the user's question using only the provided sources below. "
         f"If the answer is not in the sources, say you don't know.\n\n"
@@ -23,34 +30,147 @@ def build_prompt(query, docs):
     )
     return prompt
 
+def docs_from_results(results: Dict[str, Any], query_index: int = 0) -> List[Dict[str, Any]]:
+    """The retrieved chunks of one query in a (possibly batched) Chroma result."""
+    return [
+        {"document": doc, "metadata": meta or {}, "id": id_}
+        for doc, meta, id_ in zip(
+            results["documents"][query_index],
+            results["metadatas"][query_index],
+            results["ids"][query_index],
+        )
+    ]
+
+def retrieve_batch(collection, questions: List[str], top_k: int = 10) -> List[List[Dict[str, Any]]]:
+    """Embed all questions in one batch and search them with a single Chroma call."""
+    with span("chroma.query_batch", queries=len(questions)):
+        results = query_collection_batch(collection, questions, n_results=top_k)
+    return [docs_from_results(results, i) for i in range(len(questions))]
+
+@lru_cache(maxsize=1)
+def get_async_client() -> AsyncOpenAI:
+    return AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+async def answer_batch(
+    questions: List[str],
+    retrieved: List[List[Dict[str, Any]]],
+    limiter: AsyncTokenBucket,
+    max_concurrency: int = 8,
+    client_oai: Optional[AsyncOpenAI] = None,
+    gate: Optional[CallGate] = None,
+) -> List[Dict[str, Any]]:
+    """Answer every question from its retrieved chunks, concurrently but paced by ``limiter``.
+
+    Pass ``gate`` (the server passes ``llm_gate``) to also share the process-wide
+    LLM concurrency and rate budget with the interactive endpoints.
+
+    Returns one ``{"answer": ...}`` or ``{"error": ...}`` dict per question, in order.
+    """
+    client_oai = client_oai or get_async_client()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def answer_one(question: str, docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        async with semaphore:
+            await limiter.acquire()
+            if gate is not None:
+                record_gate_wait("llm", await gate.acquire_async())
+            try:
+                with span("llm.batch_answer"):
+                    chat_response = await client_oai.chat.completions.create(
+                        model=OPENAI_MODEL,
+                        messages=[{"role": "user", "content": build_prompt(question, docs)}],
+                        max_tokens=700,
+                        temperature=0.0,
+                    )
+            except Exception as e:
+                return {"error": f"{type(e).__name__}: {e}"}
+            finally:
+                if gate is not None:
+                    gate.release()
+        usage = chat_response.usage
+        if usage is not None:
+            record_llm_usage("batch_answer", usage.prompt_tokens, usage.completion_tokens)
+        return {"answer": (chat_response.choices[0].message.content or "").strip()}
+
+    return await asyncio.gather(*(answer_one(q, docs) for q, docs in zip(questions, retrieved)))
+
+def read_questions(path: str) -> List[str]:
+    """One question per line, or JSONL objects with a ``question`` field."""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    return questions
+
+def run_batch(args, collection, questions: List[str]) -> None:
+    retrieved = retrieve_batch(collection, questions, top_k=args.top_k)
+    if args.no_answer:
+        answers = [{} for _ in questions]
+    else:
+        limiter = AsyncTokenBucket.per_minute(args.rpm, burst=args.concurrency)
+        answers = asyncio.run(answer_batch(questions, retrieved, limiter, max_concurrency=args.concurrency))
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        for question, docs, answer in zip(questions, retrieved, answers):
+            row = {
+                "question": question,
+                **answer,
+                "sources": [
+                    {"source": d["metadata"].get("source", ""), "headers": d["metadata"].get("headers", ""), "id": d["id"]}
+                    for d in docs
+                ],
+            }
+            if out:
+                out.write(json.dumps(row) + "\n")
+                continue
+            print(f"=== {question} ===\n")
+            print(answer.get("answer") or answer.get("error") or "(retrieval only)")
+            print("\nSources:", ", ".join(dict.fromkeys(s["source"] for s in row["sources"])))
+            print("")
+    finally:
+        if out:
+            out.close()
+    if out:
+        print(f"Wrote {len(questions)} results to {args.output}")
+
 def main():
     parser = argparse.ArgumentParser(description="RAG agent with ChromaDB and GPT-4o")
-    parser.add_argument("question", help="The user question to answer")
+    parser.add_argument("question", nargs="*", help="The user question(s) to answer")
+    parser.add_argument("--questions-file", help="Answer every question in this file (one per line or JSONL)")
     parser.add_argument("--db-dir", default=CHROMA_DB_DIR, help="ChromaDB directory")
     parser.add_argument("--collection", default=CHROMA_COLLECTION, help="ChromaDB collection name")
     parser.add_argument("--top-k", type=int, default=10, help="Top-K chunks to retrieve")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel answer requests in batch mode")
+    parser.add_argument("--rpm", type=float, default=OPENAI_RPM, help="OpenAI requests per minute in batch mode")
+    parser.add_argument("--no-answer", action="store_true", help="Batch mode: only retrieve, don't call the LLM")
+    parser.add_argument("--output", help="Batch mode: write JSONL results here instead of printing")
     args = parser.parse_args()
 
+    questions = list(args.question)
+    if args.questions_file:
+        questions += read_questions(args.questions_file)
+    if not questions:
+        parser.error("give a question or --questions-file")
+
     # --- 1. Connect to ChromaDB ---
-    client = chromadb.PersistentClient(path=args.db_dir)
+    client = get_chroma_client(args.db_dir)
     collection = client.get_collection(args.collection)
+    model = (collection.metadata or {}).get("embedding_model")
+    if model:  # the mmap store doesn't persist embedding functions
+        collection = client.get_collection(args.collection, embedding_function=get_embedding_function(model))
+
+    if len(questions) > 1 or args.questions_file:
+        run_batch(args, collection, questions)
+        return
+    question = questions[0]
 
     # --- 2. Retrieve top-k relevant chunks ---
     # Note: Chroma automatically embeds using the model from insertion
-    results = collection.query(
-        query_texts=[args.question],
-        n_results=args.top_k,
-        include=["documents", "metadatas"]
-    )
-
-    # Parse out documents (chunks)
-    docs = []
-    for i in range(len(results["documents"][0])):
-        docs.append({
-            "document": results["documents"][0][i],
-            "metadata": results["metadatas"][0][i],
-            "id": results["ids"][0][i]
-        })
+    docs = retrieve_batch(collection, [question], top_k=args.top_k)[0]
 
     print("---- Retrieved Context ----")
     for d in docs:
@@ -58,7 +178,7 @@ def main():
         print(d['document'][:500])
         print("------")
     # --- 3. Build prompt ---
-    prompt = build_prompt(args.question, docs)
+    prompt = build_prompt(question, docs)
 
     # --- 4. Query OpenAI GPT-4o ---
     client_oai = OpenAI(api_key=OPENAI_API_KEY)
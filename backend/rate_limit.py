@@ -0,0 +1,134 @@
+"""Token buckets and concurrency gates for pacing calls to rate-limited APIs."""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional
+
+_SLOT_POLL_SECONDS = 0.05
+
+
+class AsyncTokenBucket:
+    """Allow ``rate`` tokens per second on average, with bursts of up to ``capacity``.
+
+    Waiters are served in arrival order, so one large request cannot be starved
+    by a stream of small ones. Use as ``await bucket.acquire(cost)`` or as
+    ``async with bucket:`` for a cost of one.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, per_minute: float, burst: Optional[float] = None) -> "AsyncTokenBucket":
+        return cls(per_minute / 60.0, burst)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Wait until ``tokens`` are available and take them. Returns the seconds waited."""
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                delay = (tokens - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= tokens
+        return waited
+
+    async def __aenter__(self) -> "AsyncTokenBucket":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+
+class CallGate:
+    """Thread-safe concurrency cap plus token bucket, shared by sync and async callers.
+
+    Sync code (the LangGraph graphs, which run in worker threads) uses
+    ``with gate.slot():``; coroutines use ``async with gate.async_slot():``.
+    Both yield the seconds spent waiting for a slot.
+    """
+
+    def __init__(self, max_concurrent: int, per_minute: float, burst: Optional[float] = None):
+        if max_concurrent < 1 or per_minute <= 0:
+            raise ValueError("max_concurrent and per_minute must be positive")
+        self.max_concurrent = max_concurrent
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else float(max_concurrent)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._active = 0
+        self._cond = threading.Condition()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def _try_take(self) -> float:
+        """Take a slot and a token if both are free (returns 0), else the seconds to wait."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._active >= self.max_concurrent:
+            return _SLOT_POLL_SECONDS
+        if self._tokens < 1.0:
+            return (1.0 - self._tokens) / self.rate
+        self._active += 1
+        self._tokens -= 1.0
+        return 0.0
+
+    def acquire(self) -> float:
+        """Block until a call may start. Returns the seconds waited."""
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                delay = self._try_take()
+                if delay == 0.0:
+                    return time.monotonic() - start
+                self._cond.wait(delay)
+
+    async def acquire_async(self) -> float:
+        start = time.monotonic()
+        while True:
+            with self._cond:
+                delay = self._try_take()
+            if delay == 0.0:
+                return time.monotonic() - start
+            await asyncio.sleep(min(delay, _SLOT_POLL_SECONDS))
+
+    def release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self) -> Iterator[float]:
+        waited = self.acquire()
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[float]:
+        waited = await self.acquire_async()
+        try:
+            yield waited
+        finally:
+            self.release()
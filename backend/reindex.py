@@ -0,0 +1,132 @@
+"""
+reindex.py
+----------
+Rebuild a ChromaDB collection from the corpus store written by insert_docs.py / ingest_service.py,
+without touching the network. Use it to change --chunk-size or --embedding-model on an existing corpus.
+
+Usage:
+    python reindex.py --collection docs [--store ./corpus/docs] [--db-dir ./chroma_db]
+                      [--embedding-model ...] [--chunk-size 1600]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Tuple
+
+from more_itertools import batched
+
+from corpus_store import CorpusStore
+from insert_docs import build_chunks
+from utils import get_chroma_client, get_or_create_collection, add_documents_to_collection
+
+
+def _find(client, name: str):
+    try:
+        return client.get_collection(name)
+    except Exception:
+        return None
+
+
+def reindex_collection(
+    store: CorpusStore,
+    client,
+    collection_name: str,
+    embedding_model_name: str = "all-MiniLM-L6-v2",
+    chunk_size: int = 1600,
+    batch_size: int = 100,
+    distance_function: str = "cosine",
+    collection_metadata=None,
+    pages_per_batch: int = 200,
+) -> Tuple[int, int]:
+    """Rebuild ``collection_name`` from every page in ``store``.
+
+    The new index is built under a temporary name and only replaces the old
+    collection once it is complete, so a failure partway (embedding error,
+    OOM, Ctrl-C) leaves the existing collection as it was. The swap is two
+    renames; the old collection is deleted only after the new one has its name.
+
+    Returns:
+        (pages, chunks) written
+    """
+    building_name = f"{collection_name[:50]}-reindex"
+    retired_name = f"{collection_name[:50]}-retired"
+    if _find(client, collection_name) is None and _find(client, retired_name) is not None:
+        # Interrupted between the two renames of the swap below: put the old collection back first.
+        client.get_collection(retired_name).modify(name=collection_name)
+    for leftover in (building_name, retired_name):  # from an interrupted run
+        try:
+            client.delete_collection(leftover)
+        except Exception:
+            pass
+    collection = get_or_create_collection(
+        client,
+        building_name,
+        embedding_model_name=embedding_model_name,
+        distance_function=distance_function,
+        metadata=collection_metadata,
+    )
+
+    pages = chunks = 0
+    try:
+        for page_batch in batched(store.iter_pages(), pages_per_batch):
+            ids, documents, metadatas = build_chunks(list(page_batch), chunk_size=chunk_size, start_index=chunks)
+            if documents:
+                add_documents_to_collection(collection, ids, documents, metadatas, batch_size=batch_size)
+            pages += len(page_batch)
+            chunks += len(documents)
+    except BaseException:
+        client.delete_collection(building_name)
+        raise
+
+    # Swap by renaming: the old collection stays (as <name>-retired) until the new one holds its name.
+    old = _find(client, collection_name)
+    if old is not None:
+        old.modify(name=retired_name)
+    try:
+        collection.modify(name=collection_name)
+    except BaseException:
+        if old is not None:
+            old.modify(name=collection_name)
+        raise
+    if old is not None:
+        client.delete_collection(retired_name)
+    return pages, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a ChromaDB collection from the corpus store")
+    parser.add_argument("--collection", default="docs", help="ChromaDB collection name")
+    parser.add_argument("--store", default=None, help="Corpus store directory (default: ./corpus/<collection>)")
+    parser.add_argument("--db-dir", default="./chroma_db", help="ChromaDB directory")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2", help="Embedding model name")
+    parser.add_argument("--chunk-size", type=int, default=1600, help="Max chunk size (chars)")
+    parser.add_argument("--batch-size", type=int, default=100, help="ChromaDB insert batch size")
+    args = parser.parse_args()
+
+    store_path = args.store or os.path.join("./corpus", args.collection)
+    if not os.path.isdir(store_path):
+        print(f"No corpus store at {store_path}")
+        sys.exit(1)
+
+    with CorpusStore(store_path) as store:
+        if not len(store):
+            print(f"Corpus store {store_path} is empty.")
+            sys.exit(1)
+        stats = store.stats()
+        print(f"Reindexing {stats['pages']} pages ({stats['raw_bytes']/1e6:.1f} MB markdown, "
+              f"{stats['stored_bytes']/1e6:.1f} MB on disk) into '{args.collection}'...")
+        t0 = time.perf_counter()
+        client = get_chroma_client(args.db_dir)
+        pages, chunks = reindex_collection(
+            store, client, args.collection,
+            embedding_model_name=args.embedding_model,
+            chunk_size=args.chunk_size,
+            batch_size=args.batch_size,
+        )
+
+    print(f"Rebuilt '{args.collection}' with {chunks} chunks from {pages} pages in {time.perf_counter() - t0:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""ASGI middleware that accepts gzip-, deflate- or zstd-compressed request bodies.
+
+Clients send ``Content-Encoding: gzip`` (or ``deflate`` / ``zstd``) with a
+compressed body; the middleware inflates it before the route sees it and drops
+the header, so handlers and pydantic models are unaware of the compression.
+Decompressed bodies are capped at ``max_body_bytes`` (413 beyond that), so a
+small compressed payload cannot expand into unbounded memory.
+"""
+
+import zlib
+from typing import List
+
+import zstandard
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+_CHUNK = 64 * 1024
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def _inflate_zlib(chunks: List[bytes], wbits: int, limit: int) -> bytes:
+    decomp = zlib.decompressobj(wbits)
+    out = bytearray()
+    for chunk in chunks:
+        data = chunk
+        while data:
+            out += decomp.decompress(data, limit + 1 - len(out))
+            if len(out) > limit:
+                raise BodyTooLarge
+            data = decomp.unconsumed_tail
+    out += decomp.flush()
+    if len(out) > limit:
+        raise BodyTooLarge
+    return bytes(out)
+
+
+def _inflate_zstd(chunks: List[bytes], limit: int) -> bytes:
+    reader = zstandard.ZstdDecompressor().stream_reader(b"".join(chunks))
+    out = bytearray()
+    while True:
+        block = reader.read(_CHUNK)
+        if not block:
+            break
+        out += block
+        if len(out) > limit:
+            raise BodyTooLarge
+    return bytes(out)
+
+
+DECODERS = {
+    "gzip": lambda chunks, limit: _inflate_zlib(chunks, 16 + zlib.MAX_WBITS, limit),
+    "deflate": lambda chunks, limit: _inflate_zlib(chunks, zlib.MAX_WBITS, limit),
+    "zstd": _inflate_zstd,
+}
+
+
+class DecompressRequestMiddleware:
+    def __init__(self, app: ASGIApp, max_body_bytes: int = 64 * 1024 * 1024):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = scope["headers"]
+        encoding = next((v.decode("latin-1").strip().lower() for k, v in headers if k == b"content-encoding"), None)
+        if not encoding or encoding == "identity":
+            return await self.app(scope, receive, send)
+        decoder = DECODERS.get(encoding)
+        if decoder is None:
+            return await PlainTextResponse(f"Unsupported Content-Encoding: {encoding}", 415)(scope, receive, send)
+
+        chunks: List[bytes] = []
+        received = 0
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            if received > self.max_body_bytes:
+                return await PlainTextResponse("Request body too large", 413)(scope, receive, send)
+            chunks.append(chunk)
+            more = message.get("more_body", False)
+        try:
+            body = decoder(chunks, self.max_body_bytes)
+        except BodyTooLarge:
+            return await PlainTextResponse("Decompressed request body too large", 413)(scope, receive, send)
+        except (zlib.error, zstandard.ZstdError):
+            return await PlainTextResponse(f"Invalid {encoding} request body", 400)(scope, receive, send)
+
+        scope = dict(scope)
+        scope["headers"] = [
+            (k, v) for k, v in headers if k not in (b"content-encoding", b"content-length")
+        ] + [(b"content-length", str(len(body)).encode("latin-1"))]
+        sent = False
+
+        async def receive_body() -> Message:
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, receive_body, send)
@@ -0,0 +1,145 @@
+"""
+Multi-worker API server: load the app once, then fork worker processes.
+
+``uvicorn main:app --workers N`` starts every worker from scratch, so each one
+imports LangChain, Chroma and any sentence-transformers model on its own and
+keeps its own cold caches. This server instead imports ``main`` (and, with
+``--preload-model``, loads embedding model weights) in the parent, then forks
+``--workers`` children that serve the same listening socket. Everything loaded
+before the fork is shared copy-on-write between the workers.
+
+The workers share state through the filesystem:
+
+- the content, answer and embedding caches through ``SHARED_STORE_PATH``
+  (see ``shared_store.py``; defaults to ``--shared-store`` here);
+- ingested per-domain Chroma indexes and FAQ collections, which are on disk already;
+- the ingestion job queue (``INGEST_QUEUE_DB``).
+
+Admission limits stay per worker. The OpenAI request budgets (``LLM_RPM``,
+``EMBEDDING_RPM``, ``OPENAI_RPM``) are divided among the workers so the whole
+server keeps to the account's limits. ``/metrics`` reports the worker that
+answers the scrape.
+
+Usage (from backend/):
+    python serve.py [--workers 4] [--host 0.0.0.0] [--port 5000]
+        [--shared-store ./shared_cache.sqlite3] [--preload-model all-MiniLM-L6-v2]
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+from typing import Dict
+
+logger = logging.getLogger("serve")
+
+RATE_BUDGETS = {"LLM_RPM": "500", "EMBEDDING_RPM": "3000", "OPENAI_RPM": "500"}
+STARTUP_FAILURE = 3  # exit status uvicorn uses when a server fails to start
+
+
+def bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, log_level: str) -> int:
+    import uvicorn
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, signal.SIG_DFL)  # uvicorn installs its own graceful-shutdown handlers
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level, access_log=False))
+    server.run(sockets=[sock])
+    return 0 if server.started else STARTUP_FAILURE
+
+
+def worker_exit_code(app, sock: socket.socket, log_level: str) -> int:
+    """Run a worker and return the status its process should exit with."""
+    try:
+        return run_worker(app, sock, log_level)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+    except BaseException:
+        logger.exception("worker crashed")
+        return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-forking multi-worker API server")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--shared-store", default="./shared_cache.sqlite3",
+                        help="SQLite file for the shared caches (unless SHARED_STORE_PATH is set)")
+    parser.add_argument("--preload-model", action="append", default=[],
+                        help="Embedding model to load before forking (repeatable), e.g. all-MiniLM-L6-v2")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    # Both must be in place before the app modules read them at import.
+    os.environ.setdefault("SHARED_STORE_PATH", args.shared_store)
+    for name, default in RATE_BUDGETS.items():
+        os.environ[name] = str(float(os.getenv(name, default)) / args.workers)
+
+    from main import app
+    from utils import get_embedding_function
+
+    for model in args.preload_model:
+        get_embedding_function(model)
+    # Keep the preloaded objects out of the collector's reach, so its passes
+    # don't write to (and un-share) their pages in every worker.
+    gc.freeze()
+
+    sock = bind(args.host, args.port)
+    logger.info("listening on %s:%d with %d workers", args.host, args.port, args.workers)
+
+    children: Dict[int, int] = {}  # pid -> worker number
+    stopping = False
+
+    def spawn(number: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = worker_exit_code(app, sock, args.log_level)
+            finally:
+                os._exit(code)
+        children[pid] = number
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for number in range(args.workers):
+        spawn(number)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        number = children.pop(pid, None)
+        if number is not None and not stopping:
+            logger.warning("worker %d (pid %d) exited with %d; restarting",
+                           number, pid, os.waitstatus_to_exitcode(status))
+            spawn(number)
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
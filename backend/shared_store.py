@@ -0,0 +1,208 @@
+"""SQLite-backed cache shared by the server's worker processes.
+
+When the API runs as several worker processes (see ``serve.py``), each would
+otherwise keep its own cold copy of the uploaded-content store, the embedding
+vectors of pages it has seen and the answers it has given. Setting
+``SHARED_STORE_PATH`` makes them share one SQLite file instead: like the
+ingestion job queue, every operation opens its own short transaction and the
+file runs in WAL mode, so readers in one worker proceed while another writes.
+
+Entries live in namespaces (``content``, ``answer``, ``embedding:<model>``),
+may expire, and each namespace can be capped in bytes, oldest entries first
+out. Without ``SHARED_STORE_PATH`` the caches stay per process, as before.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from tracing import incr, metrics
+
+SHARED_STORE_PATH = os.environ.get("SHARED_STORE_PATH")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_age ON entries (namespace, created_at);
+"""
+
+_IN_BATCH = 500  # keys per "IN (...)" query, under SQLite's variable limit
+
+
+class SharedStore:
+    """Namespaced byte values in one SQLite file, safe to use from many processes and threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._limits: Dict[str, int] = {}
+        self._written: Dict[str, int] = {}  # bytes written per namespace since the last trim
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        # A cache: losing the last writes on power loss is fine, fsync on every commit is not.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def set_limit(self, namespace: str, max_bytes: int) -> None:
+        """Keep ``namespace`` under ``max_bytes``, evicting the oldest entries."""
+        self._limits[namespace] = max_bytes
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        return self.get_many(namespace, [key]).get(key)
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, bytes]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, bytes] = {}
+        now = time.time()
+        with self._connect() as conn:
+            for i in range(0, len(keys), _IN_BATCH):
+                batch = keys[i:i + _IN_BATCH]
+                rows = conn.execute(
+                    f"""SELECT key, value FROM entries
+                        WHERE namespace = ? AND key IN ({",".join("?" * len(batch))})
+                          AND (expires_at IS NULL OR expires_at > ?)""",
+                    (namespace, *batch, now),
+                )
+                found.update(rows)
+        return found
+
+    def missing(self, namespace: str, keys: Iterable[str]) -> List[str]:
+        keys = list(keys)
+        found = self.get_many(namespace, keys)
+        return [k for k in keys if k not in found]
+
+    def put(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.put_many(namespace, {key: value}, ttl)
+
+    def put_many(self, namespace: str, items: Dict[str, bytes], ttl: Optional[float] = None) -> None:
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                """INSERT OR REPLACE INTO entries (namespace, key, value, size, created_at, expires_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [(namespace, k, v, len(v), now, expires_at) for k, v in items.items()],
+            )
+            conn.execute("COMMIT")
+        self._after_write(namespace, sum(len(v) for v in items.values()))
+
+    def _after_write(self, namespace: str, size: int) -> None:
+        limit = self._limits.get(namespace)
+        if limit is None:
+            return
+        with self._lock:
+            self._written[namespace] = self._written.get(namespace, 0) + size
+            due = self._written[namespace] > limit // 16
+            if due:
+                self._written[namespace] = 0
+        if due:
+            self.trim(namespace, limit)
+
+    def trim(self, namespace: str, max_bytes: int) -> int:
+        """Drop expired entries, then the oldest ones until ``namespace`` fits ``max_bytes``.
+
+        Returns:
+            number of entries deleted
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            deleted = conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND expires_at <= ?", (namespace, time.time())
+            ).rowcount
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (namespace,)
+            ).fetchone()[0]
+            if total > max_bytes:
+                excess, stale = total - max_bytes, []
+                for key, size in conn.execute(
+                    "SELECT key, size FROM entries WHERE namespace = ? ORDER BY created_at", (namespace,)
+                ):
+                    if excess <= 0:
+                        break
+                    stale.append((namespace, key))
+                    excess -= size
+                conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", stale)
+                deleted += len(stale)
+            conn.execute("COMMIT")
+        return deleted
+
+
+shared_store: Optional[SharedStore] = SharedStore(SHARED_STORE_PATH) if SHARED_STORE_PATH else None
+
+
+def _text_key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings looked up by text in a :class:`SharedStore`; only misses reach ``inner``.
+
+    Vectors are stored as float32.
+    """
+
+    def __init__(self, inner: Embeddings, store: SharedStore, model: str,
+                 max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        self.inner = inner
+        self.store = store
+        self.namespace = f"embedding:{model}"
+        store.set_limit(self.namespace, max_bytes)
+
+    @staticmethod
+    def _record(hits: int, misses: int) -> None:
+        incr("embedding_cache_hits", hits)
+        incr("embedding_cache_misses", misses)
+        metrics.inc("cache_requests_total", hits, cache="embedding", result="hit")
+        metrics.inc("cache_requests_total", misses, cache="embedding", result="miss")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [_text_key(t) for t in texts]
+        found = self.store.get_many(self.namespace, keys)
+        todo = {k: t for k, t in zip(keys, texts) if k not in found}
+        self._record(len(texts) - sum(k in todo for k in keys), len(todo))
+        vectors = {k: array("f", blob).tolist() for k, blob in found.items()}
+        if todo:
+            fresh = self.inner.embed_documents(list(todo.values()))
+            vectors.update(zip(todo, fresh))
+            self.store.put_many(self.namespace, {k: array("f", v).tobytes() for k, v in zip(todo, fresh)})
+        return [vectors[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = _text_key(text)
+        cached = self.store.get(self.namespace, key)
+        self._record(int(cached is not None), int(cached is None))
+        if cached is not None:
+            return array("f", cached).tolist()
+        vector = self.inner.embed_query(text)
+        self.store.put(self.namespace, key, array("f", vector).tobytes())
+        return vector
+
+
+def cached_embeddings(inner: Embeddings, model: str) -> Embeddings:
+    """``inner`` behind the shared embedding cache, or ``inner`` itself when no store is configured."""
+    return CachedEmbeddings(inner, shared_store, model) if shared_store is not None else inner
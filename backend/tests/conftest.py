@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import numpy as np
+import pytest
+from chromadb.api.types import EmbeddingFunction
+
+
+class CharEmbedding(EmbeddingFunction):
+    """Tiny offline embedding function: length and a character checksum of each text."""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [np.array([len(t), sum(map(ord, t)) % 101, 1.0], dtype=np.float32) for t in input]
+
+    @staticmethod
+    def name():
+        return "test-chars"
+
+    def get_config(self):
+        return {}
+
+
+@pytest.fixture
+def char_embeddings(monkeypatch):
+    """Make ``utils.get_embedding_function`` return :class:`CharEmbedding` for every model name."""
+    import utils
+
+    monkeypatch.setattr(utils, "get_embedding_function", lambda name="all-MiniLM-L6-v2": CharEmbedding())
+    return CharEmbedding
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from admission import AdmissionController, EndpointLimit
+
+
+def controller() -> AdmissionController:
+    return AdmissionController(total=16, limits={
+        "/ask-site": EndpointLimit(concurrency=1, max_queue=4, max_wait=0.5, priority=1),
+        "/ask-smart": EndpointLimit(concurrency=4, max_queue=4, max_wait=0.5, priority=1),
+        "/query-batch": EndpointLimit(concurrency=1, max_queue=4, max_wait=0.5, priority=2),
+    })
+
+
+def test_waiter_blocked_by_its_own_cap_does_not_hold_back_other_endpoints():
+    async def scenario():
+        ctl = controller()
+        release = asyncio.Event()
+
+        async def hold(endpoint):
+            async with ctl.admit(endpoint):
+                await release.wait()
+
+        busy = asyncio.create_task(hold("/ask-site"))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold("/ask-site"))  # waits on /ask-site's cap of 1
+        await asyncio.sleep(0)
+        async with ctl.admit("/ask-smart") as waited:
+            assert waited < 0.1
+        release.set()
+        await asyncio.gather(busy, queued)
+
+    asyncio.run(scenario())
+
+
+def test_queue_full_and_timeout_are_rejected():
+    async def scenario():
+        ctl = AdmissionController(total=1, limits={
+            "/ask": EndpointLimit(concurrency=1, max_queue=1, max_wait=0.05, priority=0),
+        })
+        async with ctl.admit("/ask"):
+            waiting = asyncio.create_task(ctl.admit("/ask").__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as full:
+                async with ctl.admit("/ask"):
+                    pass
+            assert full.value.detail["reason"] == "queue_full"
+            with pytest.raises(HTTPException) as timeout:
+                await waiting
+            assert timeout.value.status_code == 429
+            assert timeout.value.detail["reason"] == "timeout"
+
+    asyncio.run(scenario())
+
+
+def test_freed_slot_goes_to_highest_priority_waiter():
+    async def scenario():
+        ctl = AdmissionController(total=1, limits={
+            "/ask": EndpointLimit(concurrency=1, max_queue=4, max_wait=1.0, priority=0),
+            "/query-batch": EndpointLimit(concurrency=1, max_queue=4, max_wait=1.0, priority=2),
+        })
+        order = []
+
+        async def run(endpoint):
+            async with ctl.admit(endpoint):
+                order.append(endpoint)
+
+        async with ctl.admit("/ask"):
+            tasks = [asyncio.create_task(run("/query-batch")), asyncio.create_task(run("/ask"))]
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert order == ["/ask", "/query-batch"]
+
+    asyncio.run(scenario())
+
+
+def test_slot_handed_over_as_the_wait_times_out_is_given_back(monkeypatch):
+    async def scenario():
+        ctl = AdmissionController(total=1, limits={
+            "/ask": EndpointLimit(concurrency=1, max_queue=1, max_wait=1.0, priority=0),
+        })
+        release = asyncio.Event()
+
+        async def racing_wait_for(future, timeout):
+            release.set()  # the holder finishes and hands its slot to this waiter...
+            while not future.done():
+                await asyncio.sleep(0)
+            raise asyncio.TimeoutError  # ...just as the timeout fires
+
+        async def hold():
+            async with ctl.admit("/ask"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        monkeypatch.setattr(asyncio, "wait_for", racing_wait_for)
+        with pytest.raises(HTTPException) as timeout:
+            async with ctl.admit("/ask"):
+                pass
+        monkeypatch.undo()
+        await holder
+        assert timeout.value.detail["reason"] == "timeout"
+        async with ctl.admit("/ask") as waited:
+            assert waited < 0.1
+
+    asyncio.run(scenario())
@@ -0,0 +1,30 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def test_page_text_is_read_off_the_event_loop(monkeypatch):
+    calls = []
+
+    def page_text(request):
+        calls.append(_on_event_loop())
+        return request.text
+
+    monkeypatch.setattr(api, "page_text", page_text)
+    monkeypatch.setattr(api, "cached_answer", lambda key: {"answer": "cached"})
+    app = FastAPI()
+    app.include_router(api.qa_router)
+    response = TestClient(app).post("/ask", json={"text": "page", "question": "q"})
+    assert response.json() == {"answer": "cached"}
+    assert calls == [False]
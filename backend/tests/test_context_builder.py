@@ -0,0 +1,52 @@
+from langchain_core.documents import Document
+
+import context_builder
+from chunking import chunk_markdown
+from context_builder import build_context, merge_overlapping
+
+PAGE = "\n\n".join(
+    f"## Section {i}\n\n" + " ".join(f"word{i}-{j}" for j in range(60)) + "\n\n- item one\n- item two"
+    for i in range(12)
+)
+URL = "https://example.com/docs"
+
+
+class _WordEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+def _docs(chunks, order):
+    return [Document(page_content=chunks[i], metadata=chunks.metadata(i, url=URL)) for i in order]
+
+
+def test_neighbouring_chunks_merge_across_whitespace_gaps():
+    chunks = chunk_markdown(PAGE, max_len=400)
+    assert len(chunks) > 4
+    assert chunks.span(1)[0] > chunks.span(0)[1]  # chunks are trimmed, so spans never touch
+
+    segments = merge_overlapping(_docs(chunks, [2, 1, 3, 7]), texts={URL: PAGE})
+
+    assert [s.chunk_ids for s in segments] == [[1, 2, 3], [7]]
+    first = segments[0]
+    assert first.rank == 0
+    assert first.text == PAGE[first.start_char:first.end_char]
+    assert (first.start_char, first.end_char) == (chunks.span(1)[0], chunks.span(3)[1])
+
+
+def test_gaps_stay_unmerged_without_the_source_text():
+    chunks = chunk_markdown(PAGE, max_len=400)
+    segments = merge_overlapping(_docs(chunks, [1, 2]))
+    assert [s.chunk_ids for s in segments] == [[1], [2]]
+
+
+def test_build_context_from_chunk_markdown_output(monkeypatch):
+    monkeypatch.setattr(context_builder, "get_encoding", lambda model=None: _WordEncoding())
+    chunks = chunk_markdown(PAGE, max_len=400)
+    docs = _docs(chunks, [4, 5, 6, 0])
+
+    packed = build_context(docs, lambda seg: seg.text, texts={URL: PAGE})
+
+    assert [s.chunk_ids for s in packed.segments] == [[4, 5, 6], [0]]
+    assert packed.text.split(context_builder.SEPARATOR)[0] == PAGE[chunks.span(4)[0]:chunks.span(6)[1]]
+    assert packed.prompt_tokens < packed.naive_tokens
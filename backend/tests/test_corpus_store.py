@@ -0,0 +1,67 @@
+import json
+import os
+
+from corpus_store import DATA_FILE, INDEX_FILE, CorpusStore
+
+PAGES = {
+    "https://example.com/": "# Home\n\nWelcome " * 50,
+    "https://example.com/guide": "## Guide\n\nStep by step, ünïcödé included. " * 80,
+}
+
+
+def _fill(path):
+    with CorpusStore(str(path)) as store:
+        for url, markdown in PAGES.items():
+            assert store.put(url, markdown, fetched_at=1.0)
+    return str(path)
+
+
+def test_round_trip_and_reopen(tmp_path):
+    path = _fill(tmp_path / "store")
+    with CorpusStore(path) as store:
+        assert len(store) == 2
+        assert all(store.get(url) == markdown for url, markdown in PAGES.items())
+        assert [p["url"] for p in store.iter_pages()] == list(PAGES)
+        stats = store.stats()
+        assert stats["raw_bytes"] == sum(len(m.encode("utf-8")) for m in PAGES.values())
+        assert stats["stored_bytes"] < stats["raw_bytes"]
+        assert store.get("https://example.com/missing") is None
+
+
+def test_unchanged_page_only_appends_an_index_line(tmp_path):
+    path = _fill(tmp_path / "store")
+    data_size = os.path.getsize(os.path.join(path, DATA_FILE))
+    with CorpusStore(path) as store:
+        url = "https://example.com/"
+        assert not store.put(url, PAGES[url], fetched_at=2.0)
+        assert store.put("https://example.com/guide", "changed", fetched_at=2.0)
+        assert store.get("https://example.com/guide") == "changed"  # past the first mapping's end
+    assert os.path.getsize(os.path.join(path, DATA_FILE)) > data_size
+    with CorpusStore(path) as store:
+        assert {e.url: e.fetched_at for e in store.entries()} == {url: 2.0, "https://example.com/guide": 2.0}
+        assert store.get("https://example.com/guide") == "changed"
+
+
+def test_torn_index_line_is_ignored(tmp_path):
+    path = _fill(tmp_path / "store")
+    with open(os.path.join(path, INDEX_FILE), "a", encoding="utf-8") as f:
+        f.write('{"url": "https://example.com/torn", "fetched_at"')
+    with CorpusStore(path) as store:
+        assert len(store) == 2
+        assert store.put("https://example.com/next", "after the torn line")
+    with CorpusStore(path) as store:
+        assert store.get("https://example.com/next") == "after the torn line"
+        assert "https://example.com/torn" not in store
+
+
+def test_entries_past_truncated_data_are_dropped(tmp_path):
+    path = _fill(tmp_path / "store")
+    with open(os.path.join(path, INDEX_FILE), encoding="utf-8") as f:
+        last = json.loads(f.readlines()[-1])
+    with open(os.path.join(path, DATA_FILE), "r+b") as f:
+        f.truncate(last["offset"] + last["length"] - 1)
+    with CorpusStore(path) as store:
+        assert last["url"] not in store
+        assert len(store) == 1
+        (url,) = [e.url for e in store.entries()]
+        assert store.get(url) == PAGES[url]
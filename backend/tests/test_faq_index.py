@@ -0,0 +1,56 @@
+import asyncio
+
+import chromadb
+
+import faq_index
+from faq_index import build_faq_index, faq_collection_name
+
+
+def _build(client, documents, generate):
+    async def fake_generate(llm, text, headers, per_chunk, model, limiter, semaphore):
+        return generate(text)
+
+    faq_index._generate = fake_generate
+    ids = [f"chunk-{i}" for i in range(len(documents))]
+    metadatas = [{"source": "https://example.com/", "headers": ""} for _ in documents]
+    return asyncio.run(build_faq_index(client, "example_com", ids, documents, metadatas))
+
+
+def test_failed_regeneration_keeps_the_old_entries(monkeypatch, char_embeddings):
+    monkeypatch.setattr(faq_index, "_generate", faq_index._generate)  # restored after _build replaces it
+    client = chromadb.EphemeralClient()
+    old = ["a" * 300, "b" * 300]
+    assert _build(client, old, lambda text: [{"question": f"what is {text[0]}?", "answer": text[0]}]) == 2
+    faq = client.get_collection(faq_collection_name("example_com"))
+    assert sorted(faq.get()["ids"]) == ["chunk-0-q0", "chunk-1-q0"]
+
+    def down(text):
+        raise RuntimeError("LLM unavailable")
+
+    assert _build(client, ["c" * 300, "d" * 300], down) == 2
+    assert sorted(faq.get()["ids"]) == ["chunk-0-q0", "chunk-1-q0"]
+
+    # A successful run replaces them, and entries the new chunk no longer has are dropped.
+    _build(client, ["f" * 300, "g" * 300], lambda text: [{"question": f"q{j} {text[0]}", "answer": "x"} for j in range(2)])
+    assert sorted(faq.get()["ids"]) == ["chunk-0-q0", "chunk-0-q1", "chunk-1-q0", "chunk-1-q1"]
+    _build(client, ["e" * 300], lambda text: [{"question": "e?", "answer": "e"}])
+    assert faq.get()["ids"] == ["chunk-0-q0"]
+    assert faq.get()["metadatas"][0]["answer"] == "e"
+    client.delete_collection(faq.name)
+
+
+def test_faq_errors_fall_through_to_the_qa_graph(monkeypatch):
+    import api
+
+    def broken(domain):
+        raise OSError("corrupt collection")
+
+    class Graph:
+        def invoke(self, state):
+            return {"answer": "from graph", "enhanced_query": state.question, "used_chunks": [],
+                    "context_stats": {}}
+
+    monkeypatch.setattr(api, "_faq_for_domain", broken)
+    monkeypatch.setattr(api, "qa_graph", Graph())
+    request = api.QARequest(text="page", question="q", page_url="https://example.com/docs")
+    assert api.answer_page_question(request, "page")["answer"] == "from graph"
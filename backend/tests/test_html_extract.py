@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from html_extract import PageLimits, PageTooLarge, _decode, _Download, clip_text, extract_page, extract_stream
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "docs_page.html")
+
+
+@pytest.fixture
+def html():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_extracts_markdown_structure(html):
+    page = extract_page(html)
+    assert page.title == "Install & Configure"
+    assert not page.truncated
+    assert page.text.startswith("Docs home Elsewhere\n\n# Installation\n\nInstall the package with pip, then read the FAQ.")
+    assert "## Requirements" in page.text
+    assert "- Python 3.9+\n- A C compiler\n  1. gcc\n  2. clang" in page.text
+    assert "```\npip install example\nexample --version\n```" in page.text
+    assert "| Option | Default |\n| --- | --- |\n| cache | on |" in page.text
+    for hidden in ("color: red", "tracking", "Enable JavaScript"):
+        assert hidden not in page.text
+
+
+def test_links_are_resolved_against_the_base_href(html):
+    page = extract_page(html, base_url="https://example.com/guide/start")
+    assert [(link["text"], link["href"]) for link in page.links] == [
+        ("Docs home", "https://example.com/docs/"),
+        ("Elsewhere", "https://other.example.org/x"),
+        ("pip", "https://example.com/docs/v2/install.html#pip"),
+        ("FAQ", "https://example.com/faq"),
+        ("Mail us", "mailto:help@example.com"),
+    ]
+    assert extract_page('<a href="b.html">b</a>', base_url="https://example.com/a/").links[0]["href"] == \
+        "https://example.com/a/b.html"
+    assert extract_page('<a href="b.html">b</a>').links[0]["href"] == "b.html"
+
+
+def test_streamed_pieces_match_whole_page(html):
+    pieces = [html[i:i + 7] for i in range(0, len(html), 7)]
+    assert extract_stream(pieces) == extract_page(html)
+
+
+def test_truncates_at_a_line_break(html):
+    page = extract_page(html, max_chars=120)
+    assert page.truncated
+    assert len(page.text) <= 120
+    assert extract_page(html).text.startswith(page.text)
+    assert clip_text("line one\nline two\nline three", 20) == ("line one\nline two", True)
+    assert clip_text("short", 20) == ("short", False)
+
+
+def test_download_limit_truncates_or_rejects():
+    chunks = [b"<p>" + b"x" * 100 + b"</p>"] * 5
+    download = _Download()
+    text = "".join(_decode(iter(chunks), "utf-8", download, PageLimits(max_bytes=250, on_overflow="truncate")))
+    assert download.cut and len(text) == 250
+    with pytest.raises(PageTooLarge):
+        list(_decode(iter(chunks), "utf-8", _Download(), PageLimits(max_bytes=250, on_overflow="reject")))
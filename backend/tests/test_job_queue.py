@@ -0,0 +1,116 @@
+import pytest
+
+from job_queue import JobQueue, domain_of
+
+
+@pytest.mark.parametrize("url", [
+    "http://../x",
+    "http://./x",
+    "http://user@example.com/",
+    "http://ex%2fample.com/",
+    "http://example.com\\..\\x/",
+    "http://.example.com/",
+    "http:///path",
+])
+def test_domain_of_rejects_names_that_are_not_plain_hosts(url):
+    with pytest.raises(ValueError):
+        domain_of(url)
+
+
+def test_domain_of_accepts_host_and_port():
+    assert domain_of("https://Docs.Example.com:8443/a") == "docs.example.com:8443"
+
+
+def test_add_domain_rejects_path_traversal(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite3"))
+    with pytest.raises(ValueError):
+        queue.add_domain("http://../x", recrawl_interval=3600)
+    assert not queue.has_domain("..")
+    assert queue.status()["domains"] == []
+
+
+def test_ingest_endpoint_returns_400_for_invalid_domain(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import api
+
+    monkeypatch.setattr(api, "JobQueue", lambda: JobQueue(str(tmp_path / "queue.sqlite3")))
+    app = FastAPI()
+    app.include_router(api.ingest_router)
+    client = TestClient(app)
+    response = client.post("/ingest/domains", json={"start_url": "http://../x"})
+    assert response.status_code == 400
+    assert client.post("/ingest/domains", json={"start_url": "https://example.com/"}).json()["domain"] == "example.com"
+
+
+def test_a_job_is_claimed_once(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite3"))
+    job_id = queue.enqueue("https://example.com/")
+    assert queue.enqueue("https://example.com/other") is None  # the domain already has a pending job
+    first = queue.claim("worker-1")
+    assert first is not None and first.id == job_id and first.domain == "example.com"
+    assert queue.claim("worker-2") is None
+    assert queue.enqueue("https://example.com/") is None  # still running
+
+
+def test_concurrent_claims_never_share_a_job(tmp_path):
+    import threading
+
+    path = str(tmp_path / "queue.sqlite3")
+    queue = JobQueue(path)
+    for i in range(20):
+        queue.enqueue(f"https://site{i}.example.com/")
+    claimed = []
+
+    def worker(name):
+        q = JobQueue(path)
+        while (job := q.claim(name)) is not None:
+            claimed.append(job.id)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == list(range(1, 21))
+
+
+def test_expired_lease_is_requeued(tmp_path, monkeypatch):
+    import job_queue
+
+    queue = JobQueue(str(tmp_path / "queue.sqlite3"))
+    queue.enqueue("https://example.com/")
+    now = [1000.0]
+    monkeypatch.setattr(job_queue.time, "time", lambda: now[0])
+    job = queue.claim("worker-1")
+
+    now[0] += 30
+    queue.heartbeat(job.id)
+    now[0] += 50
+    assert queue.requeue_stale(timeout=60) == 0  # heartbeat 50 s ago
+
+    now[0] += 20
+    assert queue.requeue_stale(timeout=60) == 1
+    again = queue.claim("worker-2")
+    assert again is not None and again.id == job.id and again.worker == "worker-2"
+
+    # The first worker comes back: its lease is gone, so it can't touch the new claim.
+    assert not queue.heartbeat(job.id, worker=job.worker)
+    assert not queue.fail(job.id, "late", worker=job.worker)
+    assert queue.status()["jobs_by_status"] == {"running": 1}
+
+    assert queue.complete(again.id, pages=3, chunks=10, worker=again.worker)
+    assert queue.status()["jobs_by_status"] == {"done": 1}
+    assert not queue.complete(again.id, pages=3, chunks=10, worker=again.worker)
+
+
+def test_has_domain(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite3"))
+    assert not queue.has_domain("example.com")
+    assert queue.add_domain("https://Example.com/docs", recrawl_interval=3600) == "example.com"
+    assert queue.has_domain("example.com")
+    queue.remove_domain("example.com")
+    assert queue.has_domain("example.com")  # disabled, but its collection still exists
+    assert not queue.has_domain("other.com")
+    assert not queue.has_domain("..")
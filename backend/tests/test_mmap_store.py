@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from mmap_store import MmapVectorClient, quantize
+
+
+def _vectors(n, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _collection(path, kind, vectors, space="cosine"):
+    collection = MmapVectorClient(str(path)).create_collection(
+        "docs", metadata={"hnsw:space": space, "quantization": kind})
+    collection.upsert(ids=[str(i) for i in range(len(vectors))], embeddings=vectors,
+                      documents=[f"doc {i}" for i in range(len(vectors))],
+                      metadatas=[{"source": f"page-{i % 3}"} for i in range(len(vectors))])
+    return collection
+
+
+def test_int8_quantization_error_is_within_half_a_step():
+    vectors = _vectors(200) * np.linspace(0.1, 10, 200, dtype=np.float32)[:, None]
+    vectors[0] = 0.0
+    codes, scales = quantize(vectors, "int8")
+    assert codes.dtype == np.int8 and scales.dtype == np.float32
+    error = np.abs(codes.astype(np.float32) * scales[:, None] - vectors)
+    assert np.all(error <= scales[:, None] / 2 + 1e-6)
+    assert np.all(codes[0] == 0)
+
+
+def test_float16_quantization_error_is_relative():
+    vectors = _vectors(200)
+    codes, scales = quantize(vectors, "float16")
+    assert codes.dtype == np.float16 and np.all(scales == 1.0)
+    assert np.all(np.abs(codes.astype(np.float32) - vectors) <= np.abs(vectors) * 2 ** -10 + 1e-7)
+
+
+@pytest.mark.parametrize("kind", ["int8", "float16"])
+@pytest.mark.parametrize("space", ["cosine", "l2"])
+def test_search_matches_exact_float32_order(tmp_path, kind, space):
+    vectors = _vectors(2000)
+    queries = _vectors(20, seed=1)
+    collection = _collection(tmp_path, kind, vectors, space)
+
+    result = collection.query(query_embeddings=queries, n_results=10, include=["distances"])
+    if space == "cosine":
+        exact = 1.0 - queries @ vectors.T
+    else:
+        exact = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    for qi, (ids, distances) in enumerate(zip(result["ids"], result["distances"])):
+        expected = np.argsort(exact[qi], kind="stable")[:10]
+        assert [int(i) for i in ids] == expected.tolist()
+        np.testing.assert_allclose(distances, exact[qi][expected], rtol=1e-5, atol=1e-5)
+
+
+def test_where_filter_and_documents(tmp_path):
+    vectors = _vectors(300)
+    collection = _collection(tmp_path, "int8", vectors)
+    result = collection.query(query_embeddings=vectors[:1], n_results=5, where={"source": "page-0"})
+    assert result["ids"][0][0] == "0"
+    assert all(m["source"] == "page-0" for m in result["metadatas"][0])
+    assert result["documents"][0][0] == "doc 0"
+
+
+def test_reopen_existing_store(tmp_path):
+    vectors = _vectors(500)
+    collection = _collection(tmp_path, "int8", vectors)
+    collection.delete(ids=["1", "2"])
+    collection.upsert(ids=["3"], embeddings=vectors[:1], documents=["moved"])
+    before = collection.query(query_embeddings=vectors[:4], n_results=5)
+
+    reopened = MmapVectorClient(str(tmp_path)).get_collection("docs")
+    assert reopened.count() == 498
+    assert reopened.metadata["hnsw:space"] == "cosine"
+    assert reopened.get(ids=["1", "3"])["documents"] == ["moved"]
+    after = reopened.query(query_embeddings=vectors[:4], n_results=5)
+    assert after["ids"] == before["ids"]
+    np.testing.assert_allclose(after["distances"], before["distances"])
+
+
+def test_empty_store(tmp_path):
+    client = MmapVectorClient(str(tmp_path))
+    assert client.list_collections() == []
+    collection = client.create_collection("docs", metadata={"hnsw:space": "cosine"})
+    assert collection.count() == 0
+    assert collection.get() == {"ids": [], "documents": [], "metadatas": []}
+    result = collection.query(query_embeddings=[[1.0, 0.0, 0.0]], n_results=3)
+    assert result["ids"] == [[]] and result["distances"] == [[]]
+
+    collection.upsert(ids=["a"], embeddings=[[1.0, 0.0, 0.0]])
+    collection.delete(ids=["a"])
+    assert collection.count() == 0
+    assert collection.query(query_embeddings=[[1.0, 0.0, 0.0]], n_results=3)["ids"] == [[]]
+    with pytest.raises(ValueError):
+        client.get_collection("missing")
@@ -0,0 +1,95 @@
+import threading
+
+import chromadb
+import pytest
+
+import page_index
+from chunking import chunk_markdown
+from page_index import PageIndex, PageIndexCache
+
+PAGE = "\n\n".join(f"## Section {i}\n\n" + " ".join(f"word{i}-{j}" for j in range(40)) for i in range(8))
+
+
+class FakeEmbeddings:
+    """Deterministic vectors; raises on the ``fail_on``-th call to ``embed_documents``."""
+
+    def __init__(self, fail_on=None):
+        self.calls = 0
+        self.fail_on = fail_on
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("embedding service down")
+        return [[float(len(t)), float(sum(map(ord, t)) % 97), 1.0] for t in texts]
+
+
+@pytest.fixture
+def index():
+    client = chromadb.EphemeralClient()
+    name = f"page-test-{id(client)}"
+    yield PageIndex(client, name)
+    client.delete_collection(name)
+
+
+def test_failed_embedding_leaves_index_usable(index, monkeypatch):
+    monkeypatch.setattr(page_index, "EMBED_BATCH_SIZE", 2)
+    first = chunk_markdown(PAGE, max_len=300)
+    assert index.sync(first, FakeEmbeddings()) == (len(first), 0, 0)
+
+    changed = chunk_markdown(PAGE.replace("word3-", "changed3-").replace("word5-", "changed5-")
+                             + "\n\n## New\n\n" + " ".join(f"new-{j}" for j in range(120)), max_len=300)
+    with pytest.raises(RuntimeError):
+        index.sync(changed, FakeEmbeddings(fail_on=2))  # after the first batch was embedded
+    assert index.collection.count() == len(first)
+
+    embedded, reused, deleted = index.sync(changed, FakeEmbeddings())
+    assert embedded + reused == len(changed)
+    assert index.collection.count() == len(changed)
+    assert sorted(index.collection.get()["documents"]) == sorted(changed[i] for i in range(len(changed)))
+
+
+def test_failed_write_resets_the_index(index, monkeypatch):
+    chunks = chunk_markdown(PAGE, max_len=300)
+    index.sync(chunks, FakeEmbeddings())
+
+    def broken_add(**kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(index.collection, "add", broken_add)
+    with pytest.raises(RuntimeError):
+        index.sync(chunk_markdown(PAGE + "\n\nmore text", max_len=300), FakeEmbeddings())
+    monkeypatch.undo()
+    assert index.collection.count() == 0
+    assert index.sync(chunks, FakeEmbeddings()) == (len(chunks), 0, 0)
+
+
+def test_evicted_index_is_deleted_after_its_last_user():
+    cache = PageIndexCache(max_pages=1)
+    with cache.use("a") as (a, cached):
+        assert not cached
+        with cache.use("b") as (b, _):  # evicts "a" while it is in use
+            names = {c.name for c in cache.client.list_collections()}
+            assert a.name in names
+        assert {c.name for c in cache.client.list_collections()} >= {a.name, b.name}
+        with cache.use("a") as (again, cached):
+            assert not cached and again.name != a.name
+    names = {c.name for c in cache.client.list_collections()}
+    assert a.name not in names and b.name not in names and again.name in names
+
+
+def test_waiting_on_an_evicted_page_does_not_block_other_lookups():
+    cache = PageIndexCache(max_pages=1)
+    with cache.use("a") as (a, _):
+        a.lock.acquire()  # a long request on "a"
+        done = threading.Event()
+
+        def other():
+            with cache.use("b"), cache.use("c"):
+                done.set()
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        assert done.wait(5)
+        thread.join()
+        a.lock.release()
@@ -0,0 +1,77 @@
+import chromadb
+import pytest
+
+from corpus_store import CorpusStore
+from mmap_store import MmapVectorClient
+
+pytest.importorskip("crawl4ai")  # reindex builds chunks with insert_docs, which imports it
+from reindex import reindex_collection  # noqa: E402
+
+PAGES = {f"https://example.com/{i}": f"# Page {i}\n\n" + f"Text of page {i}. " * 40 for i in range(5)}
+
+
+@pytest.fixture(params=["chroma", "mmap"])
+def client(request, tmp_path):
+    if request.param == "chroma":
+        return chromadb.PersistentClient(str(tmp_path / "chroma"))
+    return MmapVectorClient(str(tmp_path / "chroma"))
+
+
+@pytest.fixture
+def store(tmp_path):
+    with CorpusStore(str(tmp_path / "corpus")) as store:
+        for url, markdown in PAGES.items():
+            store.put(url, markdown)
+        yield store
+
+
+def _names(client):
+    return sorted(c if isinstance(c, str) else c.name for c in client.list_collections())
+
+
+def test_reindex_replaces_the_collection(client, store, char_embeddings):
+    old = client.create_collection("docs")
+    old.add(ids=["stale"], documents=["stale chunk"], embeddings=[[1.0, 0.0, 0.0]])
+    deleted = []
+    delete = client.delete_collection
+
+    def delete_collection(name):
+        if name == "docs-retired":
+            # The old collection goes only once the new one answers under the live name.
+            assert client.get_collection("docs").count() > 1
+        deleted.append(name)
+        delete(name)
+
+    client.delete_collection = delete_collection
+    pages, chunks = reindex_collection(store, client, "docs", chunk_size=400)
+
+    assert pages == len(PAGES) and chunks >= len(PAGES)
+    assert "docs" not in deleted and "docs-retired" in deleted
+    assert _names(client) == ["docs"]
+    assert client.get_collection("docs").count() == chunks
+    assert "stale" not in client.get_collection("docs").get()["ids"]
+
+
+def test_failed_reindex_keeps_the_old_collection(client, store, char_embeddings, monkeypatch):
+    import reindex
+
+    old = client.create_collection("docs")
+    old.add(ids=["kept"], documents=["kept chunk"], embeddings=[[1.0, 0.0, 0.0]])
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("embedding failed")
+
+    monkeypatch.setattr(reindex, "add_documents_to_collection", broken)
+    with pytest.raises(RuntimeError):
+        reindex_collection(store, client, "docs", chunk_size=400)
+    assert _names(client) == ["docs"]
+    assert client.get_collection("docs").get()["ids"] == ["kept"]
+
+
+def test_interrupted_swap_is_recovered(client, store, char_embeddings):
+    client.create_collection("docs").add(ids=["old"], documents=["old"], embeddings=[[1.0, 0.0, 0.0]])
+    client.get_collection("docs").modify(name="docs-retired")  # crashed between the two renames
+
+    reindex_collection(store, client, "docs", chunk_size=400)
+    assert _names(client) == ["docs"]
+    assert "old" not in client.get_collection("docs").get()["ids"]
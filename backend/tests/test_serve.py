@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+import serve
+
+
+@pytest.mark.parametrize("outcome, code", [
+    (lambda: 0, 0),
+    (lambda: serve.STARTUP_FAILURE, serve.STARTUP_FAILURE),
+    (lambda: (_ for _ in ()).throw(RuntimeError("boom")), 1),
+    (lambda: (_ for _ in ()).throw(SystemExit(4)), 4),
+    (lambda: (_ for _ in ()).throw(SystemExit("fatal")), 1),
+    (lambda: (_ for _ in ()).throw(SystemExit(None)), 0),
+])
+def test_worker_exit_code(monkeypatch, outcome, code):
+    monkeypatch.setattr(serve, "run_worker", lambda app, sock, log_level: outcome())
+    assert serve.worker_exit_code(None, None, "info") == code
+
+
+def test_crashed_worker_process_reports_failure(monkeypatch):
+    def crash(app, sock, log_level):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(serve, "run_worker", crash)
+    pid = os.fork()
+    if pid == 0:
+        os._exit(serve.worker_exit_code(None, None, "info"))
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 1
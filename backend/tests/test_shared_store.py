@@ -0,0 +1,88 @@
+import os
+
+from shared_store import CachedEmbeddings, SharedStore
+
+
+def test_put_get_and_missing(tmp_path):
+    store = SharedStore(str(tmp_path / "shared.sqlite3"))
+    store.put("content", "a", b"alpha")
+    store.put_many("content", {f"k{i}": str(i).encode() for i in range(1200)})  # over one IN batch
+    assert store.get("content", "a") == b"alpha"
+    assert store.get("answer", "a") is None  # namespaces are separate
+    found = store.get_many("content", [f"k{i}" for i in range(1200)] + ["k0", "nope"])
+    assert len(found) == 1200 and found["k1199"] == b"1199"
+    assert store.missing("content", ["a", "b", "k5", "c"]) == ["b", "c"]
+    store.put("content", "a", b"replaced")
+    assert store.get("content", "a") == b"replaced"
+
+
+def test_expired_entries_are_not_returned(tmp_path, monkeypatch):
+    import shared_store
+
+    now = [1000.0]
+    monkeypatch.setattr(shared_store.time, "time", lambda: now[0])
+    store = SharedStore(str(tmp_path / "shared.sqlite3"))
+    store.put("answer", "short", b"x", ttl=10)
+    store.put("answer", "forever", b"y")
+    now[0] += 11
+    assert store.get("answer", "short") is None
+    assert store.get("answer", "forever") == b"y"
+    assert store.trim("answer", max_bytes=1024) == 1
+
+
+def test_limit_evicts_oldest_first(tmp_path, monkeypatch):
+    import shared_store
+
+    now = [1000.0]
+    monkeypatch.setattr(shared_store.time, "time", lambda: now[0])
+    store = SharedStore(str(tmp_path / "shared.sqlite3"))
+    store.set_limit("embedding:test", 1000)
+    for i in range(20):
+        now[0] += 1
+        store.put("embedding:test", f"k{i}", b"x" * 100)
+    kept = store.get_many("embedding:test", [f"k{i}" for i in range(20)])
+    assert sum(map(len, kept.values())) <= 1000 + 1000 // 16 + 100
+    assert "k19" in kept and "k0" not in kept
+    assert store.trim("embedding:test", 300) > 0
+    assert sorted(store.get_many("embedding:test", [f"k{i}" for i in range(20)])) == ["k17", "k18", "k19"]
+
+
+def test_writes_are_visible_to_other_processes(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    store = SharedStore(path)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            SharedStore(path).put("faq_generation", "docs", b"42")
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert store.get("faq_generation", "docs") == b"42"
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t)), 0.5] for t in texts]
+
+    def embed_query(self, text):
+        self.texts.append(text)
+        return [float(len(text)), 0.25]
+
+
+def test_cached_embeddings_only_embed_misses(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    inner = CountingEmbeddings()
+    first = CachedEmbeddings(inner, SharedStore(path), "test")
+    assert first.embed_documents(["a", "bb"]) == [[1.0, 0.5], [2.0, 0.5]]
+
+    other_worker = CachedEmbeddings(inner, SharedStore(path), "test")
+    assert other_worker.embed_documents(["bb", "ccc", "a"]) == [[2.0, 0.5], [3.0, 0.5], [1.0, 0.5]]
+    assert other_worker.embed_query("q") == [1.0, 0.25]
+    assert other_worker.embed_query("q") == [1.0, 0.25]
+    assert inner.texts == ["a", "bb", "ccc", "q"]
+    assert CachedEmbeddings(inner, SharedStore(path), "other-model").embed_documents(["a"]) == [[1.0, 0.5]]
+    assert inner.texts[-1] == "a"
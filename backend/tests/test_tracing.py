@@ -0,0 +1,7 @@
+from tracing import MetricsRegistry
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.inc("errors_total", route='/a"b', error="C:\\path\nnext")
+    assert 'errors_total{error="C:\\\\path\\nnext",route="/a\\"b"} 1' in registry.render()
@@ -0,0 +1,65 @@
+"""Span-based chunk storage.
+
+Chunks (see ``chunking.chunk_markdown``) are stored as ``(start, end)`` offsets
+into the original page text instead of as substrings, so a large page is held
+in memory once and every chunk carries its exact position in the source.
+"""
+
+from array import array
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+class SpanChunks:
+    """Array-backed list of chunk spans over a single text.
+
+    Chunk text is materialized only when indexed, so the only full copy of the
+    page is ``self.text``. Chunkers that know the document structure also
+    record, per chunk, an index into ``breadcrumbs`` (``-1`` for none).
+    """
+
+    __slots__ = ("text", "starts", "ends", "sections", "breadcrumbs")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.starts = array("q")
+        self.ends = array("q")
+        self.sections = array("l")
+        self.breadcrumbs: List[str] = []
+
+    def append(self, start: int, end: int, section: int = -1) -> None:
+        self.starts.append(start)
+        self.ends.append(end)
+        self.sections.append(section)
+
+    def add_breadcrumb(self, breadcrumb: str) -> int:
+        """Register a section breadcrumb and return its index for :meth:`append`."""
+        self.breadcrumbs.append(breadcrumb)
+        return len(self.breadcrumbs) - 1
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> str:
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def __iter__(self) -> Iterator[str]:
+        text = self.text
+        for start, end in zip(self.starts, self.ends):
+            yield text[start:end]
+
+    def span(self, i: int) -> Tuple[int, int]:
+        return self.starts[i], self.ends[i]
+
+    def headers(self, i: int) -> str:
+        """Header breadcrumb of the section chunk ``i`` belongs to, or ``""``."""
+        section = self.sections[i]
+        return self.breadcrumbs[section] if section >= 0 else ""
+
+    def metadata(self, i: int, **extra: Any) -> Dict[str, Any]:
+        """Chunk metadata in the shape the QA graphs use."""
+        meta = {"chunk_id": i, "start_char": self.starts[i], "end_char": self.ends[i]}
+        headers = self.headers(i)
+        if headers:
+            meta["headers"] = headers
+        meta.update(extra)
+        return meta
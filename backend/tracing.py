@@ -0,0 +1,354 @@
+"""Per-request tracing, Prometheus-style metrics and structured logging.
+
+A :class:`Trace` is bound to the current request through a context variable
+(LangGraph and Starlette's thread pool both copy the context, so graph nodes
+running in worker threads see it). Code under a trace records:
+
+- spans: ``with span("fetch"):`` / ``@traced_node("Retrieve")``
+- counters: ``incr("bytes_fetched", n)``, ``record_cache("answer", hit)``
+- LLM and embedding usage through :func:`invoke_llm` and :class:`TracedEmbeddings`
+
+Those two also pass every call through a process-wide :class:`CallGate`
+(``llm_gate`` / ``embedding_gate``), so concurrent requests share one
+concurrency cap and requests-per-minute budget towards OpenAI.
+
+Everything is also aggregated process-wide and exposed by ``GET /metrics``.
+"""
+
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from langchain_core.embeddings import Embeddings
+
+from rate_limit import CallGate
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_request_ids = itertools.count(1)
+
+
+# --- Metrics registry ---
+
+def _escape_label(value: Any) -> str:
+    """A label value escaped for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Minimal thread-safe counters and histograms rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+        self._gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            # [bucket counts..., +Inf count, sum]
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = [0.0] * (len(DURATION_BUCKETS) + 2)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    h[i] += 1
+            h[-2] += 1
+            h[-1] += value
+
+    @staticmethod
+    def _labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+        parts = [f'{k}="{_escape_label(v)}"' for k, v in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> str:
+        lines: List[str] = []
+        described = set()
+
+        def header(name: str, default_kind: str) -> None:
+            if name in described:
+                return
+            described.add(name)
+            kind, help_text = self._help.get(name, (default_kind, ""))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                header(name, "counter")
+                lines.append(f"{name}{self._labels(labels)} {value:g}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                header(name, "gauge")
+                lines.append(f"{name}{self._labels(labels)} {value:g}")
+            for (name, labels), h in sorted(self._histograms.items()):
+                header(name, "histogram")
+                for bound, count in zip(DURATION_BUCKETS, h):
+                    le = 'le="%g"' % bound
+                    lines.append(f"{name}_bucket{self._labels(labels, le)} {count:g}")
+                le = 'le="+Inf"'
+                lines.append(f"{name}_bucket{self._labels(labels, le)} {h[-2]:g}")
+                lines.append(f"{name}_sum{self._labels(labels)} {h[-1]:.6f}")
+                lines.append(f"{name}_count{self._labels(labels)} {h[-2]:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("request_duration_seconds", "histogram", "End-to-end request latency by endpoint.")
+metrics.describe("stage_duration_seconds", "histogram", "Duration of graph nodes, fetches, embedding and LLM calls.")
+metrics.describe("requests_total", "counter", "Requests by endpoint and outcome.")
+metrics.describe("llm_tokens_total", "counter", "LLM tokens by call site and kind.")
+metrics.describe("embedding_texts_total", "counter", "Texts sent to the embedding model.")
+metrics.describe("bytes_fetched_total", "counter", "Bytes downloaded while answering requests.")
+metrics.describe("cache_requests_total", "counter", "Cache lookups by cache and result.")
+metrics.describe("call_gate_wait_seconds", "histogram", "Time LLM and embedding calls waited for a slot.")
+
+llm_gate = CallGate(int(os.getenv("LLM_MAX_CONCURRENCY", "8")), float(os.getenv("LLM_RPM", "500")))
+embedding_gate = CallGate(int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8")), float(os.getenv("EMBEDDING_RPM", "3000")))
+
+
+# --- Request traces ---
+
+class Trace:
+    """Timings and counters for one request."""
+
+    __slots__ = ("endpoint", "request_id", "started", "spans", "counters", "_lock")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.request_id = next(_request_ids)
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, duration: float, **attrs: Any) -> None:
+        entry = {
+            "name": name,
+            "start_ms": round((start - self.started) * 1000, 2),
+            "duration_ms": round(duration * 1000, 2),
+        }
+        entry.update(attrs)
+        with self._lock:
+            self.spans.append(entry)
+
+    def incr(self, counter: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 2)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "request_id": self.request_id,
+                "total_ms": self.elapsed_ms(),
+                "spans": list(self.spans),
+                "counters": dict(self.counters),
+            }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def start_trace(endpoint: str) -> Iterator[Trace]:
+    """Trace one request; records its latency and logs a one-line summary on exit."""
+    trace = Trace(endpoint)
+    token = _current.set(trace)
+    outcome = "ok"
+    try:
+        yield trace
+    except HTTPException as e:
+        outcome = "rejected" if e.status_code == 429 else "error"
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        _current.reset(token)
+        duration = time.perf_counter() - trace.started
+        metrics.observe("request_duration_seconds", duration, endpoint=endpoint)
+        metrics.inc("requests_total", endpoint=endpoint, outcome=outcome)
+        log_event("request", endpoint=endpoint, request_id=trace.request_id, outcome=outcome,
+                  total_ms=round(duration * 1000, 1), **trace.counters)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[None]:
+    """Time a block as a stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        metrics.observe("stage_duration_seconds", duration, stage=name)
+        trace = _current.get()
+        if trace is not None:
+            trace.add_span(name, start, duration, **attrs)
+
+
+def traced_node(name: str) -> Callable:
+    """Decorator recording a graph node as a ``node.<name>`` span."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(f"node.{name}"):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def incr(counter: str, value: float = 1) -> None:
+    """Add to a per-request counter (no-op outside a trace)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.incr(counter, value)
+
+
+def record_fetch(num_bytes: int) -> None:
+    incr("pages_fetched")
+    incr("bytes_fetched", num_bytes)
+    metrics.inc("bytes_fetched_total", num_bytes)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    incr(f"{cache}_cache_hits" if hit else f"{cache}_cache_misses")
+    metrics.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def record_gate_wait(gate: str, waited: float) -> None:
+    metrics.observe("call_gate_wait_seconds", waited, gate=gate)
+    incr(f"{gate}_wait_ms", round(waited * 1000, 2))
+
+
+@contextmanager
+def gated(gate: CallGate, name: str) -> Iterator[None]:
+    """Hold a slot of ``gate`` for the block, recording the wait."""
+    with gate.slot() as waited:
+        record_gate_wait(name, waited)
+        yield
+
+
+def invoke_llm(llm, messages: List[Dict[str, str]], name: str):
+    """``llm.invoke(messages)`` through ``llm_gate``, recorded as an ``llm.<name>`` span with its token usage."""
+    with gated(llm_gate, "llm"), span(f"llm.{name}"):
+        result = llm.invoke(messages)
+    usage = getattr(result, "usage_metadata", None) or {}
+    if not usage:
+        token_usage = (getattr(result, "response_metadata", None) or {}).get("token_usage") or {}
+        usage = {
+            "input_tokens": token_usage.get("prompt_tokens", 0),
+            "output_tokens": token_usage.get("completion_tokens", 0),
+        }
+    record_llm_usage(name, usage.get("input_tokens", 0) or 0, usage.get("output_tokens", 0) or 0)
+    return result
+
+
+def record_llm_usage(name: str, prompt_tokens: int, completion_tokens: int) -> None:
+    """Count one LLM call made outside :func:`invoke_llm` (e.g. with the OpenAI client)."""
+    incr("llm_calls")
+    incr("llm_prompt_tokens", prompt_tokens)
+    incr("llm_completion_tokens", completion_tokens)
+    metrics.inc("llm_tokens_total", prompt_tokens, call=name, kind="prompt")
+    metrics.inc("llm_tokens_total", completion_tokens, call=name, kind="completion")
+
+
+class TracedEmbeddings(Embeddings):
+    """Wraps a LangChain embeddings object to gate and time calls and count embedded texts."""
+
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with gated(embedding_gate, "embedding"), span("embed.documents", texts=len(texts)):
+            vectors = self.inner.embed_documents(texts)
+        incr("embed_calls")
+        incr("embedded_texts", len(texts))
+        metrics.inc("embedding_texts_total", len(texts), kind="documents")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        with gated(embedding_gate, "embedding"), span("embed.query"):
+            vector = self.inner.embed_query(text)
+        incr("embed_calls")
+        metrics.inc("embedding_texts_total", 1, kind="query")
+        return vector
+
+
+# --- Structured logging ---
+
+class KeyValueFormatter(logging.Formatter):
+    """``time level logger event key=value ...`` lines; fields come from ``extra={"fields": {...}}``."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        base = f"{self.formatTime(record)} {record.levelname} {record.name} {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            base += " " + " ".join(f"{k}={json.dumps(v) if isinstance(v, str) else v}" for k, v in fields.items())
+        if record.exc_info:
+            base += "\n" + self.formatException(record.exc_info)
+        return base
+
+
+def configure_logging(level: int = logging.INFO) -> None:
+    handler = logging.StreamHandler()
+    handler.setFormatter(KeyValueFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+
+def log_event(event: str, level: int = logging.INFO, log: Optional[logging.Logger] = None, **fields: Any) -> None:
+    """Log ``event`` with structured fields, tagged with the current request id."""
+    trace = _current.get()
+    if trace is not None and "request_id" not in fields:
+        fields = {"request_id": trace.request_id, **fields}
+    (log or logger).log(level, event, extra={"fields": fields})
+
+
+# --- API ---
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
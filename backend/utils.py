@@ -2,34 +2,79 @@
 
 import os
 import pathlib
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 
 import chromadb
 from chromadb.utils import embedding_functions
 from more_itertools import batched
 
+from mmap_store import MmapVectorClient
+
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "chroma")  # "chroma" or "mmap"
+
 
 def get_chroma_client(persist_directory: str) -> chromadb.PersistentClient:
     """Get a ChromaDB client with the specified persistence directory.
     
+    With ``VECTOR_STORE=mmap`` this returns a :class:`mmap_store.MmapVectorClient`
+    instead, one per directory, which keeps int8/float16 vectors in memory-mapped
+    files and implements the client and collection methods used by these helpers.
+    
     Args:
         persist_directory: Directory where ChromaDB will store its data
         
     Returns:
-        A ChromaDB PersistentClient
+        A ChromaDB PersistentClient (or a MmapVectorClient)
     """
     # Create the directory if it doesn't exist
     os.makedirs(persist_directory, exist_ok=True)
     
+    if VECTOR_STORE == "mmap":
+        return _mmap_client(os.path.abspath(persist_directory))
     # Return the client
     return chromadb.PersistentClient(persist_directory)
 
 
+@lru_cache(maxsize=None)
+def _mmap_client(persist_directory: str) -> MmapVectorClient:
+    # Shared per directory so collections stay mapped between requests.
+    return MmapVectorClient(persist_directory)
+
+
+@lru_cache(maxsize=4)
+def get_embedding_function(
+    embedding_model_name: str = "all-MiniLM-L6-v2",
+) -> embedding_functions.EmbeddingFunction:
+    """Get an embedding function, loading each model once per process.
+    
+    Names of the form ``openai:<model>`` use the OpenAI embeddings API (honouring
+    ``OPENAI_API_KEY`` and ``OPENAI_BASE_URL``); anything else is loaded as a
+    sentence-transformers model.
+    
+    Args:
+        embedding_model_name: Name of the embedding model to use
+        
+    Returns:
+        A ChromaDB embedding function
+    """
+    if embedding_model_name.startswith("openai:"):
+        return embedding_functions.OpenAIEmbeddingFunction(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            model_name=embedding_model_name.split(":", 1)[1],
+            api_base=os.environ.get("OPENAI_BASE_URL"),
+        )
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=embedding_model_name
+    )
+
+
 def get_or_create_collection(
     client: chromadb.PersistentClient,
     collection_name: str,
     embedding_model_name: str = "all-MiniLM-L6-v2",
     distance_function: str = "cosine",
+    metadata: Optional[Dict[str, Any]] = None,
 ) -> chromadb.Collection:
     """Get an existing collection or create a new one if it doesn't exist.
     
@@ -38,14 +83,13 @@ def get_or_create_collection(
         collection_name: Name of the collection
         embedding_model_name: Name of the embedding model to use
         distance_function: Distance function to use for similarity search
+        metadata: Extra collection metadata for new collections (e.g. HNSW settings)
         
     Returns:
-        A ChromaDB Collection
+        A ChromaDB Collection; new ones record ``embedding_model`` in their metadata
     """
     # Create embedding function
-    embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=embedding_model_name
-    )
+    embedding_func = get_embedding_function(embedding_model_name)
     
     # Try to get the collection, create it if it doesn't exist
     try:
@@ -57,7 +101,7 @@ def get_or_create_collection(
         return client.create_collection(
             name=collection_name,
             embedding_function=embedding_func,
-            metadata={"hnsw:space": distance_function}
+            metadata={"hnsw:space": distance_function, "embedding_model": embedding_model_name, **(metadata or {})}
         )
 
 
@@ -67,8 +111,9 @@ def add_documents_to_collection(
     documents: List[str],
     metadatas: Optional[List[Dict[str, Any]]] = None,
     batch_size: int = 100,
+    embeddings: Optional[List[Any]] = None,
 ) -> None:
-    """Add documents to a ChromaDB collection in batches.
+    """Add documents to a ChromaDB collection in batches, replacing any with the same IDs.
     
     Args:
         collection: ChromaDB collection
@@ -76,6 +121,8 @@ def add_documents_to_collection(
         documents: List of document texts
         metadatas: Optional list of metadata dictionaries for each document
         batch_size: Size of batches for adding documents
+        embeddings: Optional precomputed embeddings; the collection's embedding
+            function is used when omitted
     """
     # Create default metadata if none provided
     if metadatas is None:
@@ -91,13 +138,24 @@ def add_documents_to_collection(
         end_idx = batch[-1] + 1  # +1 because end_idx is exclusive
         
         # Add the batch to the collection
-        collection.add(
+        collection.upsert(
             ids=ids[start_idx:end_idx],
             documents=documents[start_idx:end_idx],
             metadatas=metadatas[start_idx:end_idx],
+            embeddings=embeddings[start_idx:end_idx] if embeddings is not None else None,
         )
 
 
+def delete_documents_by_source(collection: chromadb.Collection, source: str) -> None:
+    """Delete every chunk that was inserted for a given source URL.
+    
+    Args:
+        collection: ChromaDB collection
+        source: Value of the ``source`` metadata field to delete
+    """
+    collection.delete(where={"source": source})
+
+
 def query_collection(
     collection: chromadb.Collection,
     query_text: str,
@@ -124,31 +182,59 @@ def query_collection(
     )
 
 
-def format_results_as_context(query_results: Dict[str, Any]) -> str:
+def query_collection_batch(
+    collection: chromadb.Collection,
+    query_texts: List[str],
+    n_results: int = 5,
+    where: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Query a ChromaDB collection for many questions in one call.
+    
+    The questions are embedded together and searched in a single request, so
+    this is much cheaper than calling :func:`query_collection` in a loop.
+    
+    Args:
+        collection: ChromaDB collection
+        query_texts: Texts to search for
+        n_results: Number of results to return per query
+        where: Optional filter to apply to every query
+        
+    Returns:
+        Query results with one list of documents, metadatas, distances and ids per query
+    """
+    return collection.query(
+        query_texts=list(query_texts),
+        n_results=n_results,
+        where=where,
+        include=["documents", "metadatas", "distances"]
+    )
+
+
+def format_results_as_context(query_results: Dict[str, Any], query_index: int = 0) -> str:
     """Format query results as a context string for the agent.
     
     Args:
         query_results: Results from a ChromaDB query
+        query_index: Which query of a batched query to format
         
     Returns:
         Formatted context string
     """
-    context = "CONTEXT INFORMATION:\n\n"
+    parts = ["CONTEXT INFORMATION:\n\n"]
     
     for i, (doc, metadata, distance) in enumerate(zip(
-        query_results["documents"][0],
-        query_results["metadatas"][0],
-        query_results["distances"][0]
+        query_results["documents"][query_index],
+        query_results["metadatas"][query_index],
+        query_results["distances"][query_index]
     )):
         # Add document information
-        context += f"Document {i+1} (Relevance: {1 - distance:.2f}):\n"
+        parts.append(f"Document {i+1} (Relevance: {1 - distance:.2f}):\n")
         
         # Add metadata if available
         if metadata:
-            for key, value in metadata.items():
-                context += f"{key}: {value}\n"
+            parts.extend(f"{key}: {value}\n" for key, value in metadata.items())
         
         # Add document content
-        context += f"Content: {doc}\n\n"
+        parts.append(f"Content: {doc}\n\n")
     
-    return context
\ No newline at end of file
+    return "".join(parts)
@@ -92,10 +92,27 @@ chrome.runtime.onMessage.addListener((req, sender, sendResp) => {
 
   if (req.type === "JUMP_TO_POSITION") {
     const excerpt = req.excerpt || "";
-    if (!excerpt) return;
+
+    // Exact offsets into the page text we sent; the excerpt is only a fallback.
+    let exact = "";
+    const samePage = !req.url || req.url === location.href;
+    if (samePage && typeof req.start_char === "number" && typeof req.end_char === "number") {
+      const pageText = document.body.innerText;
+      if (req.end_char <= pageText.length) {
+        exact = pageText.slice(req.start_char, req.end_char);
+      }
+    }
+    if (!exact && !excerpt) return;
+
+    // window.find() does not match across line breaks, so search line by line.
+    const exactLines = exact
+      .split("\n")
+      .map((line) => line.trim())
+      .filter((line) => line.length > 0);
 
     let found = false;
     let toTry = [
+      ...exactLines.slice(0, 3).map((line) => line.slice(0, 200)),
       excerpt,
       excerpt.trim(),
       excerpt.slice(0, 60),
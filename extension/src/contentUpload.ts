@@ -0,0 +1,83 @@
+// contentUpload.ts
+//
+// Hash-first page uploads: the text is identified by its SHA-256, the backend
+// is asked whether it already has it, and only missing text is uploaded
+// (gzip-compressed). Requests then carry a `content_ref` instead of the text.
+
+const uploaded = new Set<string>();
+
+export async function sha256Hex(text: string): Promise<string> {
+  const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+async function gzip(text: string): Promise<Blob> {
+  const stream = new Blob([text]).stream().pipeThrough(new CompressionStream("gzip"));
+  return await new Response(stream).blob();
+}
+
+async function upload(backendUrl: string, hash: string, text: string): Promise<void> {
+  const resp = await fetch(`${backendUrl}/content/${hash}`, {
+    method: "PUT",
+    headers: { "Content-Type": "text/plain; charset=utf-8", "Content-Encoding": "gzip" },
+    body: await gzip(text),
+  });
+  if (!resp.ok) throw new Error(`Upload of ${hash} failed: ${resp.status}`);
+  uploaded.add(hash);
+}
+
+// Make sure the backend has every one of `texts` (one /content/check for all of
+// them); returns their content references, in order.
+export async function ensureUploadedMany(backendUrl: string, texts: string[]): Promise<string[]> {
+  const hashes = await Promise.all(texts.map(sha256Hex));
+  const unknown = [...new Set(hashes.filter((h) => !uploaded.has(h)))];
+  if (unknown.length === 0) return hashes;
+
+  const resp = await fetch(`${backendUrl}/content/check`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ hashes: unknown }),
+  });
+  if (!resp.ok) throw new Error(`Content check failed: ${resp.status}`);
+  const missing = new Set<string>((await resp.json()).missing);
+  unknown.filter((h) => !missing.has(h)).forEach((h) => uploaded.add(h));
+  await Promise.all([...missing].map((h) => upload(backendUrl, h, texts[hashes.indexOf(h)])));
+  return hashes;
+}
+
+// Make sure the backend has `text`; returns its content reference.
+export async function ensureUploaded(backendUrl: string, text: string): Promise<string> {
+  return (await ensureUploadedMany(backendUrl, [text]))[0];
+}
+
+// Drop hashes the backend reported as missing (e.g. evicted) so they are uploaded again.
+export function forgetUploaded(hashes: string[]): void {
+  hashes.forEach((h) => uploaded.delete(h));
+}
+
+// POST `body` to `path`, sending `body[field]` (page text or HTML) by reference.
+// If the backend has since evicted the content (409), upload it again and retry once.
+export async function postWithContentRef(
+  backendUrl: string,
+  path: string,
+  body: Record<string, unknown>,
+  field = "text"
+): Promise<Response> {
+  const text = String(body[field] ?? "");
+  const { [field]: _omit, ...rest } = body;
+  const send = async () =>
+    fetch(`${backendUrl}${path}`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ ...rest, content_ref: await ensureUploaded(backendUrl, text) }),
+    });
+
+  let resp = await send();
+  if (resp.status === 409) {
+    forgetUploaded([await sha256Hex(text)]);
+    resp = await send();
+  }
+  return resp;
+}
@@ -1,6 +1,7 @@
 import { marked } from "marked";
 import hljs from "highlight.js";
 import { crawlEntireSite, debugLog } from "./siteCrawler";
+import { postWithContentRef } from "./contentUpload";
 
 
 // crawl webpage start
@@ -196,19 +197,21 @@ function getPageDataFromActiveTab(): Promise<{
   tables: string[];
   links: Array<{ text: string; href: string }>;
   images: Array<{ alt: string; src: string }>;
+  url: string;
 }> {
   return new Promise((resolve) => {
     chrome.tabs.query({ active: true, currentWindow: true }, (tabs) => {
+      const url = tabs[0]?.url ?? "";
       if (tabs[0]?.id !== undefined) {
         chrome.tabs.sendMessage(
           tabs[0].id,
           { type: "GET_PAGE_DATA" },
           (resp) => {
-            resolve(resp || { text: "", tables: [], links: [], images: [] });
+            resolve({ ...(resp || { text: "", tables: [], links: [], images: [] }), url });
           }
         );
       } else {
-        resolve({ text: "", tables: [], links: [], images: [] });
+        resolve({ text: "", tables: [], links: [], images: [], url });
       }
     });
   });
@@ -241,8 +244,16 @@ function appendMessage(text: string, sender: 'user' | 'bot' | 'thinking'): HTMLE
   return bubble;
 }
 
-// Source link logic (unchanged)
-function renderSources(sources: Array<{ excerpt: string; title?: string; url?: string }>) {
+type Source = {
+  excerpt: string;
+  title?: string;
+  url?: string;
+  start_char?: number | null;
+  end_char?: number | null;
+};
+
+// Source link logic
+function renderSources(sources: Source[]) {
   if (!sources || sources.length === 0) return;
 
   const srcDiv = document.createElement("div");
@@ -261,18 +272,30 @@ function renderSources(sources: Array<{ excerpt: string; title?: string; url?: s
       `<div style="font-size:0.98em; color:#555; margin-bottom:1px;"><i>${src.excerpt}</i></div>` +
       `<div>${infoText}</div>`;
 
+    if (typeof src.start_char === "number") {
+      srcBlock.style.cursor = "pointer";
+      srcBlock.title = "Jump to this passage";
+      srcBlock.onclick = () => jumpToSource(src);
+    }
+
     srcDiv.appendChild(srcBlock);
   });
 
   chatDiv.appendChild(srcDiv);
 }
 
-function jumpToSource(excerpt: string) {
+function jumpToSource(src: Source) {
   chrome.tabs.query({ active: true, currentWindow: true }, (tabs) => {
     if (tabs[0]?.id !== undefined) {
       chrome.tabs.sendMessage(
         tabs[0].id,
-        { type: "JUMP_TO_POSITION", excerpt },
+        {
+          type: "JUMP_TO_POSITION",
+          excerpt: src.excerpt,
+          url: src.url,
+          start_char: src.start_char,
+          end_char: src.end_char,
+        },
         () => {}
       );
     }
@@ -302,14 +325,17 @@ askBtn.onclick = async function () {
   }
 
   try {
-    const resp = await fetch("http://localhost:5000/ask", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ text: context, question }),
+    const resp = await postWithContentRef(BACKEND_BASE_URL, "/ask", {
+      text: context,
+      question,
+      page_url: pageData.url,
     });
     const data = await resp.json();
     thinkingBubble.remove();
     appendMessage(data.answer, "bot");
+    if (data.faq) {
+      appendMessage(`(Precomputed answer for: "${data.faq.question}")`, "bot");
+    }
     if (data.sources && data.sources.length > 0) {
       renderSources(data.sources);
     }
@@ -353,11 +379,7 @@ smartBtn.onclick = async function () {
           page_url,
         };
         try {
-          const resp = await fetch("http://localhost:5000/ask-smart", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify(body),
-          });
+          const resp = await postWithContentRef(BACKEND_BASE_URL, "/ask-smart", body);
           const data = await resp.json();
           thinkingBubble.remove();
 
@@ -1,96 +1,295 @@
 // siteCrawler.ts
+//
+// Same-origin site crawler for the side panel. A bounded pool of workers
+// fetches pages breadth-first up to a page cap and depth limit; URLs are
+// canonicalized before they are queued so each page is fetched once. Pages
+// are sent to the backend in batches (/add_page_data_batch) in the
+// background, by content hash, while the crawl goes on.
+//
+// Nothing calls crawlEntireSite at the moment: the side panel's crawl-on-open
+// hook is commented out in sidepanel.ts.
 
-export function debugLog(msg: string) {
+import { ensureUploadedMany, forgetUploaded } from "./contentUpload";
+
+// ---- Debug log ----
+// Lines are buffered and written a few times per second, keeping only the
+// most recent ones, so a long crawl doesn't re-render an ever-growing text node.
+
+const LOG_FLUSH_MS = 250;
+const LOG_MAX_LINES = 500;
+let logLines: string[] = [];
+let pendingLines: string[] = [];
+let logTimer: number | undefined;
+
+function flushLog() {
+  logTimer = undefined;
+  logLines = logLines.concat(pendingLines).slice(-LOG_MAX_LINES);
+  pendingLines = [];
   const div = document.getElementById("debug-log");
   if (div) {
-    div.textContent += msg + "\n";
+    div.textContent = logLines.join("\n") + "\n";
     div.scrollTop = div.scrollHeight;
   }
 }
 
-// Extract all same-domain links from HTML using raw href (never uses .href property)
+export function debugLog(msg: string) {
+  pendingLines.push(msg);
+  if (pendingLines.length > LOG_MAX_LINES) pendingLines = pendingLines.slice(-LOG_MAX_LINES);
+  if (logTimer === undefined) logTimer = window.setTimeout(flushLog, LOG_FLUSH_MS);
+}
+
+// ---- URLs ----
+
+const SKIPPED_EXTENSIONS = /\.(png|jpe?g|gif|svg|webp|ico|css|js|mjs|json|xml|pdf|zip|gz|tgz|mp4|mp3|webm|woff2?|ttf|eot)$/i;
+const TRACKING_PARAMS = /^(utm_[a-z]+|fbclid|gclid|msclkid|mc_[a-z]+|ref)$/i;
+
+// Absolute form of `raw` used for deduplication: http(s) only, no fragment,
+// no tracking parameters, remaining query parameters sorted. Null if the link
+// isn't crawlable.
+export function canonicalizeUrl(raw: string, base: string): string | null {
+  let url: URL;
+  try {
+    url = new URL(raw, base);
+  } catch {
+    return null;
+  }
+  if (url.protocol !== "http:" && url.protocol !== "https:") return null;
+  if (SKIPPED_EXTENSIONS.test(url.pathname)) return null;
+  url.hash = "";
+  url.username = "";
+  url.password = "";
+  const params: [string, string][] = [];
+  url.searchParams.forEach((value, key) => {
+    if (!TRACKING_PARAMS.test(key)) params.push([key, value]);
+  });
+  params.sort(([a], [b]) => (a < b ? -1 : a > b ? 1 : 0));
+  url.search = new URLSearchParams(params).toString();
+  return url.href;
+}
+
+// Same-origin links of a page, canonicalized and deduplicated.
 export function extractSameDomainLinksFromHtml(html: string, baseUrl: string): { text: string; href: string }[] {
-  const parser = new DOMParser();
-  const doc = parser.parseFromString(html, "text/html");
+  const doc = new DOMParser().parseFromString(html, "text/html");
   const origin = new URL(baseUrl).origin;
+  // Relative links resolve against <base href> when the page has one.
+  const base = canonicalizeUrl(doc.querySelector("base")?.getAttribute("href") || "", baseUrl) || baseUrl;
 
-  debugLog(`Extracting links from: ${origin}`);
+  const links = new Map<string, { text: string; href: string }>();
+  for (const a of Array.from(doc.querySelectorAll("a[href]"))) {
+    const href = canonicalizeUrl(a.getAttribute("href") || "", base);
+    if (!href || links.has(href) || new URL(href).origin !== origin) continue;
+    links.set(href, { text: (a.textContent || "").trim(), href });
+  }
+  return Array.from(links.values());
+}
 
-  // Print all raw hrefs before filtering
-  const allLinks = Array.from(doc.querySelectorAll("a"));
-  debugLog(`All <a> links found (${allLinks.length}):`);
-  allLinks.forEach(a => {
-    const rawHref = a.getAttribute("href") || "";
-    debugLog(`  - ${rawHref} (${a.innerText.trim()})`);
-  });
+// ---- Batched uploads ----
 
-  let links: { text: string; href: string }[] = [];
-  allLinks.forEach(a => {
-    const rawHref = a.getAttribute("href") || "";
-    const outer = a.outerHTML;
-    if (
-      outer.includes(origin) && // filter on raw HTML if you want
-      rawHref &&
-      !rawHref.endsWith("#") &&
-      !rawHref.startsWith("javascript:") &&
-      rawHref !== baseUrl
-    ) {
-      // Always resolve as absolute for crawling
-      try {
-        const absHref = new URL(rawHref, baseUrl).href;
-        links.push({ text: a.innerText.trim(), href: absHref });
-      } catch {}
-    }
-  });
+interface CrawledPage {
+  url: string;
+  domain: string;
+  html: string;
+}
 
-  // Remove duplicates by resolved href
-  const uniqueLinksMap = new Map<string, { text: string; href: string }>();
-  links.forEach(link => {
-    if (!uniqueLinksMap.has(link.href)) {
-      uniqueLinksMap.set(link.href, link);
-    }
-  });
+// Collects pages and posts them to /add_page_data_batch in the background.
+// At most `maxInFlight` batches are sent at once; `add` waits when that many
+// are pending, which bounds how much page HTML the panel holds.
+class BatchUploader {
+  private pending: CrawledPage[] = [];
+  private inFlight = new Set<Promise<void>>();
+  private flushing: Promise<void> = Promise.resolve();
+  uploaded = 0;
+  failed = 0;
 
-  debugLog(`Same-domain links found (${uniqueLinksMap.size}):`);
-  Array.from(uniqueLinksMap.values()).forEach(link => {
-    debugLog(`  - ${link.href} (${link.text})`);
-  });
+  constructor(
+    private backendUrl: string,
+    private batchSize: number,
+    private maxInFlight = 2
+  ) {}
+
+  async add(page: CrawledPage): Promise<void> {
+    this.pending.push(page);
+    if (this.pending.length >= this.batchSize) await this.flush();
+  }
 
-  return Array.from(uniqueLinksMap.values());
+  // Flushes run one after another, so two callers can't both pass the
+  // in-flight check while waiting and exceed `maxInFlight`.
+  flush(): Promise<void> {
+    const run = this.flushing.then(() => this.flushNow());
+    this.flushing = run.catch(() => undefined);
+    return run;
+  }
+
+  private async flushNow(): Promise<void> {
+    while (this.inFlight.size >= this.maxInFlight) await Promise.race(this.inFlight);
+    if (this.pending.length === 0) return;
+    const batch = this.pending;
+    this.pending = [];
+    const task = this.send(batch)
+      .then(() => {
+        this.uploaded += batch.length;
+      })
+      .catch((err) => {
+        this.failed += batch.length;
+        debugLog(`Upload of ${batch.length} pages failed: ${err}`);
+      })
+      .finally(() => this.inFlight.delete(task));
+    this.inFlight.add(task);
+  }
+
+  async close(): Promise<void> {
+    await this.flush();
+    await Promise.all(this.inFlight);
+  }
+
+  private async send(batch: CrawledPage[], retry = true): Promise<void> {
+    const refs = await ensureUploadedMany(this.backendUrl, batch.map((p) => p.html));
+    const resp = await fetch(`${this.backendUrl}/add_page_data_batch`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        pages: batch.map((p, i) => ({ url: p.url, domain: p.domain, content_ref: refs[i] })),
+      }),
+    });
+    if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+    const missing: string[] = (await resp.json()).missing || [];
+    if (missing.length === 0) return;
+    if (!retry) throw new Error(`${missing.length} pages still missing after re-upload`);
+    // Evicted between the check and the post: upload those again and resend them.
+    forgetUploaded(missing);
+    const again = new Set(missing);
+    await this.send(batch.filter((_, i) => again.has(refs[i])), false);
+  }
+}
+
+// ---- Crawler ----
+
+export interface CrawlOptions {
+  concurrency?: number; // pages fetched at once
+  maxPages?: number; // pages fetched in total
+  maxDepth?: number; // link hops from the start page
+  batchSize?: number; // pages per /add_page_data_batch request
+  signal?: AbortSignal;
+  onProgress?: (stats: CrawlStats) => void;
+}
+
+export interface CrawlStats {
+  fetched: number;
+  queued: number;
+  failed: number;
+  uploaded: number;
+  uploadFailed: number;
+  elapsedMs: number;
 }
 
-export async function crawlEntireSite(startUrl: string, domain: string, backendUrl: string) {
-  const visited = new Set<string>();
-  const queue = [startUrl];
+export async function crawlEntireSite(
+  startUrl: string,
+  domain: string,
+  backendUrl: string,
+  options: CrawlOptions = {}
+): Promise<CrawlStats> {
+  const { concurrency = 6, maxPages = 500, maxDepth = 5, batchSize = 20, signal, onProgress } = options;
+  const started = performance.now();
+  const uploader = new BatchUploader(backendUrl, batchSize);
 
-  while (queue.length > 0) {
-    const url = queue.shift()!;
-    if (visited.has(url)) continue;
-    visited.add(url);
+  const start = canonicalizeUrl(startUrl, startUrl);
+  const queue: { url: string; depth: number }[] = start ? [{ url: start, depth: 0 }] : [];
+  const seen = new Set<string>(queue.map((item) => item.url));
+  let head = 0; // next queue index; items before it have been taken
+  let active = 0;
+  let fetched = 0;
+  let failed = 0;
+  let wakeups: (() => void)[] = [];
 
-    debugLog(`Crawling: ${url}`);
+  const stats = (): CrawlStats => ({
+    fetched,
+    queued: queue.length - head,
+    failed,
+    uploaded: uploader.uploaded,
+    uploadFailed: uploader.failed,
+    elapsedMs: Math.round(performance.now() - started),
+  });
 
-    try {
-      const resp = await fetch(url);
-      const html = await resp.text();
+  const wake = () => {
+    const waiting = wakeups;
+    wakeups = [];
+    waiting.forEach((resolve) => resolve());
+  };
 
-      debugLog(`Fetched (${html.length} chars): ${url}`);
+  // The next page to fetch, or null once the queue is empty and no page in
+  // flight can add more.
+  const next = async (): Promise<{ url: string; depth: number } | null> => {
+    for (;;) {
+      if (signal?.aborted) return null;
+      if (head < queue.length) return queue[head++];
+      if (active === 0) return null;
+      await new Promise<void>((resolve) => wakeups.push(resolve));
+    }
+  };
 
-      await fetch(`${backendUrl}/add_page_data`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ url, html, domain }),
-      });
+  const crawlOne = async (url: string, depth: number) => {
+    const resp = await fetch(url, { signal });
+    const type = resp.headers.get("content-type") || "";
+    if (!resp.ok || !type.includes("html")) {
+      debugLog(`Skipped ${url} (${resp.status} ${type})`);
+      return;
+    }
+    // After a redirect, the page is the one at the final URL; skip it if that
+    // URL was already fetched or queued, and keep it from being queued later.
+    const finalUrl = (resp.url && canonicalizeUrl(resp.url, url)) || url;
+    if (finalUrl !== url) {
+      if (seen.has(finalUrl) || new URL(finalUrl).origin !== new URL(url).origin) {
+        debugLog(`Skipped ${url} (redirects to ${finalUrl})`);
+        return;
+      }
+      seen.add(finalUrl);
+    }
+    const html = await resp.text();
+    fetched++;
 
-      const links = extractSameDomainLinksFromHtml(html, url);
-      debugLog(`Found ${links.length} same-domain links on ${url}:`);
-      links.forEach(link => debugLog(`  - ${link.href} (${link.text})`));
-      for (const link of links) {
-        if (!visited.has(link.href)) queue.push(link.href);
+    if (depth < maxDepth) {
+      for (const link of extractSameDomainLinksFromHtml(html, finalUrl)) {
+        if (seen.size >= maxPages) break;
+        if (!seen.has(link.href)) {
+          seen.add(link.href);
+          queue.push({ url: link.href, depth: depth + 1 });
+        }
       }
+    }
+    await uploader.add({ url: finalUrl, domain, html });
+    if (fetched % 10 === 0) {
+      debugLog(`Crawled ${fetched} pages, ${queue.length - head} queued, ${uploader.uploaded} uploaded`);
+      onProgress?.(stats());
+    }
+  };
 
-    } catch (err) {
-      debugLog("Error crawling " + url + ": " + err);
+  const worker = async () => {
+    for (;;) {
+      const item = await next();
+      if (!item) break;
+      active++;
+      try {
+        await crawlOne(item.url, item.depth);
+      } catch (err) {
+        failed++;
+        debugLog(`Error crawling ${item.url}: ${err}`);
+      } finally {
+        active--;
+        wake();
+      }
     }
-  }
+    wake();
+  };
+
+  debugLog(`Crawling ${start} (up to ${maxPages} pages, depth ${maxDepth}, ${concurrency} at a time)`);
+  await Promise.all(Array.from({ length: Math.max(1, concurrency) }, worker));
+  await uploader.close();
+
+  const result = stats();
+  debugLog(
+    `Crawl finished: ${result.fetched} pages in ${(result.elapsedMs / 1000).toFixed(1)}s, ` +
+      `${result.uploaded} uploaded, ${result.failed + result.uploadFailed} failed`
+  );
+  onProgress?.(result);
+  return result;
 }